@@ -22,7 +22,8 @@ setup(
     requires = [],
     install_requires = ["gmpy"],
     extras_require = {
-        "PROFILING" : ["epydoc", "pylint", "figleaf"]
+        "PROFILING" : ["epydoc", "pylint", "figleaf"],
+        "AES" : ["pycrypto"]
     },
 
     # important non-python files goes in here
@@ -39,6 +40,7 @@ setup(
     tasty_init = tasty.scripts.tasty_init:main
     tasty_post = tasty.scripts.tasty_post:start
     tasty = tasty.scripts.main:start
+    tasty_circuit = tasty.scripts.tasty_circuit:main
     """,
 
     # custom commands
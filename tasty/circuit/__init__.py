@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import logging
+
 from tasty import state
 from tasty.utils import value2bits, bits2value
 from cStringIO import StringIO
@@ -14,6 +16,55 @@ UNDEF = 2
 NODROP_MSB = 3
 DROP_MSB = 4
 
+# bit-sliced evaluation of the 2-input gates by truth table, m is all ones
+_SLICED_GATES = (
+    lambda a, b, m: 0,
+    lambda a, b, m: a & b,
+    lambda a, b, m: a & ~b,
+    lambda a, b, m: a,
+    lambda a, b, m: ~a & b,
+    lambda a, b, m: b,
+    lambda a, b, m: a ^ b,
+    lambda a, b, m: a | b,
+    lambda a, b, m: (a | b) ^ m,
+    lambda a, b, m: a ^ b ^ m,
+    lambda a, b, m: b ^ m,
+    lambda a, b, m: a | (b ^ m),
+    lambda a, b, m: a ^ m,
+    lambda a, b, m: (a ^ m) | b,
+    lambda a, b, m: (a & b) ^ m,
+    lambda a, b, m: m)
+
+
+def _sliced_gate(wires, g_ins, g_tab, mask):
+    """ output of a gate with any number of inputs on bit-sliced wires,
+        the OR of the minterms of its truth table
+    """
+    d = len(g_ins)
+    n = 1 << d
+    val = 0
+    for v in xrange(n):
+        if (g_tab >> (n - 1 - v)) & 1:
+            term = mask
+            for k, i in enumerate(g_ins):
+                if (v >> (d - 1 - k)) & 1:
+                    term &= wires[i]
+                else:
+                    term &= ~wires[i]
+            val |= term
+    return val
+
+
+def _input_value(v, l):
+    """
+    value v of an input of l bits as unsigned int, negative values are
+    taken in two's complement
+    """
+    v = int(v)
+    if not -(1 << l >> 1) <= v < (1 << l):
+        raise ValueError("Input out of range: %d, bitlen %d expected" % (v, l))
+    return v & ((1 << l) - 1)
+
 
 class Circuit(object):
     """Base class for circuits
@@ -124,11 +175,18 @@ class Circuit(object):
             "Number of gates does not match"
 
     def eval(self, inputs):
-        """Evaluate circuit on plain inputs"""
+        """Evaluate circuit on plain inputs
+
+        Unless debug logging is enabled, this is L{eval_batch} on a single
+        input vector. Otherwise each gate is logged while it is evaluated.
+        """
 
         assert len(inputs) == len(self.inputs()), \
             "#inputs must match #inputs of circuit"
 
+        if not state.log.isEnabledFor(logging.DEBUG):
+            return self.eval_batch([inputs])[0]
+
         u = self.num_input_bits()
         k = self.num_gates()
 
@@ -142,7 +200,7 @@ class Circuit(object):
             l, desc = input_desc[ix]
             state.log.debug("%s:", desc)
 
-            wire_values[k:k+l] = value2bits(mpz(v),l)
+            wire_values[k:k+l] = value2bits(mpz(_input_value(v, l)),l)
             k+=l
 
 
@@ -173,6 +231,56 @@ class Circuit(object):
             output_values.append(o_val)
         return output_values
 
+    def eval_batch(self, inputs):
+        """Evaluate circuit on many plain input vectors at once
+
+        The evaluation is bit-sliced: wire values are ints holding the bit
+        of the wire for input vector t in bit t, so one pass over the gates
+        evaluates all input vectors.
+
+        @type inputs: iterable
+        @param inputs: input vectors, each like the inputs of L{eval}
+
+        @rtype: list
+        @return: the output values of L{eval} for each input vector
+        """
+        inputs = list(inputs)
+        n = len(inputs)
+        if not n:
+            return []
+        mask = (1 << n) - 1
+
+        # transpose inputs, vector t is the last character of the strings
+        wires = []
+        for ix, (l, desc) in enumerate(self.inputs()):
+            if not l:
+                continue
+            bits = []
+            for i in reversed(inputs):
+                assert len(i) == len(self.inputs()), \
+                    "#inputs must match #inputs of circuit"
+                bits.append(bin(_input_value(i[ix], l))[2:].zfill(l))
+            wires.extend(int("".join(column), 2) for column in reversed(zip(*bits)))
+
+        # evaluate gates
+        for g_ins, g_tab in self.next_gate():
+            if len(g_ins) == 2:
+                wires.append(_SLICED_GATES[g_tab](wires[g_ins[0]], wires[g_ins[1]], mask) & mask)
+            else:
+                wires.append(_sliced_gate(wires, g_ins, g_tab, mask))
+
+        # transpose outputs back
+        output_values = [[] for i in xrange(n)]
+        for out, desc, type_ in self.outputs():
+            if not out:
+                for values in output_values:
+                    values.append(mpz(0))
+                continue
+            bits = [bin(wires[o])[2:].zfill(n) for o in reversed(out)]
+            for values, row in zip(reversed(output_values), zip(*bits)):
+                values.append(mpz(int("".join(row), 2)))
+        return output_values
+
     def subcircuit_next_gate(self, input_translation, gate_id_shift, total_inputs):
         """ Returns next gate of this circuit as subcircuit within an other circuit.
             input_translation: list of which input is associated to which wire
@@ -209,6 +317,30 @@ class Circuit(object):
             ret.append(akt_ret)
         return ret
 
+    def depth(self):
+        """ Returns the depth of the circuit, i.e., the number of gates on the
+        longest path from an input to an output
+
+        @rtype: int
+        """
+        return gate_statistics(self)["depth"]
+
+    def nonxor_depth(self):
+        """ Returns the largest number of non-XOR gates on a path from an
+        input to an output, see L{gate_statistics}
+
+        @rtype: int
+        """
+        return gate_statistics(self)["nonxor_depth"]
+
+    def peak_live_wires(self):
+        """ Returns the largest number of wires that are live at the same
+        time when the gates are evaluated in order, see L{wire_statistics}
+
+        @rtype: int
+        """
+        return wire_statistics(self)["peak_live_wires"]
+
     def gate_types(self):
         """ Count different types of gates.
             2-input gates are separated into XOR and NONXOR gates """
@@ -229,3 +361,79 @@ class Circuit(object):
                     gates[str(d)] = 0
                 gates[str(d)] += 1
         return gates
+
+
+def gate_statistics(circuit):
+    """ Computes number of gates, gate types (see L{Circuit.gate_types}),
+    depth and non-XOR depth of circuit in one pass over its gates
+
+    The non-XOR depth is the largest number of gates other than 2-input XOR
+    gates on a path to an output, i.e., the number of levels of gates that
+    are garbled one after another with FreeXOR.
+
+    @rtype: dict
+    @return: {"num_gates": int, "gate_types": dict, "depth": int,
+    "nonxor_depth": int}
+    """
+    depths = [0] * circuit.num_input_bits()
+    nonxor_depths = [0] * circuit.num_input_bits()
+    gates = {}
+    for g_in, g_tab in circuit.next_gate():
+        d = len(g_in)
+        if d == 2:
+            key = "2_XOR" if g_tab == 0b0110 else "2_NONXOR"
+        else:
+            key = str(d)
+        gates[key] = gates.get(key, 0) + 1
+        depths.append(1 + max([depths[i] for i in g_in] or [0]))
+        nonxor_depths.append((key != "2_XOR") + max([nonxor_depths[i] for i in g_in] or [0]))
+    outputs = [i for o, desc, type_ in circuit.outputs() for i in o]
+    return {"num_gates": len(depths) - circuit.num_input_bits(),
+            "gate_types": gates,
+            "depth": max([depths[i] for i in outputs] or [0]),
+            "nonxor_depth": max([nonxor_depths[i] for i in outputs] or [0])}
+
+
+def wire_statistics(circuit):
+    """ Computes the peak number of live wires and the average wire lifetime
+    of circuit when its gates are evaluated in order
+
+    A wire is live from the gate computing it (inputs: from the start) up
+    to the last gate using it, output wires stay live up to the end. The
+    inputs of a gate are released before its output is stored, so the peak
+    is the number of wire slots a garbler or evaluator reusing the slots of
+    dead wires needs. The lifetime of a wire is the number of gates
+    evaluated between computing the wire and its last use.
+
+    @rtype: dict
+    @return: {"peak_live_wires": int, "average_lifetime": float, "num_wires": int}
+    """
+    u = circuit.num_input_bits()
+    last = [-1] * u
+    ix = -1
+    for ix, (g_ins, g_tab) in enumerate(circuit.next_gate()):
+        for i in g_ins:
+            last[i] = ix
+        last.append(-1)
+    k = ix + 1
+    for o, desc, type_ in circuit.outputs():
+        for i in o:
+            last[i] = k
+
+    # wire w is live at times birth .. end, time t is after gate t - 1
+    delta = [0] * (k + 2)
+    lifetimes = 0
+    for w, end in enumerate(last):
+        birth = max(w - u + 1, 0)
+        end = max(end, birth)
+        delta[birth] += 1
+        delta[end + 1] -= 1
+        lifetimes += end - birth
+
+    live = peak = 0
+    for d in delta:
+        live += d
+        peak = max(peak, live)
+    return {"peak_live_wires": peak,
+            "average_lifetime": float(lifetimes) / len(last) if last else 0.0,
+            "num_wires": len(last)}
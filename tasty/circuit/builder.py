@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""Building circuits gate by gate into flat arrays"""
+
+from array import array
+
+from tasty.circuit.compiled import CompiledCircuit, _truth_typecode
+
+__all__ = ["CircuitBuilder"]
+
+
+class CircuitBuilder(object):
+    """
+    Collects the gates of a circuit in the arrays of a L{CompiledCircuit}
+
+    Wires 0 .. num_inputs - 1 are the inputs, every added gate gets the next
+    wire. Subcircuits are added with L{add_subcircuit}: circuits with an
+    emit method (see L{tasty.circuit.dynamic.BuilderCircuit}) emit their
+    gates into the builder directly, the gates of other circuits are copied
+    with their wires translated. So nested circuits are built in one pass
+    over all gates, without generators or index translation per level.
+    """
+
+    def __init__(self, num_inputs):
+        """
+        @type num_inputs: int
+        @param num_inputs: number of input bits
+        """
+        self.num_inputs = num_inputs
+        self.gate_inputs = array("i")
+        self.offsets = array("i", [0])
+        self.truths = []
+        self.outputs = []
+
+    def num_gates(self):
+        return len(self.truths)
+
+    def next_wire(self):
+        """ wire of the next gate """
+        return self.num_inputs + len(self.truths)
+
+    def add_gate(self, inputs, truth_table):
+        """
+        @type inputs: iterable
+        @param inputs: input wires of the gate
+
+        @type truth_table: int
+        @param truth_table: truth table as in L{Circuit.next_gate}
+
+        @rtype: int
+        @return: output wire of the gate
+        """
+        self.gate_inputs.extend(inputs)
+        self.offsets.append(len(self.gate_inputs))
+        self.truths.append(truth_table)
+        return self.num_inputs + len(self.truths) - 1
+
+    def add_subcircuit(self, circuit, inputs):
+        """
+        add the gates of circuit with its inputs connected to wires inputs
+
+        @type circuit: Circuit
+        @param circuit: circuit to add
+
+        @type inputs: list
+        @param inputs: wires for the input bits of circuit
+
+        @rtype: list
+        @return: list of output wires for each output of circuit
+        """
+        if hasattr(circuit, "emit"):
+            outputs = circuit.emit(self, inputs)
+        else:
+            outputs = self.copy_circuit(circuit, inputs)
+        return [o for o, desc, type_ in outputs]
+
+    def copy_circuit(self, circuit, inputs):
+        """
+        copy the gates of circuit with its wires translated
+
+        @rtype: list
+        @return: (output wires, description, type) of each output of circuit
+        """
+        assert len(inputs) == circuit.num_input_bits()
+        n_inputs = len(inputs)
+        delta = self.next_wire() - n_inputs
+        translation = list(inputs)
+        gate_inputs = self.gate_inputs
+        offsets = self.offsets
+        truths = self.truths
+        if isinstance(circuit, CompiledCircuit):
+            gate_inputs.extend(translation[i] if i < n_inputs else i + delta for i in circuit.gate_inputs)
+            start = offsets[-1]
+            offsets.extend(start + o for o in circuit.offsets[1:])
+            truths.extend(circuit.truths)
+        else:
+            for g_ins, g_tab in circuit.next_gate():
+                gate_inputs.extend([translation[i] if i < n_inputs else i + delta for i in g_ins])
+                offsets.append(len(gate_inputs))
+                truths.append(g_tab)
+        return [([translation[i] if i < n_inputs else i + delta for i in o], desc, type_)
+                for o, desc, type_ in circuit.outputs()]
+
+    def add_output(self, wires, desc, type_):
+        """ register wires as an output of the circuit """
+        self.outputs.append((list(wires), desc, type_))
+
+    def circuit(self, inputs):
+        """
+        @type inputs: list
+        @param inputs: (bit length, description) of the input arguments
+
+        @rtype: CompiledCircuit
+        @return: the built circuit with the registered outputs
+        """
+        truths = array(_truth_typecode(max(self.truths or [0])), self.truths)
+        return CompiledCircuit(self.num_inputs, [tuple(i) for i in inputs], self.outputs,
+                               self.gate_inputs, self.offsets, truths)
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+
+"""Circuits stored in flat typed arrays"""
+
+import hashlib
+import mmap
+import struct
+import sys
+from array import array
+
+from tasty.circuit import Circuit
+
+__all__ = ["CompiledCircuit"]
+
+# typecodes of the truth table array by size of the largest truth table
+_TRUTH_TYPECODES = ("B", "H", "I", "L")
+
+
+# length prefix of lists and strings in the descriptions, -1 for None
+_LENGTH = struct.Struct("<q")
+
+# bit length of an input, type of an output
+_NUMBER = struct.Struct("<q")
+
+
+def _pack_str(s):
+    if s is None:
+        return _LENGTH.pack(-1)
+    if isinstance(s, unicode):
+        s = s.encode("utf-8")
+    return _LENGTH.pack(len(s)) + s
+
+
+def _pack_desc(input_desc, output_desc, typecode):
+    """
+    encodes the descriptions of inputs and outputs: the number of inputs,
+    (bit length, description) of each input, the number of outputs and
+    (type, description, number of wires, wires) of each output, with
+    lengths and numbers as signed 64 bit integers and the wires as array of
+    typecode
+    """
+    parts = [_LENGTH.pack(len(input_desc))]
+    for bits, desc in input_desc:
+        parts.append(_NUMBER.pack(bits))
+        parts.append(_pack_str(desc))
+    parts.append(_LENGTH.pack(len(output_desc)))
+    for wires, desc, type_ in output_desc:
+        parts.append(_NUMBER.pack(type_))
+        parts.append(_pack_str(desc))
+        parts.append(_LENGTH.pack(len(wires)))
+        parts.append(array(typecode, wires).tostring())
+    return "".join(parts)
+
+
+class _DescReader(object):
+    """ decodes descriptions written by L{_pack_desc} """
+
+    def __init__(self, data, typecode, swap):
+        self.data = data
+        self.pos = 0
+        self.typecode = typecode
+        self.swap = swap
+
+    def take(self, size):
+        if size < 0 or self.pos + size > len(self.data):
+            raise ValueError("invalid circuit descriptions")
+        s = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return s
+
+    def number(self):
+        return _NUMBER.unpack(self.take(_NUMBER.size))[0]
+
+    def length(self):
+        return _LENGTH.unpack(self.take(_LENGTH.size))[0]
+
+    def string(self):
+        size = self.length()
+        if size == -1:
+            return None
+        return self.take(size)
+
+    def wires(self):
+        a = array(self.typecode)
+        a.fromstring(self.take(self.length() * a.itemsize))
+        if self.swap:
+            a.byteswap()
+        return a.tolist()
+
+    def read(self):
+        """ returns input_desc, output_desc """
+        input_desc = []
+        for i in xrange(self.length()):
+            bits = self.number()
+            input_desc.append((bits, self.string()))
+        output_desc = []
+        for i in xrange(self.length()):
+            type_ = self.number()
+            desc = self.string()
+            output_desc.append((self.wires(), desc, type_))
+        if self.pos != len(self.data):
+            raise ValueError("invalid circuit descriptions")
+        return input_desc, output_desc
+
+
+def _truth_typecode(largest):
+    """ smallest typecode of an array holding truth tables up to largest """
+    for typecode in _TRUTH_TYPECODES:
+        if largest < 1 << (8 * array(typecode).itemsize):
+            return typecode
+    raise ValueError("truth table too large for a compiled circuit")
+
+
+class CompiledCircuit(Circuit):
+    """
+    Circuit with all gates stored in flat typed arrays
+
+    The inputs of gate ix are gate_inputs[offsets[ix]:offsets[ix + 1]] and
+    its truth table is truths[ix], which is an array of one byte per gate
+    for gates with up to 3 inputs. This needs about a tenth of the memory
+    of L{circuit_buffer_RAM} and can be stored to and mapped from a binary
+    file with L{save} and L{load}.
+    """
+
+    MAGIC = "TASTYCC\x02"
+
+    # magic, typecodes of indices and truth tables, byte order, number of
+    # inputs, number of gates, number of gate inputs, length of descriptions
+    HEADER = struct.Struct("<8sccc5xQQQQ")
+
+    def __init__(self, num_inputs, inputs, outputs, gate_inputs, offsets, truths):
+        """
+        @type num_inputs: int
+        @param num_inputs: number of input bits
+
+        @type inputs: list
+        @param inputs: (bit length, description) of the input arguments
+
+        @type outputs: list
+        @param outputs: (output indices, description, type) of the outputs
+
+        @type gate_inputs: array
+        @param gate_inputs: input wires of all gates
+
+        @type offsets: array
+        @param offsets: start of the inputs of each gate in gate_inputs
+
+        @type truths: array
+        @param truths: truth table of each gate
+        """
+        self.num_inputs = num_inputs
+        self.input_desc = inputs
+        self.output_desc = outputs
+        self.gate_inputs = gate_inputs
+        self.offsets = offsets
+        self.truths = truths
+
+    @classmethod
+    def from_circuit(cls, circuit):
+        """ compile circuit, compiled circuits are returned as they are """
+        if isinstance(circuit, CompiledCircuit):
+            return circuit
+        gate_inputs = array("i")
+        offsets = array("i", [0])
+        truths = []
+        for g_in, g_tab in circuit.next_gate():
+            gate_inputs.extend(g_in)
+            offsets.append(len(gate_inputs))
+            truths.append(g_tab)
+        truths = array(_truth_typecode(max(truths or [0])), truths)
+        return cls(circuit.num_input_bits(), [tuple(i) for i in circuit.inputs()],
+                   [(list(o), desc, type_) for o, desc, type_ in circuit.outputs()],
+                   gate_inputs, offsets, truths)
+
+    def num_input_bits(self):
+        return self.num_inputs
+
+    def inputs(self):
+        return self.input_desc
+
+    def num_output_bits(self):
+        return sum(len(o) for o, desc, type_ in self.output_desc)
+
+    def outputs(self):
+        return self.output_desc
+
+    def num_gates(self):
+        return len(self.truths)
+
+    def next_gate(self):
+        gate_inputs = self.gate_inputs
+        offsets = self.offsets
+        for ix, truth in enumerate(self.truths):
+            yield tuple(gate_inputs[offsets[ix]:offsets[ix + 1]]), truth
+
+    def gate_types(self):
+        gates = {}
+        offsets = self.offsets
+        for ix, truth in enumerate(self.truths):
+            d = offsets[ix + 1] - offsets[ix]
+            if d == 2:
+                key = "2_XOR" if truth == 0b0110 else "2_NONXOR"
+            else:
+                key = str(d)
+            gates[key] = gates.get(key, 0) + 1
+        return gates
+
+    def memory_size(self):
+        """ memory used by the gates in bytes """
+        return sum(a.itemsize * len(a) for a in (self.gate_inputs, self.offsets, self.truths))
+
+    def digest(self):
+        """
+        SHA-1 hex digest of the inputs, outputs and gates of the circuit,
+        which depends on the typecodes of the arrays and the byte order
+        """
+        h = hashlib.sha1(sys.byteorder)
+        h.update(_LENGTH.pack(self.num_inputs))
+        h.update(_pack_desc(self.input_desc, self.output_desc, self.gate_inputs.typecode))
+        for a in (self.offsets, self.gate_inputs, self.truths):
+            h.update(a.typecode)
+            h.update(_LENGTH.pack(len(a)))
+            h.update(buffer(a))
+        return h.hexdigest()
+
+    def save(self, filename):
+        """
+        store the circuit in a binary file: header, descriptions of inputs
+        and outputs (see L{_pack_desc}), then the raw offsets, gate inputs
+        and truth tables, each aligned to 8 bytes
+        """
+        desc = _pack_desc(self.input_desc, self.output_desc, self.gate_inputs.typecode)
+        f = open(filename, "wb")
+        try:
+            f.write(self.HEADER.pack(self.MAGIC, self.gate_inputs.typecode, self.truths.typecode,
+                                     sys.byteorder[0], self.num_inputs, len(self.truths),
+                                     len(self.gate_inputs), len(desc)))
+            f.write(desc)
+            for a in (self.offsets, self.gate_inputs, self.truths):
+                f.write("\0" * (-f.tell() % 8))
+                a.tofile(f)
+        finally:
+            f.close()
+
+    @classmethod
+    def load(cls, filename):
+        """
+        load a circuit stored with L{save}, the arrays are filled directly
+        from a memory map of the file
+        """
+        return CompiledCircuit(*cls.read_file(filename))
+
+    @classmethod
+    def read_file(cls, filename):
+        """ returns the constructor arguments of the circuit stored in filename """
+        f = open(filename, "rb")
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+        try:
+            if data.size() < cls.HEADER.size:
+                raise ValueError("%s is not a compiled circuit" % filename)
+            magic, index_type, truth_type, byteorder, num_inputs, num_gates, num_gate_inputs, desc_len = \
+                cls.HEADER.unpack_from(data)
+            if magic != cls.MAGIC:
+                raise ValueError("%s is not a compiled circuit" % filename)
+            pos = cls.HEADER.size
+            if index_type not in "ilq" or truth_type not in _TRUTH_TYPECODES:
+                raise ValueError("%s is not a compiled circuit" % filename)
+            input_desc, output_desc = _DescReader(data[pos:pos + desc_len], index_type,
+                                                  byteorder != sys.byteorder[0]).read()
+            pos += desc_len
+
+            arrays = []
+            for typecode, size in ((index_type, num_gates + 1), (index_type, num_gate_inputs),
+                                   (truth_type, num_gates)):
+                pos += -pos % 8
+                a = array(typecode)
+                a.fromstring(buffer(data, pos, size * a.itemsize))
+                if len(a) != size:
+                    raise ValueError("%s is truncated" % filename)
+                if byteorder != sys.byteorder[0]:
+                    a.byteswap()
+                pos += size * a.itemsize
+                arrays.append(a)
+        finally:
+            data.close()
+        offsets, gate_inputs, truths = arrays
+        return num_inputs, input_desc, output_desc, gate_inputs, offsets, truths
+
+    @classmethod
+    def is_compiled(cls, filename):
+        """ True if filename is a file written by L{save} """
+        f = open(filename, "rb")
+        try:
+            return f.read(len(cls.MAGIC)) == cls.MAGIC
+        finally:
+            f.close()
@@ -2,7 +2,10 @@
 
 """This module provides basic circuit structures and features"""
 
-from tasty.circuit import Circuit
+from tasty.circuit import Circuit, gate_statistics
+from tasty.circuit.builder import CircuitBuilder
+from tasty.circuit.compiled import CompiledCircuit
+from tasty.circuit.transformations import replace_3_by_2, remove_redundant_gates
 from tasty.utils import bitlength
 
 from tasty.circuit import SIGNED, UNSIGNED, UNDEF, DROP_MSB, NODROP_MSB
@@ -16,11 +19,62 @@ __all__ = ["SubCircuit", "AddCircuit",
            "VectorMultiplicationCircuit",
            "HornerMergeCircuit",
            "GateCircuit",
-           "UnpackCircuit"]
+           "UnpackCircuit",
+           "BuilderCircuit", "ReplicatedCircuit",
+           "KARATSUBA_BREAK_LENGTHS", "best_break_length", "tune_break_length",
+           "karatsuba_costs", "karatsuba_break_table"]
 
 
 class DynamicCircuit(Circuit):
-    """Base class for 'just-in-time' circuits"""
+    """Base class for 'just-in-time' circuits
+
+    Number of gates, gate types and depth are computed by enumerating the
+    gates once per subclass and constructor arguments (see L{statistics}),
+    so the cost analysis does not generate the gates of equal circuits
+    again. Subclasses override num_gates where it is known in closed form.
+    """
+
+    # statistics of circuits by class and constructor arguments
+    _statistics = {}
+
+    def __new__(cls, *args, **kwargs):
+        self = super(DynamicCircuit, cls).__new__(cls)
+        self._params = (cls, args, tuple(sorted(kwargs.iteritems())))
+        return self
+
+    def __repr__(self):
+        cls, args, kwargs = self._params
+        return "%s%r" % (cls.__name__, args + kwargs)
+
+    def statistics(self):
+        """Returns the statistics of this circuit, see L{gate_statistics}
+
+        @rtype: dict
+        """
+        try:
+            return DynamicCircuit._statistics[self._params]
+        except KeyError:
+            stats = DynamicCircuit._statistics[self._params] = gate_statistics(self)
+        except TypeError:
+            # unhashable constructor arguments
+            stats = gate_statistics(self)
+        return stats
+
+    def num_gates(self):
+        """See L{Circuit.num_gates}"""
+        return self.statistics()["num_gates"]
+
+    def gate_types(self):
+        """See L{Circuit.gate_types}"""
+        return dict(self.statistics()["gate_types"])
+
+    def depth(self):
+        """See L{Circuit.depth}"""
+        return self.statistics()["depth"]
+
+    def nonxor_depth(self):
+        """See L{Circuit.nonxor_depth}"""
+        return self.statistics()["nonxor_depth"]
 
     def output_gate(self, inputs, truth_table):
         """Called for each gate.
@@ -39,6 +93,103 @@ class DynamicCircuit(Circuit):
         return inputs, truth_table
 
 
+class BuilderCircuit(DynamicCircuit):
+    """Base class for dynamic circuits composed of subcircuits
+
+    Subclasses emit their gates and subcircuits into a L{CircuitBuilder}
+    with L{emit}. The gates are built into a L{CompiledCircuit} once, when
+    they are first needed. Used as subcircuit of another circuit, the gates
+    are emitted into the builder of that circuit right away, so nested
+    circuits are built in one pass.
+    """
+
+    _compiled = None
+
+    def emit(self, b, inputs):
+        """Emits the gates of this circuit into builder b
+
+        @type b: CircuitBuilder
+        @param b: builder to add the gates to
+
+        @type inputs: list
+        @param inputs: wires of the input bits in b
+
+        @rtype: list
+        @return: (output wires, description, type) of each output
+        """
+        raise NotImplementedError()
+
+    def compiled(self):
+        """Returns the gates of this circuit built into a L{CompiledCircuit}"""
+        if self._compiled is None:
+            b = CircuitBuilder(self.num_input_bits())
+            for o, desc, type_ in self.emit(b, range(self.num_input_bits())):
+                b.add_output(o, desc, type_)
+            self._compiled = b.circuit(self.inputs())
+        return self._compiled
+
+    def next_gate(self):
+        return self.compiled().next_gate()
+
+    def outputs(self):
+        return self.compiled().outputs()
+
+
+class ReplicatedCircuit(BuilderCircuit):
+    """Circuit that evaluates circuit n times on disjoint inputs
+
+    The inputs and outputs of copy i are those of circuit with "_i" appended
+    to their descriptions, all inputs of copy i come before those of copy
+    i + 1. The gates of circuit are generated once and copied for each copy
+    with their wires translated, the statistics are those of circuit scaled
+    by n, so the copies are not enumerated for the cost analysis.
+    """
+
+    def __init__(self, circuit, n):
+        """
+        @type circuit: Circuit
+        @param circuit: template circuit
+
+        @type n: int
+        @param n: number of copies
+
+        raises ValueError: n < 1
+        """
+        if n < 1:
+            raise ValueError("number of copies must be >= 1")
+        self.circuit = circuit
+        self.n = n
+
+    def num_input_bits(self):
+        return self.n * self.circuit.num_input_bits()
+
+    def num_output_bits(self):
+        return self.n * self.circuit.num_output_bits()
+
+    def inputs(self):
+        return [(l, "%s_%d" % (desc, i)) for i in xrange(self.n) for l, desc in self.circuit.inputs()]
+
+    def statistics(self):
+        """See L{DynamicCircuit.statistics}"""
+        c = self.circuit
+        return {"num_gates": self.n * c.num_gates(),
+                "gate_types": dict((key, self.n * num) for key, num in c.gate_types().iteritems()),
+                "depth": c.depth(),
+                "nonxor_depth": c.nonxor_depth()}
+
+    def emit(self, b, inputs):
+        if isinstance(self.circuit, BuilderCircuit):
+            template = self.circuit.compiled()
+        else:
+            template = CompiledCircuit.from_circuit(self.circuit)
+        k = template.num_input_bits()
+        outs = []
+        for i in xrange(self.n):
+            outs.extend((o, "%s_%d" % (desc, i), type_)
+                        for o, desc, type_ in b.copy_circuit(template, inputs[i * k:(i + 1) * k]))
+        return outs
+
+
 class GateCircuit(DynamicCircuit):
     def __init__(self, d, g_tabs):
         """Circuit that evaluates d-input gate with gate tables given in g_tabs"""
@@ -188,7 +339,6 @@ class SubCircuit(DynamicCircuit):
         self.type_y = type_y
         self.drop_msb = drop_msb
         self.outs = None
-        self.n_gates = None
 
     def num_input_bits(self):
         """See L{Circuit.num_input_bits}"""
@@ -205,12 +355,6 @@ class SubCircuit(DynamicCircuit):
         else:
             return self.x_bitlength + 1
 
-    def num_gates(self):
-        """See L{Circuit.num_gates}"""
-        if self.n_gates is None:
-            for i in self.next_gate():
-                pass
-        return self.n_gates
 
     def next_gate(self):
         """See L{Circuit.next_gate}"""
@@ -258,11 +402,9 @@ class SubCircuit(DynamicCircuit):
             if self.type_y == SIGNED:
                 yield self.output_gate((first_gate_idx + 2 * self.x_bitlength - 1, y_msb), 0b0110)
                 outs.append(first_gate_idx + next_gate_num)
-                next_gate_num += 1
             else:
                 outs.append(first_gate_idx + next_gate_num - 1)
 
-        self.n_gates = next_gate_num
         self.outs = outs
 
     def outputs(self):
@@ -298,7 +440,6 @@ class UnpackCircuit(DynamicCircuit):
         self.n_values = n_values
         self.L = bitlength * n_values
         self.outs = None
-        self.n_gates = None
 
     def num_input_bits(self):
         """See L{Circuit.num_input_bits}"""
@@ -312,12 +453,6 @@ class UnpackCircuit(DynamicCircuit):
         """See L{Circuit.num_output_bits}"""
         return self.L
 
-    def num_gates(self):
-        """See L{Circuit.num_gates}"""
-        if self.n_gates is None:
-            for i in self.next_gate():
-                pass
-        return self.n_gates
 
     def next_gate(self):
         """See L{Circuit.next_gate}"""
@@ -393,7 +528,6 @@ class UnpackCircuit(DynamicCircuit):
             if i < self.n_values - 1:
                 yield self.output_gate((pos, self.L + pos, first_gate_idx + 2 * pos - 1), 0b01110001)  # ci
                 next_gate_num += 1
-        self.n_gates = next_gate_num
         self.outs = outs
 
     def outputs(self):
@@ -444,7 +578,6 @@ class AddCircuit(DynamicCircuit):
         self.type_y = type_y
         self.drop_msb = drop_msb
         self.outs = None
-        self.n_gates = None
 
     def num_input_bits(self):
         """See L{Circuit.num_input_bits}"""
@@ -462,12 +595,6 @@ class AddCircuit(DynamicCircuit):
         else:
             return self.x_bitlength + 1
 
-    def num_gates(self):
-        """See L{Circuit.num_gates}"""
-        if self.n_gates is None:
-            for i in self.next_gate():
-                pass
-        return self.n_gates
 
     def next_gate(self):
         """See L{Circuit.next_gate}"""
@@ -515,11 +642,9 @@ class AddCircuit(DynamicCircuit):
             if self.type_y == SIGNED:
                 yield self.output_gate((first_gate_idx + 2 * self.x_bitlength - 1, y_msb), 0b0110)
                 outs.append(first_gate_idx + next_gate_num)
-                next_gate_num += 1
             else:
                 outs.append(first_gate_idx + next_gate_num - 1)
 
-        self.n_gates = next_gate_num
         self.outs = outs
 
     def outputs(self):
@@ -831,16 +956,11 @@ class MultiplicationCircuit(DynamicCircuit):
         self.y_bitlength = y_bitlength
 
         self.outs = None
-        self.n_gates = None
 
     def num_gates(self):
         if self.y_bitlength == 1:
             return self.x_bitlength
-        else:
-            if self.n_gates is None:
-                for i in self.next_gate():
-                    pass
-            return self.n_gates
+        return super(MultiplicationCircuit, self).num_gates()
 
     def num_input_bits(self):
         return self.x_bitlength + self.y_bitlength
@@ -918,8 +1038,6 @@ class MultiplicationCircuit(DynamicCircuit):
             self.outs.append(next_gate_idx - 2)
             self.outs.append(next_gate_idx - 1)
 
-            self.n_gates = next_gate_idx - first_gate_idx
-
     def outputs(self):
         if self.y_bitlength == 1:
             return ((range(self.x_bitlength + 1, 2 * self.x_bitlength + 1), "z", UNSIGNED),)
@@ -930,7 +1048,7 @@ class MultiplicationCircuit(DynamicCircuit):
             return ((self.outs, "z", UNSIGNED),)
 
 
-class HornerMergeCircuit(DynamicCircuit):
+class HornerMergeCircuit(BuilderCircuit):
     def __init__(self, x_bitlength, y_bitlength, m):
         """Computes x * 2^m + y
         """
@@ -945,14 +1063,7 @@ class HornerMergeCircuit(DynamicCircuit):
         self.x_bitlength = x_bitlength
         self.y_bitlength = y_bitlength
         self.m = m
-        self.outs = None
-        self.n_gates = None
 
-    def num_gates(self):
-        if self.n_gates is None:
-            for i in self.next_gate():
-                pass
-        return self.n_gates
 
     def num_input_bits(self):
         return self.x_bitlength + self.y_bitlength
@@ -963,42 +1074,20 @@ class HornerMergeCircuit(DynamicCircuit):
     def inputs(self):
         return ((self.x_bitlength, "x"), (self.y_bitlength, "y"))
 
-    def outputs(self):
-        if self.outs is None:
-            for i in self.next_gate():
-                pass
-        return ((self.outs, "z", UNDEF),)
-
-    def next_gate(self):
-        total_inputs = self.x_bitlength + self.y_bitlength
-        next_gate_num = 0
-
-        # pass last m bits of y
-        outs = []
-        for i in xrange(self.m):
-            outs.append(self.x_bitlength + i)
-
-        # add remaining bits of y with x
-        y_rest = []
-        for i in xrange(self.m, self.y_bitlength):
-            y_rest.append(self.x_bitlength + i)
-        x_inputs = range(self.x_bitlength)
-        both_inputs = x_inputs + y_rest
+    def emit(self, b, inputs):
+        x = inputs[:self.x_bitlength]
+        y = inputs[self.x_bitlength:]
 
+        # pass last m bits of y, add remaining bits of y with x
         c = AddCircuit(self.x_bitlength, self.y_bitlength - self.m, UNSIGNED, UNSIGNED, DROP_MSB)
-        for g in c.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-            yield g
-        c_outs = c.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0]
-        outs += c_outs
+        outs = y[:self.m] + b.add_subcircuit(c, x + y[self.m:])[0]
+        return [(outs, "z", UNDEF)]
 
-        self.n_gates = c.num_gates()
-        self.outs = outs
 
-
-class FastMultiplicationCircuit(DynamicCircuit):
-    def __init__(self, x_bitlength, y_bitlength, break_length=20):
+class FastMultiplicationCircuit(BuilderCircuit):
+    def __init__(self, x_bitlength, y_bitlength, break_length=None):
         """Circuit that computes z = x * y, where x and y are unsigned integers
-        the recursive Karatsuba algorithm switches to the base-case when bitlength <= break_length
+        the recursive Karatsuba algorithm switches to the base-case when bitlength < break_length
 
         @type x_bit_length: int
         @param x_bit_length: the bit length of the minuend
@@ -1007,7 +1096,8 @@ class FastMultiplicationCircuit(DynamicCircuit):
         @param y_bit_length: the bit length of the subtracend
 
         @type break_length: int
-        @param break_length: breakpoint at which to switch to the base case
+        @param break_length: breakpoint at which to switch to the base case,
+        defaults to L{best_break_length}(x_bitlength, y_bitlength)
 
         raises ValueError: invalid parameters
         """
@@ -1016,6 +1106,8 @@ class FastMultiplicationCircuit(DynamicCircuit):
             raise NotImplementedError("x must have at least as many bits as y")
         if x_bitlength <= 0 or y_bitlength <= 0:
             raise ValueError("length of x and y must be > 0")
+        if break_length is None:
+            break_length = best_break_length(x_bitlength, y_bitlength)
         if break_length < 4:
             raise ValueError("break length must be >= 4")
 
@@ -1023,14 +1115,6 @@ class FastMultiplicationCircuit(DynamicCircuit):
         self.y_bitlength = y_bitlength
         self.break_length = break_length
 
-        self.outs = None
-        self.n_gates = None
-
-    def num_gates(self):
-        if self.n_gates is None:
-            for i in self.next_gate():
-                pass
-        return self.n_gates
 
     def num_input_bits(self):
         return self.x_bitlength + self.y_bitlength
@@ -1044,143 +1128,185 @@ class FastMultiplicationCircuit(DynamicCircuit):
     def inputs(self):
         return ((self.x_bitlength, "x"), (self.y_bitlength, "y"))
 
-    def next_gate(self):
-        # base case
+    def subcircuits(self):
+        """Returns the subcircuits of one Karatsuba step in the order they
+        are added by L{emit}, or None in the base case
+
+        @rtype: tuple
+        @return: circuits computing z2, z0, va, vb, vm, vma, z1, m1 and z
+        """
         if self.y_bitlength < self.break_length:
+            return None
+        m = self.y_bitlength >> 1
+        l_x1 = self.x_bitlength - m
+        l_y1 = self.y_bitlength - m
+        z2 = FastMultiplicationCircuit(l_x1, l_y1, self.break_length)
+        z0 = FastMultiplicationCircuit(m, m, self.break_length)
+        va = AddCircuit(l_x1, m, UNSIGNED, UNSIGNED)
+        vb = AddCircuit(l_y1, m, UNSIGNED, UNSIGNED)
+        vm = FastMultiplicationCircuit(va.num_output_bits(), vb.num_output_bits(), self.break_length)
+        vma = SubCircuit(vm.num_output_bits(), z2.num_output_bits(), UNSIGNED, DROP_MSB)
+        z1 = SubCircuit(vma.num_output_bits(), z0.num_output_bits(), UNSIGNED, DROP_MSB)
+        m1 = HornerMergeCircuit(z2.num_output_bits(), z1.num_output_bits(), m)
+        z = HornerMergeCircuit(m1.num_output_bits(), z0.num_output_bits(), m)
+        return z2, z0, va, vb, vm, vma, z1, m1, z
+
+    def emit(self, b, inputs):
+        parts = self.subcircuits()
+
+        # base case
+        if parts is None:
             c = MultiplicationCircuit(self.x_bitlength, self.y_bitlength)
-            for g in c.next_gate():
-                yield g
-            self.outs = c.outputs()[0][0]
-            self.n_gates = c.num_gates()
+            return [(b.add_subcircuit(c, inputs)[0], "z", UNSIGNED)]
+
+        # Karatsuba recursion:
+        # x = x1 * 2^m + x0
+        # y = y1 * 2^m + y0
+        #
+        # z2 = x1 * y1
+        # z0 = x0 * y0
+        # z1 = x1 * y0 + x0 * y1
+        # = (x1 + x0)*(y1+y0) - z2 - z0
+        #
+        # z = z2 * 2^(2m) + z1 * 2^m  + z0
+        c_z2, c_z0, c_va, c_vb, c_vm, c_vma, c_z1, c_m1, c_z = parts
+        m = self.y_bitlength >> 1
+        x0 = inputs[:m]
+        x1 = inputs[m:self.x_bitlength]
+        y0 = inputs[self.x_bitlength:self.x_bitlength + m]
+        y1 = inputs[self.x_bitlength + m:]
+
+        # z2 = x1 * y1
+        z2 = b.add_subcircuit(c_z2, x1 + y1)[0]
+
+        # z0 = x0 * y0
+        z0 = b.add_subcircuit(c_z0, x0 + y0)[0]
+
+        # ---------------------------------------
+        # z1 = (x1 + x0)*(y1+y0) - z2 - z0
+
+        # va = x1 + x0
+        va = b.add_subcircuit(c_va, x1 + x0)[0]
+
+        # vb = y1 + y0
+        vb = b.add_subcircuit(c_vb, y1 + y0)[0]
+
+        # vm = va * vb
+        vm = b.add_subcircuit(c_vm, va + vb)[0]
+
+        # vma = vm - z2
+        vma = b.add_subcircuit(c_vma, vm + z2)[0]  # won't underflow
+
+        # z1 = vma - z0
+        z1 = b.add_subcircuit(c_z1, vma + z0)[0]  # won't underflow
+
+        # ---------------------------------------
+        # z = z2 * 2^(2m) + z1 * 2^m  + z0
+        #   = (z2 * 2^m + z1) * 2^m + z0
+        # z0 >= 0, z1 >= 0, z2 >= 0
+
+        # m1 = HornerMergeCircuit(z2,z1,m)
+        m1 = b.add_subcircuit(c_m1, z2 + z1)[0]
+
+        # z = HornerMergeCircuit(m1,z0,m)
+        z = b.add_subcircuit(c_z, m1 + z0)[0]
+        return [(z, "z", UNSIGNED)]
+
+
+# best break lengths of FastMultiplicationCircuit by (x_bitlength, y_bitlength),
+# computed with karatsuba_break_table
+KARATSUBA_BREAK_LENGTHS = {(8, 8): 9, (16, 16): 16, (24, 24): 24, (32, 32): 16, (48, 48): 24,
+                           (64, 64): 16, (96, 96): 24, (128, 128): 16, (192, 192): 24,
+                           (256, 256): 16, (384, 384): 24, (512, 512): 16, (768, 768): 24,
+                           (1024, 1024): 16, (2048, 2048): 16}
+
+# break lengths tuned at runtime for bit lengths not in KARATSUBA_BREAK_LENGTHS
+_break_lengths = {}
+
+# non-XOR gates of the circuits composed by FastMultiplicationCircuit
+_non_xor_gates = {}
+
+
+def _optimized_non_xor_gates(circuit):
+    """ non-XOR gates of circuit after optimization for FreeXOR garbling,
+        computed once per circuit class and constructor arguments """
+    try:
+        return _non_xor_gates[circuit._params]
+    except KeyError:
+        gates = Circuit.gate_types(remove_redundant_gates(replace_3_by_2(circuit)))
+        num = _non_xor_gates[circuit._params] = sum(n for key, n in gates.iteritems() if key != "2_XOR")
+        return num
+
+
+def karatsuba_costs(x_bitlength, y_bitlength, break_length):
+    """ number of non-XOR gates of FastMultiplicationCircuit(x_bitlength,
+        y_bitlength, break_length) after optimization for FreeXOR garbling
+
+    The costs are summed up over the subcircuits of the recursion, so the
+    gates of the whole circuit are never generated.
+
+    @rtype: int
+    """
+    c = FastMultiplicationCircuit(x_bitlength, y_bitlength, break_length)
+    parts = c.subcircuits()
+    if parts is None:
+        return _optimized_non_xor_gates(MultiplicationCircuit(x_bitlength, y_bitlength))
+    try:
+        return _non_xor_gates[c._params]
+    except KeyError:
+        num = _non_xor_gates[c._params] = sum(
+            karatsuba_costs(p.x_bitlength, p.y_bitlength, break_length)
+            if isinstance(p, FastMultiplicationCircuit) else _optimized_non_xor_gates(p)
+            for p in parts)
+        return num
+
+
+def tune_break_length(x_bitlength, y_bitlength, max_break_length=64):
+    """ determines the break length of FastMultiplicationCircuit(x_bitlength,
+        y_bitlength) with the fewest non-XOR gates (see L{karatsuba_costs})
+
+    Ties are broken towards the larger break length, which gives the
+    shallower circuit. Break lengths above max_break_length are not tried,
+    so schoolbook multiplication of wider numbers is never chosen.
+
+    @rtype: int
+    """
+    best = None
+    for break_length in xrange(4, min(y_bitlength, max_break_length) + 2):
+        costs = karatsuba_costs(x_bitlength, y_bitlength, break_length)
+        if best is None or costs <= best[0]:
+            best = costs, break_length
+    return best[1]
 
-        else:
-            # Karatsuba recursion:
-            # x = x1 * 2^m + x0
-            # y = y1 * 2^m + y0
-            #
-            # z2 = x1 * y1
-            # z0 = x0 * y0
-            # z1 = x1 * y0 + x0 * y1
-            # = (x1 + x0)*(y1+y0) - z2 - z0
-            #
-            # z = z2 * 2^(2m) + z1 * 2^m  + z0
-            total_inputs = self.x_bitlength + self.y_bitlength
-            next_gate_num = 0
-
-            m = self.y_bitlength >> 1
-            x0 = range(0, m)
-            x1 = range(m, self.x_bitlength)
-            y0 = range(self.x_bitlength, self.x_bitlength + m)
-            y1 = range(self.x_bitlength + m, self.x_bitlength + self.y_bitlength)
-
-            # z2 = x1 * y1
-            c = FastMultiplicationCircuit(len(x1), len(y1), self.break_length)
-            both_inputs = x1 + y1
-            for g in c.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-                yield g
-            z2 = c.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0]
-            next_gate_num += c.num_gates()
-
-            # z0 = x0 * y0
-            c = FastMultiplicationCircuit(len(x0), len(y0), self.break_length)
-            both_inputs = x0 + y0
-            for g in c.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-                yield g
-            z0 = c.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0]
-            next_gate_num += c.num_gates()
-
-            # ---------------------------------------
-            # z1 = (x1 + x0)*(y1+y0) - z2 - z0
-
-            # va = x1 + x0
-            c = AddCircuit(len(x1), len(x0), UNSIGNED, UNSIGNED)
-            both_inputs = x1 + x0
-            for g in c.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-                yield g
-            va = c.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0]
-            next_gate_num += c.num_gates()
-
-            # vb = y1 + y0
-            c = AddCircuit(len(y1), len(y0), UNSIGNED, UNSIGNED)
-            both_inputs = y1 + y0
-            for g in c.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-                yield g
-            vb = c.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0]
-            next_gate_num += c.num_gates()
-
-            # vm = va * vb
-            c = FastMultiplicationCircuit(len(va), len(vb), self.break_length)
-            both_inputs = va + vb
-            for g in c.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-                yield g
-            vm = c.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0]
-            next_gate_num += c.num_gates()
-
-            # vma = vm - z2
-            c = SubCircuit(len(vm), len(z2), UNSIGNED, DROP_MSB)  # won't underflow
-            both_inputs = vm + z2
-            for g in c.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-                yield g
-            vma = c.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0]
-            next_gate_num += c.num_gates()
-
-            # z1 = vma - z0
-            c = SubCircuit(len(vma), len(z0), UNSIGNED, DROP_MSB)  # won't underflow
-            both_inputs = vma + z0
-            for g in c.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-                yield g
-            z1 = c.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0]
-            next_gate_num += c.num_gates()
-
-            # ---------------------------------------
-            # z = z2 * 2^(2m) + z1 * 2^m  + z0
-            #   = (z2 * 2^m + z1) * 2^m + z0
-            # z0 >= 0, z1 >= 0, z2 >= 0
-
-            # m1 = HornerMergeCircuit(z2,z1,m)
-            c = HornerMergeCircuit(len(z2), len(z1), m)
-            both_inputs = z2 + z1
-            for g in c.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-                yield g
-            m1 = c.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0]
-            next_gate_num += c.num_gates()
-
-            # z = HornerMergeCircuit(m1,z0,m)
-            c = HornerMergeCircuit(len(m1), len(z0), m)
-            both_inputs = m1 + z0
-            for g in c.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-                yield g
-            z = c.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0]
-            next_gate_num += c.num_gates()
-
-            self.n_gates = next_gate_num
-            self.outs = z
 
-    def outputs(self):
-        if self.outs is None:
-            for i in self.next_gate():
-                pass
-        return ((self.outs, "z", UNSIGNED),)
-
-
-# def determine_minimum_break_value():
-#        # determine minimum break value
-#        for x_len in xrange(3,100):
-#            y_len = x_len
-#            min_break = [y_len]
-#            c = KaratsubaMultiplicationCircuit(x_len, y_len, y_len)
-#            min_gates = c.costs_XORtransformed()
-#            school_gates = min_gates
-#            for break_len in xrange(3,y_len):
-#                c = KaratsubaMultiplicationCircuit(x_len, y_len, break_len)
-#                gates = c.costs_XORtransformed()
-#                if gates == min_gates:
-#                    min_break.append(break_len)
-#                elif gates < min_gates:
-#                    min_gates = gates
-#                    min_break = [break_len]
-#            delta = float(school_gates - min_gates)*100/school_gates
-#            print x_len, " => ", min_break, ", delta=", delta, "total=", min_gates
+def best_break_length(x_bitlength, y_bitlength):
+    """ break length of FastMultiplicationCircuit(x_bitlength, y_bitlength)
+        with the fewest non-XOR gates
+
+    Looked up in L{KARATSUBA_BREAK_LENGTHS}, other bit lengths are tuned
+    with L{tune_break_length} once per process.
+
+    @rtype: int
+    """
+    key = (x_bitlength, y_bitlength)
+    try:
+        return KARATSUBA_BREAK_LENGTHS[key]
+    except KeyError:
+        pass
+    try:
+        return _break_lengths[key]
+    except KeyError:
+        break_length = _break_lengths[key] = tune_break_length(x_bitlength, y_bitlength)
+        return break_length
+
+
+def karatsuba_break_table(bitlengths=(8, 16, 24, 32, 48, 64, 96, 128, 192, 256, 384, 512, 768, 1024, 2048)):
+    """ computes the entries of L{KARATSUBA_BREAK_LENGTHS} for multiplications
+        of numbers with equal bit lengths
+
+    @rtype: dict
+    """
+    return dict(((l, l), tune_break_length(l, l)) for l in bitlengths)
 
 
 class MuxCircuit(DynamicCircuit):
@@ -1213,7 +1339,7 @@ class MuxCircuit(DynamicCircuit):
         return ((range(first_gate_idx, first_gate_idx + self.bitlength), "z", UNDEF),)
 
 
-class MinMaxValueCircuit(DynamicCircuit):
+class MinMaxValueCircuit(BuilderCircuit):
     #TODO: Add unsigned / signed
     MIN = 0
     MAX = 1
@@ -1230,8 +1356,6 @@ class MinMaxValueCircuit(DynamicCircuit):
         self.minmax_type = minmax_type
         self.n = n
         self.bitlength = bitlength
-        self.outs = None
-        self.n_gates = None
         self.signed = signed
 
     def num_input_bits(self):
@@ -1246,56 +1370,30 @@ class MinMaxValueCircuit(DynamicCircuit):
     def num_output_bits(self):
         return self.bitlength
 
-    def next_gate(self):
-        total_inputs = self.num_input_bits()
-
+    def emit(self, b, inputs):
         if self.minmax_type == self.MIN:
             c = CmpCircuit(self.bitlength, self.bitlength, CmpCircuit.GREATEREQUAL, self.signed, self.signed)
         elif self.minmax_type == self.MAX:
             c = CmpCircuit(self.bitlength, self.bitlength, CmpCircuit.LESS, self.signed, self.signed)
-        c_num_gates = c.num_gates()
 
         m = MuxCircuit(self.bitlength)
-        m_num_gates = m.num_gates()
 
-        next_gate_num = 0
-        left_inputs = range(self.bitlength)
+        left_inputs = inputs[:self.bitlength]
 
         for i in xrange(1, self.n):
-            right_inputs = range(i * self.bitlength, (i + 1) * self.bitlength)
+            right_inputs = inputs[i * self.bitlength:(i + 1) * self.bitlength]
             both_inputs = left_inputs + right_inputs
 
             # Compare
-            for g in c.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-                yield g
-            cmp_output = c.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0][0]
-            next_gate_num += c_num_gates
+            cmp_output = b.add_subcircuit(c, both_inputs)[0][0]
 
             # Multiplex
-            m_inputs = both_inputs + [cmp_output]
-            for g in m.subcircuit_next_gate(m_inputs, next_gate_num, total_inputs):
-                yield g
-            left_inputs = m.subcircuit_outputs(m_inputs, next_gate_num, total_inputs)[0]
-            next_gate_num += m_num_gates
+            left_inputs = b.add_subcircuit(m, both_inputs + [cmp_output])[0]
 
-        # determine outputs
-        self.outs = left_inputs
-        self.n_gates = next_gate_num
+        return [(left_inputs, "z", UNDEF)]
 
-    def num_gates(self):
-        if self.n_gates is None:
-            for g in self.next_gate():
-                pass
-        return self.n_gates
 
-    def outputs(self):
-        if self.outs is None:
-            for g in self.next_gate():
-                pass
-        return ((self.outs, "z", UNDEF),)
-
-
-class MinMaxValueIndexCircuit(DynamicCircuit):
+class MinMaxValueIndexCircuit(BuilderCircuit):
     #TODO: Add unsigned / signed
     MIN = 0
     MAX = 1
@@ -1313,8 +1411,6 @@ class MinMaxValueIndexCircuit(DynamicCircuit):
         self.n = n
         self.log_n1 = bitlength(n - 1)
         self.bitlength = bitlen
-        self.outs = None
-        self.n_gates = None
         self.signed = signed
 
     def num_input_bits(self):
@@ -1329,19 +1425,13 @@ class MinMaxValueIndexCircuit(DynamicCircuit):
     def num_output_bits(self):
         return self.bitlength + self.log_n1
 
-    def next_gate(self):
-        total_inputs = self.num_input_bits()
-
+    def emit(self, b, inputs):
         if self.minmax_type == self.MIN:
             c = CmpCircuit(self.bitlength, self.bitlength, CmpCircuit.GREATER, self.signed, self.signed)
         elif self.minmax_type == self.MAX:
             c = CmpCircuit(self.bitlength, self.bitlength, CmpCircuit.LESS, self.signed, self.signed)
-        c_num_gates = c.num_gates()
 
         m = MuxCircuit(self.bitlength)
-        m_num_gates = m.num_gates()
-
-        next_gate_num = 0
 
         prev_layer_values = []  # list of values in previous layer
         prev_layer_indices = []  # list of indices in previous layer
@@ -1349,29 +1439,19 @@ class MinMaxValueIndexCircuit(DynamicCircuit):
         # first layer
         for i in xrange(self.n / 2):
             # Compare
-            left_inputs = range(2 * i * self.bitlength, (2 * i + 1) * self.bitlength)
-            right_inputs = range((2 * i + 1) * self.bitlength, (2 * (i + 1)) * self.bitlength)
+            left_inputs = inputs[2 * i * self.bitlength:(2 * i + 1) * self.bitlength]
+            right_inputs = inputs[(2 * i + 1) * self.bitlength:(2 * (i + 1)) * self.bitlength]
             both_inputs = left_inputs + right_inputs
-            for g in c.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-                yield g
-            c_output = c.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0][0]
-            next_gate_num += c_num_gates
+            c_output = b.add_subcircuit(c, both_inputs)[0][0]
 
             prev_layer_indices.append([c_output])
 
             # MUX
-            m_inputs = both_inputs + [c_output]
-            for g in m.subcircuit_next_gate(m_inputs, next_gate_num, total_inputs):
-                yield g
-            m_outputs = m.subcircuit_outputs(m_inputs, next_gate_num, total_inputs)[0]
-            next_gate_num += m_num_gates
-
-            prev_layer_values.append(m_outputs)
+            prev_layer_values.append(b.add_subcircuit(m, both_inputs + [c_output])[0])
 
         # last gate in last layer
         if self.n % 2 == 1:
-            v = range(self.bitlength * (self.n - 1), self.bitlength * self.n)
-            prev_layer_values.append(v)
+            prev_layer_values.append(inputs[self.bitlength * (self.n - 1):self.bitlength * self.n])
             prev_layer_indices.append([None])
 
         # remaining layers
@@ -1386,33 +1466,23 @@ class MinMaxValueIndexCircuit(DynamicCircuit):
                 left_inputs = prev_layer_values[2 * i]
                 right_inputs = prev_layer_values[2 * i + 1]
                 both_inputs = left_inputs + right_inputs
-                for g in c.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-                    yield g
-                c_output = c.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0][0]
-                next_gate_num += c_num_gates
+                c_output = b.add_subcircuit(c, both_inputs)[0][0]
 
                 # MUX index
                 left_index = prev_layer_indices[2 * i]
                 right_index = prev_layer_indices[2 * i + 1]
+                mux_outs = []
                 for j in xrange(d):
                     lj = left_index[j]
                     rj = right_index[j]
                     if rj is None:
-                        yield self.output_gate((lj, c_output), 0b0010)
+                        mux_outs.append(b.add_gate(*self.output_gate((lj, c_output), 0b0010)))
                     else:
-                        yield self.output_gate((lj, rj, c_output), 0b00011011)
-                mux_outs = range(next_gate_num + total_inputs, next_gate_num + total_inputs + d)
-                next_gate_num += d
+                        mux_outs.append(b.add_gate(*self.output_gate((lj, rj, c_output), 0b00011011)))
                 this_layer_indices.append(mux_outs + [c_output])
 
                 # MUX values
-                m_inputs = both_inputs + [c_output]
-                for g in m.subcircuit_next_gate(m_inputs, next_gate_num, total_inputs):
-                    yield g
-                m_outputs = m.subcircuit_outputs(m_inputs, next_gate_num, total_inputs)[0]
-                next_gate_num += m_num_gates
-
-                this_layer_values.append(m_outputs)
+                this_layer_values.append(b.add_subcircuit(m, both_inputs + [c_output])[0])
 
             # last gate in this layer
             if values_in_layer % 2 == 1:
@@ -1424,24 +1494,10 @@ class MinMaxValueIndexCircuit(DynamicCircuit):
             prev_layer_values = this_layer_values
             prev_layer_indices = this_layer_indices
 
-        # determine outputs
-        self.outs = (prev_layer_values, prev_layer_indices)
-        self.n_gates = next_gate_num
+        return [(prev_layer_values[0], "val", UNDEF), (prev_layer_indices[0], "idx", UNSIGNED)]
 
-    def num_gates(self):
-        if self.n_gates is None:
-            for g in self.next_gate():
-                pass
-        return self.n_gates
 
-    def outputs(self):
-        if self.outs is None:
-            for g in self.next_gate():
-                pass
-        return ((self.outs[0][0], "val", UNDEF), (self.outs[1][0], "idx", UNSIGNED))
-
-
-class MinMaxIndexCircuit(DynamicCircuit):
+class MinMaxIndexCircuit(BuilderCircuit):
     #TODO: Add unsigned / signed
     MIN = 0
     MAX = 1
@@ -1460,8 +1516,6 @@ class MinMaxIndexCircuit(DynamicCircuit):
         self.n = n
         self.log_n1 = bitlength(n - 1)
         self.bitlength = bitlen
-        self.outs = None
-        self.n_gates = None
         self.signed = signed
 
     def num_input_bits(self):
@@ -1476,19 +1530,13 @@ class MinMaxIndexCircuit(DynamicCircuit):
     def num_output_bits(self):
         return self.log_n1
 
-    def next_gate(self):
-        total_inputs = self.num_input_bits()
-
+    def emit(self, b, inputs):
         if self.minmax_type == self.MIN:
             c = CmpCircuit(self.bitlength, self.bitlength, CmpCircuit.GREATER, self.signed, self.signed)
         elif self.minmax_type == self.MAX:
             c = CmpCircuit(self.bitlength, self.bitlength, CmpCircuit.LESS, self.signed, self.signed)
-        c_num_gates = c.num_gates()
 
         m = MuxCircuit(self.bitlength)
-        m_num_gates = m.num_gates()
-
-        next_gate_num = 0
 
         prev_layer_values = []  # list of values in previous layer
         prev_layer_indices = []  # list of indices in previous layer
@@ -1496,30 +1544,20 @@ class MinMaxIndexCircuit(DynamicCircuit):
         # first layer
         for i in xrange(self.n / 2):
             # Compare
-            left_inputs = range(2 * i * self.bitlength, (2 * i + 1) * self.bitlength)
-            right_inputs = range((2 * i + 1) * self.bitlength, (2 * (i + 1)) * self.bitlength)
+            left_inputs = inputs[2 * i * self.bitlength:(2 * i + 1) * self.bitlength]
+            right_inputs = inputs[(2 * i + 1) * self.bitlength:(2 * (i + 1)) * self.bitlength]
             both_inputs = left_inputs + right_inputs
-            for g in c.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-                yield g
-            c_output = c.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0][0]
-            next_gate_num += c_num_gates
+            c_output = b.add_subcircuit(c, both_inputs)[0][0]
 
             prev_layer_indices.append([c_output])
 
             # MUX value
             if self.n != 2:
-                m_inputs = both_inputs + [c_output]
-                for g in m.subcircuit_next_gate(m_inputs, next_gate_num, total_inputs):
-                    yield g
-                m_outputs = m.subcircuit_outputs(m_inputs, next_gate_num, total_inputs)[0]
-                next_gate_num += m_num_gates
-
-                prev_layer_values.append(m_outputs)
+                prev_layer_values.append(b.add_subcircuit(m, both_inputs + [c_output])[0])
 
         # last gate in last layer
         if self.n % 2 == 1:
-            v = range(self.bitlength * (self.n - 1), self.bitlength * self.n)
-            prev_layer_values.append(v)
+            prev_layer_values.append(inputs[self.bitlength * (self.n - 1):self.bitlength * self.n])
             prev_layer_indices.append([None])
 
         # remaining layers
@@ -1534,34 +1572,24 @@ class MinMaxIndexCircuit(DynamicCircuit):
                 left_inputs = prev_layer_values[2 * i]
                 right_inputs = prev_layer_values[2 * i + 1]
                 both_inputs = left_inputs + right_inputs
-                for g in c.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-                    yield g
-                c_output = c.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0][0]
-                next_gate_num += c_num_gates
+                c_output = b.add_subcircuit(c, both_inputs)[0][0]
 
                 # MUX index
                 left_index = prev_layer_indices[2 * i]
                 right_index = prev_layer_indices[2 * i + 1]
+                mux_outs = []
                 for j in xrange(d):
                     lj = left_index[j]
                     rj = right_index[j]
                     if rj is None:
-                        yield self.output_gate((lj, c_output), 0b0010)
+                        mux_outs.append(b.add_gate(*self.output_gate((lj, c_output), 0b0010)))
                     else:
-                        yield self.output_gate((lj, rj, c_output), 0b00011011)
-                mux_outs = range(next_gate_num + total_inputs, next_gate_num + total_inputs + d)
-                next_gate_num += d
+                        mux_outs.append(b.add_gate(*self.output_gate((lj, rj, c_output), 0b00011011)))
                 this_layer_indices.append(mux_outs + [c_output])
 
                 # MUX values but not in last layer
                 if d != self.log_n1 - 1:
-                    m_inputs = both_inputs + [c_output]
-                    for g in m.subcircuit_next_gate(m_inputs, next_gate_num, total_inputs):
-                        yield g
-                    m_outputs = m.subcircuit_outputs(m_inputs, next_gate_num, total_inputs)[0]
-                    next_gate_num += m_num_gates
-
-                    this_layer_values.append(m_outputs)
+                    this_layer_values.append(b.add_subcircuit(m, both_inputs + [c_output])[0])
 
             # last gate in this layer
             if values_in_layer % 2 == 1:
@@ -1573,24 +1601,10 @@ class MinMaxIndexCircuit(DynamicCircuit):
             prev_layer_values = this_layer_values
             prev_layer_indices = this_layer_indices
 
-        # determine outputs
-        self.outs = prev_layer_indices
-        self.n_gates = next_gate_num
+        return [(prev_layer_indices[0], "idx", UNSIGNED)]
 
-    def num_gates(self):
-        if self.n_gates is None:
-            for g in self.next_gate():
-                pass
-        return self.n_gates
 
-    def outputs(self):
-        if self.outs is None:
-            for g in self.next_gate():
-                pass
-        return ((self.outs[0], "idx", UNSIGNED),)
-
-
-class VectorMultiplicationCircuit(DynamicCircuit):
+class VectorMultiplicationCircuit(BuilderCircuit):
     def __init__(self, n, bitlength, MULT=FastMultiplicationCircuit):
         """Circuit that computes z = sum(x_i * y_i),
            where x_i and y_i are given in sign-magnitude representation
@@ -1606,8 +1620,6 @@ class VectorMultiplicationCircuit(DynamicCircuit):
             raise ValueError("Number of inputs must be >= 1")
         self.n = n
         self.bitlength = bitlength
-        self.outs = None
-        self.n_gates = None
         self.MULT = MULT
 
     def num_input_bits(self):
@@ -1624,42 +1636,24 @@ class VectorMultiplicationCircuit(DynamicCircuit):
         return ret
 
     def num_output_bits(self):
-        if self.outs is None:
-            for g in self.next_gate():
-                pass
-        return len(self.outs)
-
-    def next_gate(self):
-        total_inputs = self.num_input_bits()
-        next_gate_num = 0
+        return len(self.outputs()[0][0])
 
+    def emit(self, b, inputs):
         m = self.MULT(self.bitlength, self.bitlength)
-        m_num_gates = m.num_gates()
 
         # multiply magnitudes
-        left_inputs = range(1, 1 + self.bitlength)
-        right_inputs = range(2 + self.bitlength, 2 + 2 * self.bitlength)
-        both_inputs = left_inputs + right_inputs
-        for g in m.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-            yield g
-        m_output = m.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0]
+        left_inputs = inputs[1:1 + self.bitlength]
+        right_inputs = inputs[2 + self.bitlength:2 + 2 * self.bitlength]
+        m_output = b.add_subcircuit(m, left_inputs + right_inputs)[0]
         m_output_len = len(m_output)
-        next_gate_num += m_num_gates
 
         # multiply signs
-        yield self.output_gate((0, 1 + self.bitlength), 0b0110)
-        sign_output = total_inputs + next_gate_num
-        next_gate_num += 1
+        sign_output = b.add_gate(*self.output_gate((inputs[0], inputs[1 + self.bitlength]), 0b0110))
 
         # convert into two's complement
-        both_inputs = m_output + [sign_output]
         s = AddSub0Circuit(m_output_len)
-        s_num_gates = s.num_gates()
-        for g in s.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-            yield g
-        last_output = s.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0]
+        last_output = b.add_subcircuit(s, m_output + [sign_output])[0]
         last_output_len = s.num_output_bits()
-        next_gate_num += s_num_gates
 
         # optimization: drop some msbs during accumulation
         max_value = (1 << self.bitlength) - 1
@@ -1670,22 +1664,16 @@ class VectorMultiplicationCircuit(DynamicCircuit):
 
         for i in xrange(1, self.n):
             # multiply magnitudes
-            left_inputs = range(i * 2 * (self.bitlength + 1) + 1, i * 2 * (self.bitlength + 1) + 1 + self.bitlength)
-            right_inputs = range(i * 2 * (self.bitlength + 1) + 2 + self.bitlength,
-                                 i * 2 * (self.bitlength + 1) + 2 + 2 * self.bitlength)
-            both_inputs = left_inputs + right_inputs
-            for g in m.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-                yield g
-            m_output = m.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0]
+            left_inputs = inputs[i * 2 * (self.bitlength + 1) + 1:i * 2 * (self.bitlength + 1) + 1 + self.bitlength]
+            right_inputs = inputs[i * 2 * (self.bitlength + 1) + 2 + self.bitlength:
+                                  i * 2 * (self.bitlength + 1) + 2 + 2 * self.bitlength]
+            m_output = b.add_subcircuit(m, left_inputs + right_inputs)[0]
             m_output_len = len(m_output)
-            next_gate_num += m_num_gates
 
             # multiply signs
-            left_sign = i * 2 * (self.bitlength + 1)
-            right_sign = i * 2 * (self.bitlength + 1) + 1 + self.bitlength
-            yield self.output_gate((left_sign, right_sign), 0b0110)
-            sign_output = total_inputs + next_gate_num
-            next_gate_num += 1
+            left_sign = inputs[i * 2 * (self.bitlength + 1)]
+            right_sign = inputs[i * 2 * (self.bitlength + 1) + 1 + self.bitlength]
+            sign_output = b.add_gate(*self.output_gate((left_sign, right_sign), 0b0110))
 
             # accumulate
             both_inputs = last_output + m_output + [sign_output]
@@ -1697,30 +1685,12 @@ class VectorMultiplicationCircuit(DynamicCircuit):
                 s = AddSubCircuit(last_output_len, m_output_len, AddSubCircuit.NODROP_MSB)
                 max_sum_bitlen += 1
 
-            s_num_gates = s.num_gates()
-            for g in s.subcircuit_next_gate(both_inputs, next_gate_num, total_inputs):
-                yield g
-            last_output = s.subcircuit_outputs(both_inputs, next_gate_num, total_inputs)[0]
+            last_output = b.add_subcircuit(s, both_inputs)[0]
             last_output_len = s.num_output_bits()
-            next_gate_num += s_num_gates
 
             max_sum += max_product
 
-        # determine outputs
-        self.outs = last_output
-        self.n_gates = next_gate_num
-
-    def num_gates(self):
-        if self.n_gates is None:
-            for g in self.next_gate():
-                pass
-        return self.n_gates
-
-    def outputs(self):
-        if self.outs is None:
-            for g in self.next_gate():
-                pass
-        return ((self.outs, "z", SIGNED),)
+        return [(last_output, "z", SIGNED)]
 
 
 from reader import *
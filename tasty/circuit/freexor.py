@@ -0,0 +1,515 @@
+# -*- coding: utf-8 -*-
+
+"""Circuits with the minimal number of non-XOR gates for FreeXOR garbling
+
+The circuits compute the same functions with the same inputs and outputs as
+their counterparts in L{tasty.circuit.dynamic}, but consist of 2-input XOR
+and AND-type gates only: the adders, subtractors and comparators need one
+AND gate per bit [KSS09] and the n-bit multiplexer n AND gates. Use
+L{gate_count_table} to compare them with the dynamic circuits.
+"""
+
+from tasty.circuit import Circuit, SIGNED, UNSIGNED, UNDEF, DROP_MSB, NODROP_MSB
+from tasty.circuit.dynamic import DynamicCircuit, AddCircuit, SubCircuit, CmpCircuit, MuxCircuit, \
+    MinMaxValueCircuit, MinMaxValueIndexCircuit, MinMaxIndexCircuit
+from tasty.circuit.transformations import replace_3_by_2, remove_redundant_gates, FALSE, TRUE
+
+__all__ = ["FreeXORAddCircuit", "FreeXORSubCircuit", "FreeXORCmpCircuit", "FreeXORMuxCircuit",
+           "FreeXORMinMaxValueCircuit", "FreeXORTreeMinMaxValueCircuit", "FreeXORMinMaxValueIndexCircuit",
+           "FreeXORMinMaxIndexCircuit", "GateList", "tournament", "gate_count_table"]
+
+
+class GateList(object):
+    """ Gates of a circuit built from 2-input gates on wire values
+
+        Values are (wire << 1) | inverted or the constants FALSE and TRUE
+        (see L{remove_redundant_gates}). Constants are folded and inversions
+        are moved into the truth tables of the gates, so they are free.
+    """
+
+    def __init__(self, num_inputs):
+        self.num_inputs = num_inputs
+        self.gates = []
+        self.fanout = [0] * num_inputs
+        self.outputs = {}
+        # gates whose truth table was inverted for an output
+        self.inverted = set()
+
+    def gate(self, ins, tab):
+        """ append gate with input wires ins and truth table tab, returns its wire """
+        for i in ins:
+            self.fanout[i] += 1
+        self.gates.append([tuple(ins), tab])
+        self.fanout.append(0)
+        return self.num_inputs + len(self.gates) - 1
+
+    @staticmethod
+    def input_values(first, bitlen):
+        """ values of the input bits first..first + bitlen - 1 """
+        return [i << 1 for i in xrange(first, first + bitlen)]
+
+    def xor(self, a, b):
+        if a >> 1 == -1:
+            return b ^ (a & 1)
+        if b >> 1 == -1:
+            return a ^ (b & 1)
+        if a >> 1 == b >> 1:
+            return FALSE | ((a ^ b) & 1)
+        return (self.gate((a >> 1, b >> 1), 0b0110) << 1) | ((a ^ b) & 1)
+
+    def and_(self, a, b):
+        if a >> 1 == -1:
+            return b if a == TRUE else FALSE
+        if b >> 1 == -1:
+            return a if b == TRUE else FALSE
+        if a >> 1 == b >> 1:
+            return a if a == b else FALSE
+        ia = a & 1
+        ib = b & 1
+        tab = 0
+        for v in xrange(4):
+            tab = (tab << 1) | (((v >> 1) ^ ia) & ((v & 1) ^ ib))
+        return self.gate((a >> 1, b >> 1), tab) << 1
+
+    def or_(self, a, b):
+        return self.and_(a ^ 1, b ^ 1) ^ 1
+
+    def maj(self, a, b, c):
+        """ majority of a, b and c with one AND gate """
+        if c >> 1 == -1:
+            return self.or_(a, b) if c == TRUE else self.and_(a, b)
+        if a >> 1 == -1:
+            return self.maj(b, c, a)
+        if b >> 1 == -1:
+            return self.maj(a, c, b)
+        return self.xor(c, self.and_(self.xor(a, c), self.xor(b, c)))
+
+    def mux(self, s, a, b):
+        """ a if s is 0, b if s is 1 """
+        if a == FALSE:
+            return self.and_(s, b)
+        if b == FALSE:
+            return self.and_(s ^ 1, a)
+        return self.xor(a, self.and_(s, self.xor(a, b)))
+
+    def add(self, x, y, carry=FALSE):
+        """ x + y + carry for x and y of the same length, the carry out is dropped """
+        n = len(x)
+        z = []
+        for i in xrange(n):
+            z.append(self.xor(self.xor(x[i], y[i]), carry))
+            if i < n - 1:
+                carry = self.maj(x[i], y[i], carry)
+        return z
+
+    def less(self, x, y, strict=True):
+        """ x < y (x <= y if not strict) for unsigned x and y of the same length """
+        borrow = FALSE if strict else TRUE
+        for i in xrange(len(x)):
+            borrow = self.maj(x[i] ^ 1, y[i], borrow)
+        return borrow
+
+    def equal(self, x, y):
+        """ x == y for x and y of the same length """
+        neq = FALSE
+        for i in xrange(len(x)):
+            neq = self.or_(neq, self.xor(x[i], y[i]))
+        return neq ^ 1
+
+    def combine(self, hi, lo):
+        """ (generate, propagate) of two adjacent groups of bits, hi above lo """
+        return self.xor(hi[0], self.and_(hi[1], lo[0])), self.and_(hi[1], lo[1])
+
+    def prefix(self, gp, sklansky=False):
+        """ parallel prefix of the (generate, propagate) pairs of the bits
+            in Brent-Kung (2 log n levels, less than 2n combinations) or
+            Sklansky order (log n levels, n/2 log n combinations)
+
+            @rtype: list
+            @return: the generate values of bits 0..i, i.e., the carries
+        """
+        gp = list(gp)
+        n = len(gp)
+        d = 1
+        while d < n:
+            if sklansky:
+                for i in xrange(n):
+                    if i & d:
+                        gp[i] = self.combine(gp[i], gp[(i & ~(d - 1)) - 1])
+            else:
+                for i in xrange(2 * d - 1, n, 2 * d):
+                    gp[i] = self.combine(gp[i], gp[i - d])
+            d *= 2
+        if not sklansky:
+            d /= 2
+            while d > 1:
+                d /= 2
+                for i in xrange(3 * d - 1, n, 2 * d):
+                    gp[i] = self.combine(gp[i], gp[i - d])
+        return [g for g, p in gp]
+
+    def reduce(self, gp):
+        """ (generate, propagate) of all bits combined in a balanced tree """
+        if len(gp) == 1:
+            return gp[0]
+        m = len(gp) / 2
+        return self.combine(self.reduce(gp[m:]), self.reduce(gp[:m]))
+
+    def prefix_add(self, x, y, carry=FALSE, sklansky=False):
+        """ L{add} with the carries computed by L{prefix} """
+        props = [self.xor(a, b) for a, b in zip(x, y)]
+        gp = [(self.maj(x[0], y[0], carry), props[0])]
+        gp += [(self.and_(a, b), p) for a, b, p in zip(x, y, props)[1:]]
+        carries = [carry] + self.prefix(gp[:-1], sklansky)
+        return [self.xor(p, c) for p, c in zip(props, carries)]
+
+    def tree_less(self, x, y, strict=True):
+        """ L{less} in a tree of depth log n """
+        gp = [(self.maj(x[0] ^ 1, y[0], FALSE if strict else TRUE), FALSE)]
+        gp += [(self.and_(a ^ 1, b), self.xor(a, b) ^ 1) for a, b in zip(x, y)[1:]]
+        return self.reduce(gp)[0]
+
+    def tree_equal(self, x, y):
+        """ L{equal} in a tree of depth log n """
+        neq = [self.xor(a, b) for a, b in zip(x, y)]
+        while len(neq) > 1:
+            neq = [self.or_(neq[i], neq[i + 1]) for i in xrange(0, len(neq) - 1, 2)] + neq[len(neq) & ~1:]
+        return neq[0] ^ 1
+
+    def output(self, val):
+        """ wire of val, inverted values and constants become gates """
+        try:
+            return self.outputs[val]
+        except KeyError:
+            pass
+        wire = val >> 1
+        if wire == -1:
+            ret = self.gate((), val & 1)
+        elif wire in self.inverted:
+            ret = wire if val & 1 else self.gate((wire,), 0b10)
+        elif not val & 1:
+            ret = wire
+        elif wire >= self.num_inputs and not self.fanout[wire] and val ^ 1 not in self.outputs:
+            # invert the truth table of the otherwise unused gate, or of a
+            # non-XOR gate only used by it if it is a XOR gate
+            g = self.gates[wire - self.num_inputs]
+            if g[1] == 0b0110:
+                for i in g[0]:
+                    if i >= self.num_inputs and self.fanout[i] == 1 and \
+                            self.gates[i - self.num_inputs][1] != 0b0110:
+                        g = self.gates[i - self.num_inputs]
+                        break
+            g[1] ^= (1 << (1 << len(g[0]))) - 1
+            self.inverted.add(wire)
+            ret = wire
+        else:
+            ret = self.gate((wire,), 0b10)
+        self.outputs[val] = ret
+        return ret
+
+    def compact(self, outs):
+        """ drop the gates that do not reach one of the output wires outs
+
+        @rtype: tuple
+        @return: the remaining gates and outs with the wires renumbered
+        """
+        n = self.num_inputs
+        live = [False] * len(self.gates)
+        for o in outs:
+            if o >= n:
+                live[o - n] = True
+        for ix in reversed(xrange(len(self.gates))):
+            if live[ix]:
+                for i in self.gates[ix][0]:
+                    if i >= n:
+                        live[i - n] = True
+        translation = range(n) + [None] * len(self.gates)
+        gates = []
+        for ix, (ins, tab) in enumerate(self.gates):
+            if live[ix]:
+                translation[n + ix] = n + len(gates)
+                gates.append((tuple(translation[i] for i in ins), tab))
+        return gates, [translation[o] for o in outs]
+
+
+def _extend(values, bitlen, signed):
+    """ values sign or zero extended to bitlen """
+    return values + [values[-1] if signed == SIGNED else FALSE] * (bitlen - len(values))
+
+
+class FreeXORCircuit(DynamicCircuit):
+    """ Base class of circuits built with L{GateList} by L{build} """
+
+    # class of the gate list passed to build
+    gate_list = GateList
+
+    _gates = None
+
+    def build(self, g):
+        """ emit the gates of the circuit to GateList g
+
+        @rtype: list
+        @return: (values, description, type) of each output
+        """
+        raise NotImplementedError()
+
+    def _build(self):
+        if self._gates is None:
+            g = self.gate_list(self.num_input_bits())
+            outs = self.build(g)
+            wires = [g.output(val) for values, desc, type_ in outs for val in values]
+            self._gates, wires = g.compact(wires)
+            self._outs = []
+            for values, desc, type_ in outs:
+                self._outs.append((wires[:len(values)], desc, type_))
+                wires = wires[len(values):]
+        return self._gates
+
+    def num_gates(self):
+        return len(self._build())
+
+    def next_gate(self):
+        return iter(self._build())
+
+    def outputs(self):
+        self._build()
+        return self._outs
+
+    def emit(self, b, inputs):
+        """ copy the gates into CircuitBuilder b, see L{BuilderCircuit.emit} """
+        return b.copy_circuit(self, inputs)
+
+
+class FreeXORAddCircuit(FreeXORCircuit, AddCircuit):
+    """ L{AddCircuit} with one AND gate per bit, signed x is supported, too """
+
+    def build(self, g):
+        n = self.num_output_bits()
+        x = _extend(g.input_values(0, self.x_bitlength), n, self.type_x)
+        y = _extend(g.input_values(self.x_bitlength, self.y_bitlength), n, self.type_y)
+        if self.type_x == UNSIGNED and self.type_y == UNSIGNED:
+            o_type = UNSIGNED
+        else:
+            o_type = SIGNED
+        return [(g.add(x, y), "z", o_type)]
+
+
+class FreeXORSubCircuit(FreeXORCircuit, SubCircuit):
+    """ L{SubCircuit} with one AND gate per bit """
+
+    def build(self, g):
+        n = self.num_output_bits()
+        x = _extend(g.input_values(0, self.x_bitlength), n, UNSIGNED)
+        y = _extend(g.input_values(self.x_bitlength, self.y_bitlength), n, self.type_y)
+        # x - y = x + ~y + 1
+        return [(g.add(x, [v ^ 1 for v in y], TRUE), "z", SIGNED)]
+
+
+class FreeXORCmpCircuit(FreeXORCircuit, CmpCircuit):
+    """ L{CmpCircuit} with one AND gate per bit (one less for (NOT)EQUAL),
+        signed comparisons are supported
+    """
+
+    def __init__(self, x_bitlength, y_bitlength, cmp_type, signed_x, signed_y):
+        CmpCircuit.__init__(self, x_bitlength, y_bitlength, cmp_type, signed_x, signed_y)
+        self.cmp_type = cmp_type
+
+    def build(self, g):
+        # compare as signed numbers if one of x and y is signed, flipping
+        # the sign bits maps them to unsigned numbers of the same order
+        signed_x = self.signed_x == SIGNED
+        signed_y = self.signed_y == SIGNED
+        n = self.x_bitlength + (signed_x != signed_y)
+        x = _extend(g.input_values(0, self.x_bitlength), n, self.signed_x)
+        y = _extend(g.input_values(self.x_bitlength, self.y_bitlength), n, self.signed_y)
+        if signed_x or signed_y:
+            x[-1] ^= 1
+            y[-1] ^= 1
+
+        if self.cmp_type == self.LESS:
+            z = g.less(x, y)
+        elif self.cmp_type == self.LESSEQUAL:
+            z = g.less(x, y, False)
+        elif self.cmp_type == self.GREATER:
+            z = g.less(y, x)
+        elif self.cmp_type == self.GREATEREQUAL:
+            z = g.less(y, x, False)
+        elif self.cmp_type == self.EQUAL:
+            z = g.equal(x, y)
+        else:
+            z = g.equal(x, y) ^ 1
+        return [([z], "z", UNDEF)]
+
+
+class FreeXORMuxCircuit(FreeXORCircuit, MuxCircuit):
+    """ L{MuxCircuit} with one AND gate per bit """
+
+    def build(self, g):
+        x_0 = g.input_values(0, self.bitlength)
+        x_1 = g.input_values(self.bitlength, self.bitlength)
+        ctrl = 2 * self.bitlength << 1
+        return [([g.mux(ctrl, a, b) for a, b in zip(x_0, x_1)], "z", UNDEF)]
+
+
+def _signed_order(values, signed):
+    """ values with flipped sign bit if signed, see L{FreeXORCmpCircuit} """
+    if signed == SIGNED:
+        return values[:-1] + [values[-1] ^ 1]
+    return values
+
+
+class FreeXORMinMaxValueCircuit(FreeXORCircuit, MinMaxValueCircuit):
+    """ L{MinMaxValueCircuit} with 2 * bitlength AND gates per input """
+
+    def build(self, g):
+        left = g.input_values(0, self.bitlength)
+        for i in xrange(1, self.n):
+            right = g.input_values(i * self.bitlength, self.bitlength)
+            l = _signed_order(left, self.signed)
+            r = _signed_order(right, self.signed)
+            if self.minmax_type == self.MIN:
+                c = g.less(r, l, False)
+            else:
+                c = g.less(l, r)
+            left = [g.mux(c, a, b) for a, b in zip(left, right)]
+        return [(left, "z", UNDEF)]
+
+
+def tournament(g, values, minmax_type, signed, with_value=True):
+    """ emit a tournament tree selecting the minimum or maximum of values
+        to GateList g
+
+    The values are compared pairwise in ceil(log n) rounds, the first of
+    equal values wins. The index bits of the winners are multiplexed along
+    with the values, bit i of the index is the outcome of the comparison in
+    round i.
+
+    @type values: list
+    @param values: lists of gate list values of the n inputs
+
+    @type minmax_type: int
+    @param minmax_type: L{MinMaxValueCircuit.MIN} or L{MinMaxValueCircuit.MAX}
+
+    @type signed: int
+    @param signed: SIGNED or UNSIGNED
+
+    @type with_value: bool
+    @param with_value: compute the winner's value in the final round
+
+    @rtype: tuple
+    @return: value (None without with_value) and index bits of the winner
+    """
+    indices = [[] for v in values]
+    while len(values) > 1:
+        next_values = []
+        next_indices = []
+        last = len(values) == 2
+        for i in xrange(0, len(values) - 1, 2):
+            left, right = values[i], values[i + 1]
+            l = _signed_order(left, signed)
+            r = _signed_order(right, signed)
+            if minmax_type == MinMaxValueCircuit.MIN:
+                c = g.less(r, l)
+            else:
+                c = g.less(l, r)
+            if with_value or not last:
+                next_values.append([g.mux(c, a, b) for a, b in zip(left, right)])
+            else:
+                next_values.append(None)
+            next_indices.append([g.mux(c, a, b) for a, b in zip(indices[i], indices[i + 1])] + [c])
+        if len(values) % 2:
+            next_values.append(values[-1])
+            next_indices.append(indices[-1] + [FALSE])
+        values = next_values
+        indices = next_indices
+    return values[0], indices[0]
+
+
+class FreeXORTreeMinMaxValueCircuit(FreeXORMinMaxValueCircuit):
+    """ L{FreeXORMinMaxValueCircuit} comparing in a L{tournament} tree with
+        ceil(log n) comparators on each path instead of a chain of n - 1,
+        the number of gates is the same
+    """
+
+    def build(self, g):
+        values = [g.input_values(i * self.bitlength, self.bitlength) for i in xrange(self.n)]
+        value, index = tournament(g, values, self.minmax_type, self.signed)
+        return [(value, "z", UNDEF)]
+
+
+class FreeXORMinMaxValueIndexCircuit(FreeXORCircuit, MinMaxValueIndexCircuit):
+    """ L{MinMaxValueIndexCircuit} with 2 * bitlength AND gates per input and
+        the index bits of the L{tournament} tree
+    """
+
+    def tournament(self, g, with_value=True):
+        """ emit the tournament tree, returns values and index of the winner """
+        values = [g.input_values(i * self.bitlength, self.bitlength) for i in xrange(self.n)]
+        return tournament(g, values, self.minmax_type, self.signed, with_value)
+
+    def build(self, g):
+        value, index = self.tournament(g)
+        return [(value, "val", UNDEF), (index, "idx", UNSIGNED)]
+
+
+class FreeXORMinMaxIndexCircuit(FreeXORMinMaxValueIndexCircuit, MinMaxIndexCircuit):
+    """ L{MinMaxIndexCircuit}, the winner's value is not computed """
+
+    def __init__(self, n, bitlen, minmax_type, signed):
+        MinMaxIndexCircuit.__init__(self, n, bitlen, minmax_type, signed)
+
+    def num_output_bits(self):
+        return self.log_n1
+
+    def build(self, g):
+        value, index = self.tournament(g, False)
+        return [(index, "idx", UNSIGNED)]
+
+
+def non_xor_gates(circuit, optimize=True):
+    """ number of gates of circuit that are not 2-input XOR gates, after
+        optimization for FreeXOR garbling if optimize is set
+    """
+    if optimize:
+        circuit = remove_redundant_gates(replace_3_by_2(circuit))
+    gates = Circuit.gate_types(circuit)
+    return sum(num for key, num in gates.iteritems() if key != "2_XOR")
+
+
+def gate_count_table(bitlengths=(8, 16, 32, 64), n=8):
+    """ Compare the number of non-XOR gates of the dynamic circuits with
+        those of their FreeXOR counterparts
+
+        The dynamic circuits are counted as built, which is what the cost
+        analysis sees, and after optimization for FreeXOR garbling (see
+        L{FreeXORReducedRowGarbledCircuit.optimize_circuit}).
+
+        @type bitlengths: iterable
+        @param bitlengths: bit lengths of the operands
+
+        @type n: int
+        @param n: number of inputs of the min/max circuits
+
+        @rtype: list
+        @return: rows (circuit, bit length, dynamic, optimized dynamic,
+        FreeXOR non-XOR gates)
+    """
+    circuits = (("Add", lambda cls, l: cls(l, l, UNSIGNED, UNSIGNED), AddCircuit, FreeXORAddCircuit),
+                ("Sub", lambda cls, l: cls(l, l, UNSIGNED), SubCircuit, FreeXORSubCircuit),
+                ("Cmp <", lambda cls, l: cls(l, l, cls.LESS, UNSIGNED, UNSIGNED), CmpCircuit, FreeXORCmpCircuit),
+                ("Cmp <=", lambda cls, l: cls(l, l, cls.LESSEQUAL, UNSIGNED, UNSIGNED),
+                 CmpCircuit, FreeXORCmpCircuit),
+                ("Cmp ==", lambda cls, l: cls(l, l, cls.EQUAL, UNSIGNED, UNSIGNED), CmpCircuit, FreeXORCmpCircuit),
+                ("Mux", lambda cls, l: cls(l), MuxCircuit, FreeXORMuxCircuit),
+                ("MinValue", lambda cls, l: cls(n, l, cls.MIN, UNSIGNED),
+                 MinMaxValueCircuit, FreeXORMinMaxValueCircuit),
+                ("MinValueIndex", lambda cls, l: cls(n, l, cls.MIN, UNSIGNED),
+                 MinMaxValueIndexCircuit, FreeXORMinMaxValueIndexCircuit),
+                ("MinIndex", lambda cls, l: cls(n, l, cls.MIN, UNSIGNED),
+                 MinMaxIndexCircuit, FreeXORMinMaxIndexCircuit))
+    rows = []
+    for name, create, dynamic, freexor in circuits:
+        for l in bitlengths:
+            c = create(dynamic, l)
+            rows.append((name, l, non_xor_gates(c, False), non_xor_gates(c), non_xor_gates(create(freexor, l), False)))
+    return rows
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+"""Circuit libraries selectable with circuit_library"""
+
+from tasty import state
+from tasty.circuit.dynamic import AddCircuit, SubCircuit, CmpCircuit, MuxCircuit, \
+    MinMaxValueCircuit, MinMaxValueIndexCircuit, MinMaxIndexCircuit
+from tasty.circuit.freexor import *
+from tasty.circuit.lowdepth import *
+
+__all__ = ["CIRCUIT_LIBRARIES", "DEFAULT_CIRCUIT_LIBRARY", "circuit_library", "library_circuit"]
+
+# circuit classes replacing those of tasty.circuit.dynamic in each library
+CIRCUIT_LIBRARIES = {"dynamic" : {},
+                     "freexor" : {AddCircuit : FreeXORAddCircuit,
+                                  SubCircuit : FreeXORSubCircuit,
+                                  CmpCircuit : FreeXORCmpCircuit,
+                                  MuxCircuit : FreeXORMuxCircuit,
+                                  MinMaxValueCircuit : FreeXORTreeMinMaxValueCircuit,
+                                  MinMaxValueIndexCircuit : FreeXORMinMaxValueIndexCircuit,
+                                  MinMaxIndexCircuit : FreeXORMinMaxIndexCircuit},
+                     "lowdepth" : {AddCircuit : LowDepthAddCircuit,
+                                   SubCircuit : LowDepthSubCircuit,
+                                   CmpCircuit : LowDepthCmpCircuit,
+                                   MuxCircuit : FreeXORMuxCircuit,
+                                   MinMaxValueCircuit : LowDepthMinMaxValueCircuit,
+                                   MinMaxValueIndexCircuit : LowDepthMinMaxValueIndexCircuit,
+                                   MinMaxIndexCircuit : LowDepthMinMaxIndexCircuit}}
+
+DEFAULT_CIRCUIT_LIBRARY = "dynamic"
+
+def circuit_library(name=None):
+    """Returns the replacements of the circuit library selected with circuit_library"""
+    if name is None:
+        name = getattr(state.config, "circuit_library", None) or DEFAULT_CIRCUIT_LIBRARY
+    try:
+        return CIRCUIT_LIBRARIES[name]
+    except KeyError:
+        raise ValueError("unknown circuit_library %r, expected one of %s" %
+                         (name, ", ".join(sorted(CIRCUIT_LIBRARIES))))
+
+def library_circuit(cls, name=None):
+    """Returns the circuit class of the selected circuit library implementing cls"""
+    return circuit_library(name).get(cls, cls)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+"""Adders and comparators of logarithmic depth for level-parallel garbling
+
+The carries of the adders are computed with a Brent-Kung parallel prefix
+network (see L{GateList.prefix}), which needs less than four AND gates per
+bit on 2 log n levels, the comparators combine the bits in a balanced tree
+with less than three AND gates per bit on log n + 1 levels and the min/max
+circuits compare their inputs in a tournament tree, so there are only
+logarithmically many comparators on each path. The circuits of
+L{tasty.circuit.freexor} need only one AND gate per bit, but on n levels,
+so these trade size for depth. Select them for the operations of garbled
+values with the circuit_library "lowdepth".
+"""
+
+from tasty.circuit import UNSIGNED
+from tasty.circuit.dynamic import MinMaxValueCircuit, MinMaxValueIndexCircuit, MinMaxIndexCircuit
+from tasty.circuit.freexor import GateList, FreeXORAddCircuit, FreeXORSubCircuit, FreeXORCmpCircuit, \
+    FreeXORMinMaxValueCircuit, FreeXORTreeMinMaxValueCircuit, FreeXORMinMaxValueIndexCircuit, \
+    FreeXORMinMaxIndexCircuit
+from tasty.circuit.transformations import FALSE
+
+__all__ = ["LowDepthAddCircuit", "LowDepthSubCircuit", "LowDepthCmpCircuit", "LowDepthMinMaxValueCircuit",
+           "LowDepthMinMaxValueIndexCircuit", "LowDepthMinMaxIndexCircuit", "LowDepthGateList", "minmax_depth_table"]
+
+
+class LowDepthGateList(GateList):
+    """ L{GateList} with adders and comparators of logarithmic depth """
+
+    def add(self, x, y, carry=FALSE):
+        return self.prefix_add(x, y, carry)
+
+    def less(self, x, y, strict=True):
+        return self.tree_less(x, y, strict)
+
+    def equal(self, x, y):
+        return self.tree_equal(x, y)
+
+
+class LowDepthAddCircuit(FreeXORAddCircuit):
+    """ L{FreeXORAddCircuit} of depth O(log n) """
+
+    gate_list = LowDepthGateList
+
+
+class LowDepthSubCircuit(FreeXORSubCircuit):
+    """ L{FreeXORSubCircuit} of depth O(log n) """
+
+    gate_list = LowDepthGateList
+
+
+class LowDepthCmpCircuit(FreeXORCmpCircuit):
+    """ L{FreeXORCmpCircuit} of depth O(log n) """
+
+    gate_list = LowDepthGateList
+
+
+class LowDepthMinMaxValueCircuit(FreeXORTreeMinMaxValueCircuit):
+    """ L{FreeXORTreeMinMaxValueCircuit} with comparators of depth O(log n) """
+
+    gate_list = LowDepthGateList
+
+
+class LowDepthMinMaxValueIndexCircuit(FreeXORMinMaxValueIndexCircuit):
+    """ L{FreeXORMinMaxValueIndexCircuit} with comparators of depth O(log n) """
+
+    gate_list = LowDepthGateList
+
+
+class LowDepthMinMaxIndexCircuit(FreeXORMinMaxIndexCircuit):
+    """ L{FreeXORMinMaxIndexCircuit} with comparators of depth O(log n) """
+
+    gate_list = LowDepthGateList
+
+
+def minmax_depth_table(ns=(2, 8, 42, 128), bitlength=32):
+    """ Compare the number of non-XOR gates and the depth of the min/max
+        circuits: the chains of MinMaxValueCircuit and
+        FreeXORMinMaxValueCircuit and the tournament trees of the others
+
+        @type ns: iterable
+        @param ns: numbers of inputs
+
+        @type bitlength: int
+        @param bitlength: bit length of the inputs
+
+        @rtype: list
+        @return: rows (circuit, n, non-XOR gates, depth, non-XOR depth)
+    """
+    circuits = (MinMaxValueCircuit, FreeXORMinMaxValueCircuit, FreeXORTreeMinMaxValueCircuit,
+                LowDepthMinMaxValueCircuit,
+                MinMaxValueIndexCircuit, FreeXORMinMaxValueIndexCircuit, LowDepthMinMaxValueIndexCircuit,
+                MinMaxIndexCircuit, FreeXORMinMaxIndexCircuit, LowDepthMinMaxIndexCircuit)
+    rows = []
+    for cls in circuits:
+        for n in ns:
+            c = cls(n, bitlength, cls.MIN, UNSIGNED)
+            gates = c.gate_types()
+            rows.append((cls.__name__, n, sum(num for key, num in gates.iteritems() if key != "2_XOR"),
+                         c.depth(), c.nonxor_depth()))
+    return rows
@@ -3,10 +3,12 @@
 from string import rstrip
 
 from tasty.circuit import Circuit, SIGNED, UNSIGNED, UNDEF
+from tasty.circuit.compiled import CompiledCircuit
 from tasty import state
 
 
-__all__ = ["PSSW09Circuit", "FairplayMP20Circuit", "FairplayMP21Circuit"]
+__all__ = ["PSSW09Circuit", "FairplayMP20Circuit", "FairplayMP21Circuit", "BinaryCircuit",
+           "CIRCUIT_FORMATS", "read_circuit", "convert_circuit"]
 
 
 class PSSW09Circuit(Circuit):
@@ -459,6 +461,55 @@ class FairplayMP21Circuit(Circuit):
             yield g
 
 
+class BinaryCircuit(CompiledCircuit):
+    """ Read circuit in the binary format written by L{CompiledCircuit.save}
+
+    The file is read once through a memory map, gates are not parsed.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        CompiledCircuit.__init__(self, *self.read_file(filename))
+
+
+# readers of the circuit file formats
+CIRCUIT_FORMATS = {"PSSW09": PSSW09Circuit,
+                   "PSS09": FileCircuitPSS09,
+                   "FairplayMP20": FairplayMP20Circuit,
+                   "FairplayMP21": FairplayMP21Circuit,
+                   "binary": BinaryCircuit}
+
+
+def read_circuit(filename, format=None):
+    """ Read circuit from filename
+
+    @type format: str
+    @param format: one of L{CIRCUIT_FORMATS}, binary files are detected
+    if not given, text files default to FairplayMP21
+
+    @rtype: Circuit
+    """
+    if format is None:
+        format = "binary" if CompiledCircuit.is_compiled(filename) else "FairplayMP21"
+    try:
+        reader = CIRCUIT_FORMATS[format]
+    except KeyError:
+        raise ValueError("unknown circuit format %r, expected one of %s" %
+                         (format, ", ".join(sorted(CIRCUIT_FORMATS))))
+    return reader(filename)
+
+
+def convert_circuit(infile, outfile, format=None):
+    """ Convert circuit in infile to the binary format in outfile
+
+    @rtype: CompiledCircuit
+    @return: the converted circuit
+    """
+    c = CompiledCircuit.from_circuit(read_circuit(infile, format))
+    c.save(outfile)
+    return c
+
+
 if __name__ == '__main__':
     import tasty.utils
     import logging
@@ -195,3 +195,43 @@ for __line in rules.split('\n'):
         
     # fill translation table
     translate[__addr] = __line[(1<<3)+1:]
+
+
+def compile_rule(rule):
+    """ compile a replacement circuit into a gate template
+
+    @rtype: tuple
+    @return: (gates, output), gates are (refs, truth table) and output is
+    a ref. Refs 0, 1 and 2 are the inputs C, B and A of the replaced gate,
+    ref 3 + i is the output of the i-th gate of the template.
+    """
+    if rule[0] in "01":
+        return (((), int(rule[0])),), 3
+    refs = {"C": 0, "B": 1, "A": 2}
+    gates = []
+    stack = []
+    pos = 0
+    while pos < len(rule):
+        e = rule[pos]
+        if e == "(":
+            stack.append(None)
+        elif e in refs:
+            stack.append(refs[e])
+        elif e == "[":
+            end = rule.index("]", pos)
+            table = rule[pos + 1:end]
+            d = len(table).bit_length() - 1
+            assert len(table) == 1 << d
+            # inputs are popped, so the last input is the first of the gate
+            ins = tuple(stack.pop() for i in xrange(d))
+            assert None not in ins and stack.pop() is None
+            stack.append(3 + len(gates))
+            gates.append((ins, int(table, 2)))
+            pos = end
+        pos += 1
+    output = stack.pop()
+    assert not stack
+    return tuple(gates), output
+
+# gate templates by truth table, compiled once from translate
+templates = [None if __rule is None else compile_rule(__rule) for __rule in translate]
@@ -2,8 +2,10 @@
 
 """This module provides circuit transformations"""
 
-from tasty.circuit import Circuit
+from tasty.circuit import Circuit, wire_statistics
+from array import array
 from collections import deque
+from cStringIO import StringIO
 from random import randint, shuffle, random, seed
 from tasty.circuit import threeinputreplace
 
@@ -156,86 +158,25 @@ class replace_3_by_2(Circuit_Transformation):
     def next_gate(self):
         n_inputs = self.c.num_input_bits()
         n_gate = n_inputs
-        stack = []
+        templates = threeinputreplace.templates
 
         # For this we need O(|C|) memory
-        g_trans = [None for i in xrange(n_inputs+self.c.num_gates())]
-        for i in xrange(n_inputs):
-            g_trans[i] = i
+        g_trans = array("i", xrange(n_inputs))
 
-        for g_ix, g in enumerate(self.c.next_gate()):
-            g_ins, g_tab = g
-            d = len(g_ins)
-            if d != 3 or threeinputreplace.translate[g_tab] is None:
-                yield map(lambda x: g_trans[x],g_ins), g_tab
-                g_trans[n_inputs + g_ix] = n_gate
+        for g_ins, g_tab in self.c.next_gate():
+            if len(g_ins) != 3 or templates[g_tab] is None:
+                yield [g_trans[i] for i in g_ins], g_tab
+                g_trans.append(n_gate)
                 n_gate += 1
             else:
-                r = threeinputreplace.translate[g_tab]
-                if r[0] == "0":
-                    yield [], 0
-                    g_trans[n_inputs + g_ix] = n_gate
+                # instantiate the gate template of the replacement circuit
+                gates, output = templates[g_tab]
+                wires = [g_trans[i] for i in g_ins]
+                for refs, tab in gates:
+                    yield [wires[r] for r in refs], tab
+                    wires.append(n_gate)
                     n_gate += 1
-                    continue
-                elif r[0] == "1":
-                    yield [], 1
-                    g_trans[n_inputs + g_ix] = n_gate
-                    n_gate += 1
-                    continue
-
-                C,B,A = map(lambda x: g_trans[x], g_ins)
-                r_pos = 0
-                r_len = len(r)
-                while r_pos < r_len:
-                    e = r[r_pos]
-                    if e == "(":
-                        stack.append(None)
-                    elif e == "A":
-                        stack.append(A)
-                    elif e == "B":
-                        stack.append(B)
-                    elif e == "C":
-                        stack.append(C)
-                    elif e == ",":
-                        pass
-                    elif e == "[": # gate found
-                        # get function table
-                        tab = 0
-                        r_pos += 1
-                        tab_len = 0
-                        while r[r_pos] != "]":
-                            if r[r_pos] == "0":
-                                tab = tab << 1
-                            elif r[r_pos] == "1":
-                                tab = (tab << 1) | 1
-                            tab_len += 1
-                            r_pos += 1
-
-                        # determine number of inputs
-                        d = 0
-                        while tab_len != 1:
-                            assert (tab_len & 1) == 0
-                            tab_len >>= 1
-                            d += 1
-
-                        # get inputs
-                        ins = []
-                        for i in xrange(d):
-                            inp = stack.pop()
-                            assert inp is not None
-                            ins.append(inp)
-                        inp = stack.pop()
-                        assert inp is None
-
-                        stack.append(n_gate)
-                        yield ins, tab
-                        n_gate += 1
-
-                    r_pos += 1
-
-                #  pop output wire from stack
-                e = stack.pop()
-                g_trans[n_inputs + g_ix] = e
+                g_trans.append(wires[output])
 
         # determine outputs
         self.outs = []
@@ -244,6 +185,234 @@ class replace_3_by_2(Circuit_Transformation):
 
         self.n_gates = n_gate - n_inputs
 
+# wire values in remove_redundant_gates: (wire << 1) | inverted, the
+# constants are the two values of the virtual wire -1
+FALSE = -2
+TRUE = -1
+
+_simplified_gates = {}
+
+def simplify_gate(tab, ins, n):
+    """ Simplify a gate with truth table tab whose inputs have the values
+        ins, which are constants or (wire << 1) | inverted for wires 0..n-1.
+
+        Constant and irrelevant inputs are removed, inputs that are the same
+        wire are merged, inversions of inputs are moved into the truth
+        table, the inputs are sorted and the gate is normalized to output 0
+        on input 0 (so XNOR becomes an inverted XOR).
+
+        @rtype: tuple
+        @return: (wires, tab, inverted) of the simplified gate, wires is
+        empty for constant gates and (w,) for the identity of wire w
+    """
+    key = (tab, ins, n)
+    try:
+        return _simplified_gates[key]
+    except KeyError:
+        pass
+
+    d = len(ins)
+    tab_len = 1 << d
+    wires = range(n)
+
+    # output for each assignment u of the wires, bit n-1-j of u is wire j
+    out = []
+    for u in xrange(1 << n):
+        v = 0
+        for val in ins:
+            if val >> 1 == -1:
+                bit = val & 1
+            else:
+                bit = ((u >> (n - 1 - (val >> 1))) ^ val) & 1
+            v = (v << 1) | bit
+        out.append((tab >> (tab_len - 1 - v)) & 1)
+
+    # drop wires the output does not depend on
+    for j in reversed(xrange(n)):
+        m = len(wires)
+        pos = m - 1 - wires.index(j)
+        if all(out[u] == out[u ^ (1 << pos)] for u in xrange(1 << m)):
+            low = (1 << pos) - 1
+            out = [out[((u >> pos) << (pos + 1)) | (u & low)] for u in xrange(1 << (m - 1))]
+            wires.remove(j)
+
+    inverted = out[0]
+    new_tab = 0
+    for o in out:
+        new_tab = (new_tab << 1) | (o ^ inverted)
+    ret = _simplified_gates[key] = (tuple(wires), new_tab, inverted)
+    return ret
+
+
+class remove_redundant_gates(Circuit_Transformation):
+    """ Constant folding, structural hashing and dead-gate elimination
+
+        Gates are simplified with L{simplify_gate}, gates with constant
+        output are removed, gates with the same inputs and truth table as an
+        earlier gate are merged with it and gates that do not reach an
+        output are dropped. Inverters are moved into the truth tables of
+        the successors, which replaces XNOR gates with XOR gates like
+        L{replace_xnor_with_xor}; inverted outputs become gates with inverted
+        truth table (or inverters for circuit inputs), constant outputs
+        0-input gates.
+
+        This transformation requires O(|C|) memory.
+    """
+
+    def __init__(self, c):
+        Circuit_Transformation.__init__(self, c)
+
+        self.n_gates = None
+        self.outs = None
+        self.msg = None
+
+    def message(self):
+        if self.msg is None:
+            for g in self.next_gate():
+                pass
+
+        ret = StringIO()
+        ret.write("Removed %d redundant gates:\n" % self.msg[0])
+        ret.write("  %d of them non-XOR gates." % self.msg[1])
+        return ret.getvalue()
+
+    def removed_non_xor_gates(self):
+        """ number of non-XOR gates removed from the circuit """
+        if self.msg is None:
+            for g in self.next_gate():
+                pass
+        return self.msg[1]
+
+    def num_gates(self):
+        if self.n_gates is None:
+            for g in self.next_gate():
+                pass
+        return self.n_gates
+
+    def outputs(self):
+        if self.outs is None:
+            for g in self.next_gate():
+                pass
+        return self.outs
+
+    def next_gate(self):
+        n_inputs = self.c.num_input_bits()
+
+        # value of each wire of c
+        values = range(0, 2 * n_inputs, 2)
+        # simplified gates, indexed by wire - n_inputs, and their wires
+        gate_inputs = []
+        gate_tables = []
+        hashed = {}
+        c_gates = c_non_xor = 0
+
+        def add_gate(g_ins, g_tab):
+            key = (g_ins, g_tab)
+            try:
+                return hashed[key]
+            except KeyError:
+                wire = hashed[key] = n_inputs + len(gate_tables)
+                gate_inputs.append(g_ins)
+                gate_tables.append(g_tab)
+                return wire
+
+        for g_ins, g_tab in self.c.next_gate():
+            c_gates += 1
+            d = len(g_ins)
+            if d != 2 or g_tab != 0b0110:
+                c_non_xor += 1
+
+            # number the distinct wires of the gate in ascending order
+            wires = sorted(set(values[i] >> 1 for i in g_ins))
+            if wires and wires[0] == -1:
+                del wires[0]
+            rank = dict((w, j) for j, w in enumerate(wires))
+            ins = []
+            for i in g_ins:
+                val = values[i]
+                if val >> 1 == -1:
+                    ins.append(val)
+                else:
+                    ins.append((rank[val >> 1] << 1) | (val & 1))
+
+            s_ins, s_tab, inverted = simplify_gate(g_tab, tuple(ins), len(wires))
+            if not s_ins:
+                values.append(FALSE | inverted)
+            elif len(s_ins) == 1:
+                values.append((wires[s_ins[0]] << 1) | inverted)
+            else:
+                wire = add_gate(tuple(wires[j] for j in s_ins), s_tab)
+                values.append((wire << 1) | inverted)
+
+        # number of gates and outputs using each gate
+        c_outputs = self.c.outputs()
+        uses = [0] * len(gate_tables)
+        for g_ins in gate_inputs:
+            for i in g_ins:
+                if i >= n_inputs:
+                    uses[i - n_inputs] += 1
+        for o_list, o_desc, o_type in c_outputs:
+            for o in o_list:
+                if values[o] >> 1 >= n_inputs:
+                    uses[(values[o] >> 1) - n_inputs] += 1
+
+        def inverted_gate(wire):
+            g_ins = gate_inputs[wire - n_inputs]
+            g_tab = gate_tables[wire - n_inputs]
+            if g_tab == 0b0110:
+                # invert a non-XOR input gate only used by the XOR gate
+                for j, i in enumerate(g_ins):
+                    if i >= n_inputs and uses[i - n_inputs] == 1 and gate_tables[i - n_inputs] != 0b0110:
+                        i = inverted_gate(i)
+                        return add_gate(tuple(sorted((i, g_ins[1 - j]))), g_tab)
+            return add_gate(g_ins, g_tab ^ ((1 << (1 << len(g_ins))) - 1))
+
+        # outputs must be wires
+        outs = []
+        for o_list, o_desc, o_type in c_outputs:
+            o_wires = []
+            for o in o_list:
+                val = values[o]
+                wire = val >> 1
+                if wire == -1:
+                    wire = add_gate((), val & 1)
+                elif val & 1:
+                    if wire < n_inputs:
+                        wire = add_gate((wire,), 0b10)
+                    else:
+                        wire = inverted_gate(wire)
+                o_wires.append(wire)
+            outs.append((o_wires, o_desc, o_type))
+
+        # drop gates that do not reach an output
+        live = [False] * len(gate_tables)
+        for o_wires, o_desc, o_type in outs:
+            for wire in o_wires:
+                if wire >= n_inputs:
+                    live[wire - n_inputs] = True
+        for ix in reversed(xrange(len(gate_tables))):
+            if live[ix]:
+                for i in gate_inputs[ix]:
+                    if i >= n_inputs:
+                        live[i - n_inputs] = True
+
+        translation = range(n_inputs) + [None] * len(gate_tables)
+        n_gate = n_inputs
+        non_xor = 0
+        for ix, g_ins in enumerate(gate_inputs):
+            if live[ix]:
+                g_tab = gate_tables[ix]
+                if len(g_ins) != 2 or g_tab != 0b0110:
+                    non_xor += 1
+                yield [translation[i] for i in g_ins], g_tab
+                translation[n_inputs + ix] = n_gate
+                n_gate += 1
+
+        self.outs = [([translation[o] for o in o_wires], o_desc, o_type)
+                     for o_wires, o_desc, o_type in outs]
+        self.n_gates = n_gate - n_inputs
+        self.msg = (c_gates - self.n_gates, c_non_xor - non_xor)
+
 class circuit_buffer_RAM(Circuit_Transformation):
     """ Buffers circuit in RAM in constructor.
 
@@ -526,3 +695,77 @@ class reorder_rand(Circuit_Transformation):
             yield g
 
 
+
+class reorder_min_live(Circuit_Transformation):
+    """ Reorder circuit to keep the number of live wires small
+
+        The gates are ordered depth-first from the outputs, each gate right
+        after its inputs, where the input computed by the larger subcircuit
+        is computed first (like Sethi-Ullman register allocation). This way
+        intermediate wires are used soon after they are computed. If the
+        original order needs fewer live wires (see
+        L{tasty.circuit.wire_statistics}), it is kept.
+
+        This transformation requires O(|C|) memory.
+    """
+    def __init__(self, c):
+        Circuit_Transformation.__init__(self, c)
+        self.gates = None
+        self.outs = None
+
+    def outputs(self):
+        if self.outs is None:
+            self.reorder()
+        return self.outs
+
+    def next_gate(self):
+        if self.gates is None:
+            self.reorder()
+        return iter(self.gates)
+
+    def reorder(self):
+        n_inputs = self.c.num_input_bits()
+
+        # read in circuit and store in memory, size of the subcircuit
+        # computing each wire (shared gates are counted more than once)
+        circuit_gates = tuple(self.c.next_gate())
+        n_gates = len(circuit_gates)
+        size = [0] * n_inputs
+        for g_ins, g_tab in circuit_gates:
+            size.append(1 + sum(size[i] for i in set(g_ins)))
+
+        # depth-first from the outputs, gates are emitted after their inputs
+        done = [False] * (n_inputs + n_gates)
+        order = []
+        for o_list, o_desc, o_type in self.c.outputs():
+            for o in o_list:
+                stack = [(o, False)]
+                while stack:
+                    w, inputs_done = stack.pop()
+                    if w < n_inputs or done[w]:
+                        continue
+                    if inputs_done:
+                        done[w] = True
+                        order.append(w - n_inputs)
+                        continue
+                    stack.append((w, True))
+                    ins = [i for i in set(circuit_gates[w - n_inputs][0]) if i >= n_inputs and not done[i]]
+                    ins.sort(key=size.__getitem__)
+                    stack.extend((i, False) for i in ins)
+
+        # gates not leading to outputs keep their order at the end
+        order.extend(g for g in xrange(n_gates) if not done[n_inputs + g])
+
+        translation = range(n_inputs) + [None] * n_gates
+        gates = []
+        for g in order:
+            g_ins, g_tab = circuit_gates[g]
+            translation[n_inputs + g] = n_inputs + len(gates)
+            gates.append(([translation[i] for i in g_ins], g_tab))
+        self.gates = gates
+        self.outs = [([translation[o] for o in o_list], o_desc, o_type)
+                     for o_list, o_desc, o_type in self.c.outputs()]
+
+        if wire_statistics(self)["peak_live_wires"] >= wire_statistics(self.c)["peak_live_wires"]:
+            self.gates = circuit_gates
+            self.outs = self.c.outputs()
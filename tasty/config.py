@@ -20,6 +20,10 @@ from tasty import types
 import tasty.protocols.otprotocols
 from tasty.protocols.otprotocols import *
 from tasty.types.party import Party
+from tasty.crypt.garbled_circuit import GATE_HASHES, DEFAULT_GATE_HASH, GC_SCHEMES, DEFAULT_GC_SCHEME, \
+    DEFAULT_CIRCUIT_CACHE_SIZE
+from tasty.circuit.library import CIRCUIT_LIBRARIES, DEFAULT_CIRCUIT_LIBRARY
+from tasty.protocols.otprotocols.iknp03 import OT_HASHES, DEFAULT_OT_HASH
 
 __all__ = ["config", "create_configuration", "post_configuration"]
 
@@ -94,6 +98,37 @@ def create_configuration(**kwargs):
     @type homomorphic_type: HomomorphicType
     @type homomorphic_type: the actual implementation of HomomorphicType
 
+    @type gc_hash: "SHA256" | "AES"
+    @keyword gc_hash: hash used for garbling gates of garbled circuits
+
+    @type ot_hash: "SHA256" | "AES"
+    @keyword ot_hash: hash used for the rows of the IKNP03 OT extension
+
+    @type gc_scheme: "PSSW09" | "HalfGates"
+    @keyword gc_scheme: garbling scheme of garbled circuits
+
+    @type circuit_library: "dynamic" | "freexor" | "lowdepth"
+    @keyword circuit_library: implementations of the circuits used by Garbled operations,
+    "lowdepth" trades more non-XOR gates for adders and comparators of logarithmic depth
+
+    @type correlated_ot: bool
+    @keyword correlated_ot: precompute OTs correlated with the global garbled
+    circuit offset R, so the online transfer of a garbled input bit needs one
+    message instead of two
+
+    @type gc_spool: bool
+    @keyword gc_spool: spool garbled tables to a temporary file on the client
+
+    @type gc_processes: int
+    @keyword gc_processes: number of worker processes for garbling circuits
+    level by level, 0 garbles gate by gate in the main process
+
+    @type circuit_cache_size: int
+    @keyword circuit_cache_size: memory cap of the circuit cache in MiB, 0 disables it
+
+    @type circuit_cache_dir: str
+    @keyword circuit_cache_dir: directory to store optimized circuits in between runs
+
     @type testing: bool
     @keyword testing: set this to True if you create a test config and want
     to relax config var validation
@@ -221,6 +256,65 @@ def create_configuration(**kwargs):
         default=False,
         help="overwrite oblivious chain")
 
+    protocol_opts.add_option("--gc_hash",
+        action="store",
+        dest="gc_hash",
+        default=None,
+        help="hash used for garbling gates, either 'SHA256' (default) or 'AES' (fixed-key AES, requires PyCrypto)")
+
+    protocol_opts.add_option("--ot_hash",
+        action="store",
+        dest="ot_hash",
+        default=None,
+        help="hash used for the IKNP03 OT extension, either 'SHA256' (default) or 'AES' (fixed-key AES, requires PyCrypto)")
+
+    protocol_opts.add_option("--gc_scheme",
+        action="store",
+        dest="gc_scheme",
+        default=None,
+        help="garbling scheme, either 'PSSW09' (default) or 'HalfGates'")
+
+    protocol_opts.add_option("--circuit_library",
+        action="store",
+        dest="circuit_library",
+        default=None,
+        help="circuits used by garbled operations, either 'dynamic' (default), 'freexor' "
+             "(fewest non-XOR gates) or 'lowdepth' (adders and comparators of logarithmic depth)")
+
+    protocol_opts.add_option("--correlated_ot",
+        action="store_true",
+        dest="correlated_ot",
+        default=None,
+        help="precompute OTs correlated with the garbled circuit offset, halves the online OT traffic of garbled inputs")
+
+    protocol_opts.add_option("--gc_spool",
+        action="store_true",
+        dest="gc_spool",
+        default=None,
+        help="spool received garbled tables to a temporary file instead of keeping them in memory")
+
+    protocol_opts.add_option("--gc_processes",
+        action="store",
+        type="int",
+        dest="gc_processes",
+        default=0,
+        help="garble circuits level by level on this many worker processes, 0 (default) garbles gate by gate")
+
+    protocol_opts.add_option("--circuit_cache_size",
+        action="store",
+        type="int",
+        dest="circuit_cache_size",
+        default=None,
+        help="memory cap of the cache of optimized circuits in MiB (default %d), 0 disables the cache" %
+            DEFAULT_CIRCUIT_CACHE_SIZE)
+
+    protocol_opts.add_option("--circuit_cache_dir",
+        action="store",
+        type="string",
+        dest="circuit_cache_dir",
+        default=None,
+        help="directory to store optimized circuits in between runs")
+
     #compiler_opts.add_option("-E", "--exclude_compiler",
         #action="store_true",
         #dest="exclude_compiler",
@@ -318,6 +412,33 @@ def create_configuration(**kwargs):
     if "test_mode" in kwargs:
         configuration.test_mode = kwargs["test_mode"]
 
+    if "gc_hash" in kwargs:
+        configuration.gc_hash = kwargs["gc_hash"]
+
+    if "ot_hash" in kwargs:
+        configuration.ot_hash = kwargs["ot_hash"]
+
+    if "gc_scheme" in kwargs:
+        configuration.gc_scheme = kwargs["gc_scheme"]
+
+    if "circuit_library" in kwargs:
+        configuration.circuit_library = kwargs["circuit_library"]
+
+    if "correlated_ot" in kwargs:
+        configuration.correlated_ot = kwargs["correlated_ot"]
+
+    if "gc_spool" in kwargs:
+        configuration.gc_spool = kwargs["gc_spool"]
+
+    if "gc_processes" in kwargs:
+        configuration.gc_processes = kwargs["gc_processes"]
+
+    if "circuit_cache_size" in kwargs:
+        configuration.circuit_cache_size = kwargs["circuit_cache_size"]
+
+    if "circuit_cache_dir" in kwargs:
+        configuration.circuit_cache_dir = kwargs["circuit_cache_dir"]
+
     log_name = "tasty_%s.log" % ("client" if configuration.client else "server")
     try:
         configuration.log_file = os.path.join(configuration.protocol_dir, "results", log_name)
@@ -417,6 +538,31 @@ def validate_configuration():
         except ValueError:
             setattr(config, key, value)
 
+    if not config.gc_hash:
+        config.gc_hash = DEFAULT_GATE_HASH
+    elif config.gc_hash not in GATE_HASHES:
+        raise ValueError("gc_hash must be one of %s" % ", ".join(sorted(GATE_HASHES)))
+
+    if not config.ot_hash:
+        config.ot_hash = DEFAULT_OT_HASH
+    elif config.ot_hash not in OT_HASHES:
+        raise ValueError("ot_hash must be one of %s" % ", ".join(sorted(OT_HASHES)))
+
+    if not config.gc_scheme:
+        config.gc_scheme = DEFAULT_GC_SCHEME
+    elif config.gc_scheme not in GC_SCHEMES:
+        raise ValueError("gc_scheme must be one of %s" % ", ".join(sorted(GC_SCHEMES)))
+
+    if not config.circuit_library:
+        config.circuit_library = DEFAULT_CIRCUIT_LIBRARY
+    elif config.circuit_library not in CIRCUIT_LIBRARIES:
+        raise ValueError("circuit_library must be one of %s" % ", ".join(sorted(CIRCUIT_LIBRARIES)))
+
+    if config.circuit_cache_size is None:
+        config.circuit_cache_size = DEFAULT_CIRCUIT_CACHE_SIZE
+    elif config.circuit_cache_size < 0:
+        raise ValueError("circuit_cache_size must not be negative")
+
     #ot_chain = config.ot_chain = config.ot_chain.split(":")
     ot_chain = config.ot_chain
     #subs = tasty.protocols.otprotocols.OTProtocol.__subclasses__()
@@ -516,6 +662,36 @@ def runtime_config_check(sock):
         log.error("Error: parties differ at tasty driver implementations - Exiting...\n\n")
         sys.exit(-2)
 
+    if __debug__:
+        log.info("checking garbled circuit hash...")
+    if getattr(config, "gc_hash", None) != getattr(other_config, "gc_hash", None):
+        log.error("Error: parties differ at garbled circuit hash - Exiting...\n\n")
+        sys.exit(-2)
+
+    if __debug__:
+        log.info("checking oblivious transfer hash...")
+    if getattr(config, "ot_hash", None) != getattr(other_config, "ot_hash", None):
+        log.error("Error: parties differ at oblivious transfer hash - Exiting...\n\n")
+        sys.exit(-2)
+
+    if __debug__:
+        log.info("checking garbled circuit scheme...")
+    if getattr(config, "gc_scheme", None) != getattr(other_config, "gc_scheme", None):
+        log.error("Error: parties differ at garbled circuit scheme - Exiting...\n\n")
+        sys.exit(-2)
+
+    if __debug__:
+        log.info("checking circuit library...")
+    if getattr(config, "circuit_library", None) != getattr(other_config, "circuit_library", None):
+        log.error("Error: parties differ at circuit library - Exiting...\n\n")
+        sys.exit(-2)
+
+    if __debug__:
+        log.info("checking correlated OTs...")
+    if bool(getattr(config, "correlated_ot", False)) != bool(getattr(other_config, "correlated_ot", False)):
+        log.error("Error: parties differ at correlated OTs - Exiting...\n\n")
+        sys.exit(-2)
+
     if __debug__:
         log.info("checking tasty protocol hash...")
     if config.protocol_hash != other_config.protocol_hash:
@@ -270,11 +270,15 @@ class CostSystem(object):
             "C:"])
         if "SHA256" in costs["theoretical"]["setup"]["accumulated"]:
             result.append("   %d SHA256-Hashes" % costs["theoretical"]["setup"]["accumulated"]["SHA256"])
+        if "AES" in costs["theoretical"]["setup"]["accumulated"]:
+            result.append("   %d AES Encryptions" % costs["theoretical"]["setup"]["accumulated"]["AES"])
         if "EC_MUL" in costs["theoretical"]["setup"]["accumulated"]:
             result.append("   %d EC Multiplications" % costs["theoretical"]["setup"]["accumulated"]["EC_Mul"])
         result.append("S:")
         if "SHA256" in other_costs["theoretical"]["setup"]["accumulated"]:
             result.append("   %d SHA256-Hashes" % other_costs["theoretical"]["setup"]["accumulated"]["SHA256"])
+        if "AES" in other_costs["theoretical"]["setup"]["accumulated"]:
+            result.append("   %d AES Encryptions" % other_costs["theoretical"]["setup"]["accumulated"]["AES"])
         if "EC_MUL" in other_costs["theoretical"]["setup"]["accumulated"]:
             result.append("   %d EC Multiplications" % other_costs["theoretical"]["setup"]["accumulated"]["EC_Mul"])
         result.append("")
@@ -287,6 +291,8 @@ class CostSystem(object):
         result.append("C: ")
         if "SHA256" in costs["theoretical"]["online"]["accumulated"]:
             result.append("    %d SHA256 Hashes" % costs["theoretical"]["online"]["accumulated"]["SHA256"])
+        if "AES" in costs["theoretical"]["online"]["accumulated"]:
+            result.append("    %d AES Encryptions" % costs["theoretical"]["online"]["accumulated"]["AES"])
         if "Paillier_ENC" in costs["theoretical"]["online"]["accumulated"]:
             result.append("   %d Paillier Encryptions" % costs["theoretical"]["online"]["accumulated"]["Paillier_ENC"])
         if "Paillier_DEC" in costs["theoretical"]["online"]["accumulated"]:
@@ -294,6 +300,8 @@ class CostSystem(object):
         result.append("S:")
         if "SHA256" in other_costs["theoretical"]["online"]["accumulated"]:
             result.append("    %d SHA256 Hashes" % other_costs["theoretical"]["online"]["accumulated"]["SHA256"])
+        if "AES" in other_costs["theoretical"]["online"]["accumulated"]:
+            result.append("    %d AES Encryptions" % other_costs["theoretical"]["online"]["accumulated"]["AES"])
         if "Paillier_ENC" in other_costs["theoretical"]["online"]["accumulated"]:
             result.append("   %d Paillier Encryptions" % other_costs["theoretical"]["online"]["accumulated"]["Paillier_ENC"])
 
@@ -1,7 +1,34 @@
 from tasty.crypt.garbled_circuit.pssw09 import *
+from tasty.crypt.garbled_circuit.halfgates import *
 from tasty.crypt.garbled_circuit.utils import *
+from tasty.crypt.garbled_circuit.gatehash import *
+from tasty.crypt.garbled_circuit.labels import *
+from tasty.crypt.garbled_circuit.frames import *
+from tasty.crypt.garbled_circuit.plan import *
+from tasty.crypt.garbled_circuit.cache import *
+from tasty import state
 
-# TODO: Move that into configuration
-CreatorGarbledCircuit = FreeXORReducedRowCreatorGarbledCircuit
-EvaluatorGarbledCircuit = FreeXORReducedRowEvaluatorGarbledCircuit
+# (creator, evaluator) of the garbling schemes selectable with gc_scheme
+GC_SCHEMES = {"PSSW09" : (FreeXORReducedRowCreatorGarbledCircuit,
+                          FreeXORReducedRowEvaluatorGarbledCircuit),
+              "HalfGates" : (HalfGatesCreatorGarbledCircuit,
+                             HalfGatesEvaluatorGarbledCircuit)}
 
+DEFAULT_GC_SCHEME = "PSSW09"
+
+def gc_scheme(name=None):
+    """Returns (creator, evaluator) classes of the configured garbling scheme"""
+    if name is None:
+        name = getattr(state.config, "gc_scheme", None) or DEFAULT_GC_SCHEME
+    try:
+        return GC_SCHEMES[name]
+    except KeyError:
+        raise ValueError("unknown gc_scheme %r, expected one of %s" % (name, ", ".join(sorted(GC_SCHEMES))))
+
+def CreatorGarbledCircuit(*args):
+    """Creator garbled circuit of the scheme selected with gc_scheme"""
+    return gc_scheme()[0](*args)
+
+def EvaluatorGarbledCircuit(*args):
+    """Evaluator garbled circuit of the scheme selected with gc_scheme"""
+    return gc_scheme()[1](*args)
@@ -2,8 +2,68 @@
 
 """This module provides features to create and evaluate garbled circuits"""
 
+import atexit
+import cPickle
+import itertools
+import multiprocessing
+from array import array
+from tasty import state
+from tasty.utils import bit2byte
+from tasty.crypt.garbled_circuit.labels import LabelStore
+from tasty.crypt.garbled_circuit.frames import GarbledTableFrames
+from tasty.crypt.garbled_circuit.plan import get_plan, XOR_GATE
+
 __all__ = ["AbstractCreatorGarbledCircuit", "AbstractEvaluatorGarbledCircuit"]
 
+_pool = None
+
+# creator garbled circuits unpickled by a worker process, by token
+_worker_gcs = {}
+
+# tokens identifying the garbled circuits sent to the workers
+_tokens = itertools.count()
+
+def get_pool(processes):
+    """ returns process pool with processes workers, shared by all garbled circuits """
+    global _pool
+    if _pool is None or _pool._processes != processes:
+        close_pool()
+        _pool = multiprocessing.Pool(processes)
+    return _pool
+
+@atexit.register
+def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.terminate()
+        _pool = None
+
+def _garble_gates(args):
+    """
+    worker: garble independent gates with the creator gc pickled in blob,
+    which is unpickled once per worker and token
+
+    The gates are given by their ids, truth tables and numbers of inputs,
+    their input labels by the concatenation of their fixed width encodings
+    (see L{LabelStore.encode}). Returns the encodings of the zero labels of
+    the output wires and the garbled tables.
+    """
+    token, blob, bits, gateids, truths, arities, labels = args
+    gc = _worker_gcs.get(token)
+    if gc is None:
+        _worker_gcs.clear()
+        gc = _worker_gcs[token] = cPickle.loads(blob)
+    wires = LabelStore(len(labels) // bit2byte(bits), bits, gc.R)
+    wires.set_inputs(wires.decode(labels, i) for i in xrange(len(wires)))
+    pos = 0
+    batch = []
+    for gateid, truth, d in zip(gateids, truths, arities):
+        batch.append((xrange(pos, pos + d), truth, gateid))
+        pos += d
+    garbled = gc.create_garbled_gates(wires, batch)
+    return "".join([wires.encode(wireval) for wireval, table in garbled]), \
+        [table for wireval, table in garbled]
+
 ### CreatorGarbledCircuit
 class AbstractCreatorGarbledCircuit(object):
     """
@@ -12,55 +72,187 @@ class AbstractCreatorGarbledCircuit(object):
     """
     _circuit_counter = 0
 
+    # True if XOR gates are free (label of output is XOR of input labels)
+    free_xor = False
+
     def __init__(self, circuit, R, inputs):
-        self.circuit = self.optimize_circuit(circuit) #optimize the circuit for gc
-        #self.circuit = circuit
+        #optimize and compile the circuit for gc, done once per circuit
+        self.plan = get_plan(circuit, self.optimize_circuit)
+        self.circuit = self.plan.circuit
         self.circuit_id = self._circuit_counter
         AbstractCreatorGarbledCircuit._circuit_counter += 1
         self.inputs = inputs
         self.R = R
         self.outputs = [None]
 
+    # minimal number of non-free gates of a level to garble them on the process pool
+    parallel_batch = 128
+
     def optimize_circuit(self, c):
         """ 
         Overwrite this with the appropriate circuit transformation for your gc-implementation
         """
         return c
 
+    def free_gate(self, d, truthtable):
+        """
+        Overwrite this to return True for gates which are garbled without
+        hashing and table (e.g. XOR-Gates)
+        """
+        return False
+
+    def create_garbled_gates(self, wires, gates):
+        """
+        garble several independent gates (inputs, truthtable, gateid), e.g.,
+        of one level of the circuit. Overwrite this to garble them at once.
+
+        @rtype: list
+        @return: results of L{create_garbled_gate} for all gates
+        """
+        return [self.create_garbled_gate(wires, inputs, truth, gateid)
+                for inputs, truth, gateid in gates]
+
+    def worker_copy(self):
+        """ picklable copy of self for garbling gates in worker processes """
+        gc = self.__class__.__new__(self.__class__)
+        gc.__dict__.update((k, v) for k, v in self.__dict__.iteritems()
+                           if k not in ("circuit", "plan", "inputs", "outputs"))
+        return gc
+
     def next_garbled_gate(self):
         """ """
         #map inputs to input_bits
         # list of list to one single tuple in same order
         inputs = self.inputs = reduce(lambda x, y: tuple(x) + tuple(y), self.inputs) 
-        u = self.circuit.num_input_bits()
+        plan = self.plan
+        u = plan.num_inputs
         if len(inputs) != u:
             raise ValueError("Number of garbled inputs of does not match "
                 "number of circuit inputs! (expected %d, got %d)"%(u, len(inputs)))
-        k = self.circuit.num_gates()
+        k = plan.num_gates
+
+        # level by level garbling on worker processes is opt-in, the levels
+        # have their own slots (see LevelSchedule)
+        processes = getattr(state.config, "gc_processes", 0) or 0
+        if processes > 0:
+            schedule = plan.level_schedule(self.free_gate)
+            num_slots = schedule.num_slots
+        else:
+            num_slots = plan.num_slots
 
-        garbled_wires = [None for i in xrange(u + k)] #initialize all wires
+        #initialize all wires
+        garbled_wires = LabelStore(num_slots, state.config.symmetric_security_parameter + 1, self.R)
 
         # map input-bits to input-wires
         if len(self.inputs) != u:
             raise ValueError("Number of garbled inputs of does not match "
                              "number of circuit inputs")
 
-        garbled_wires[:u] = inputs
+        garbled_wires.set_inputs(inputs)
 
         # add costs:
         self.creation_costs()
 
         # create garbled gates
-        for ix, gate in enumerate(self.circuit.next_gate()):
-            inputs, truth = gate
-            wireval, garbled_table = self.create_garbled_gate([garbled_wires[i] for i in inputs], truth, ix)
-            garbled_wires[u + ix] = wireval
-            if garbled_table: # None for gates without any table (e.g. XOR-Gates)
+        if processes > 0:
+            for garbled_table in self.garble_levels(garbled_wires, schedule, processes):
                 yield garbled_table
-
-        self.outputs = [(garbled_wires[idx] for idx in output[0])
-                        for output in self.circuit.outputs()]
-
+            outputs = schedule.output_slots
+        else:
+            ins, offsets, kinds, truths, slots = plan.slot_inputs, plan.offsets, plan.kinds, plan.truths, plan.slots
+            # free XORs write the values directly, skipping the encoding of the LabelStore
+            values = garbled_wires.values
+            encoded = garbled_wires.encoded
+            free_xor = self.free_xor
+            for ix in xrange(k):
+                first = offsets[ix]
+                out = slots[u + ix]
+                if free_xor and kinds[ix] == XOR_GATE:
+                    values[out] = values[ins[first]] ^ values[ins[first + 1]]
+                    encoded[out] = 0
+                    continue
+                wireval, garbled_table = self.create_garbled_gate(
+                    garbled_wires, ins[first:offsets[ix + 1]], truths[ix], ix)
+                garbled_wires[out] = wireval
+                if garbled_table: # None for gates without any table (e.g. XOR-Gates)
+                    yield garbled_table
+            outputs = plan.output_slots
+
+        self.outputs = [(garbled_wires[idx] for idx in output)
+                        for output in outputs]
+
+
+    def garble_levels(self, garbled_wires, schedule, processes):
+        """
+        garble the gates level by level (see L{LevelSchedule}), the
+        non-free gates of a level only depend on gates of lower levels.
+        Levels of at least parallel_batch non-free gates are split into one
+        chunk for each of the processes workers of the pool and one chunk
+        garbled meanwhile in this process. Yields the garbled tables in gate
+        order.
+        """
+        plan = self.plan
+        u = plan.num_inputs
+        k = plan.num_gates
+        inputs, offsets, kinds, truths = plan.inputs, plan.offsets, plan.kinds, plan.truths
+        slots = schedule.slots
+        values = garbled_wires.values
+        encoded = garbled_wires.encoded
+        free_xor = self.free_xor
+        bits = state.config.symmetric_security_parameter + 1
+        encode = garbled_wires.encode
+        decode = garbled_wires.decode
+
+        # the workers get self pickled once and the labels as flat strings
+        token = None
+        tables = {}
+        done = bytearray(k)
+        emit = 0
+        for hashed, free in schedule.levels:
+            gates = [([slots[i] for i in inputs[offsets[ix]:offsets[ix + 1]]], truths[ix], ix)
+                     for ix in hashed]
+            if len(gates) >= self.parallel_batch:
+                if token is None:
+                    token = _tokens.next()
+                    blob = cPickle.dumps(self.worker_copy(), cPickle.HIGHEST_PROTOCOL)
+                size = -(-len(gates) // (processes + 1))
+                chunks = [gates[i:i + size] for i in xrange(size, len(gates), size)]
+                pending = get_pool(processes).map_async(_garble_gates, [
+                        (token, blob, bits,
+                         array("i", [ix for g_ins, truth, ix in chunk]),
+                         [truth for g_ins, truth, ix in chunk],
+                         array("B", [len(g_ins) for g_ins, truth, ix in chunk]),
+                         "".join([encode(garbled_wires[i]) for g_ins, truth, ix in chunk for i in g_ins]))
+                        for chunk in chunks])
+                garbled = self.create_garbled_gates(garbled_wires, gates[:size])
+                for labels, chunk_tables in pending.get():
+                    garbled.extend([(decode(labels, j), table) for j, table in enumerate(chunk_tables)])
+            else:
+                garbled = self.create_garbled_gates(garbled_wires, gates)
+
+            # all inputs of the level are read, so outputs may reuse their slots
+            for ix, (wireval, garbled_table) in zip(hashed, garbled):
+                garbled_wires[slots[u + ix]] = wireval
+                if garbled_table:
+                    tables[ix] = garbled_table
+                done[ix] = 1
+
+            for ix in free:
+                first = offsets[ix]
+                out = slots[u + ix]
+                if free_xor and kinds[ix] == XOR_GATE:
+                    values[out] = values[slots[inputs[first]]] ^ values[slots[inputs[first + 1]]]
+                    encoded[out] = 0
+                else:
+                    garbled_wires[out], garbled_table = self.create_garbled_gate(
+                        garbled_wires, [slots[i] for i in inputs[first:offsets[ix + 1]]], truths[ix], ix)
+                done[ix] = 1
+
+            # keep the order of the garbled tables the evaluator expects
+            while emit < k and done[emit]:
+                if emit in tables:
+                    yield tables.pop(emit)
+                emit += 1
 
     def results(self):
         for i in self.outputs:
@@ -73,14 +265,27 @@ class AbstractEvaluatorGarbledCircuit(object):
 
     _circuit_counter = 0
 
+    free_xor = False
+
     def __init__(self, circuit, next_garbled_gate, garbled_inputs):
-        self.circuit = self.optimize_circuit(circuit)
+        self.plan = get_plan(circuit, self.optimize_circuit)
+        self.circuit = self.plan.circuit
         self.next_garbled_gate = next_garbled_gate
 
         self.circuit_id = AbstractEvaluatorGarbledCircuit._circuit_counter
         AbstractEvaluatorGarbledCircuit._circuit_counter += 1
         self.garbled_inputs = garbled_inputs
 
+        if isinstance(next_garbled_gate, GarbledTableFrames):
+            # tables are packed into frames, take them by size
+            width = bit2byte(state.config.symmetric_security_parameter + 1)
+            take = next_garbled_gate.take
+            self.next_table = lambda rows: take(rows * width)
+
+    def next_table(self, rows):
+        """ returns the next garbled table, which has rows entries """
+        return self.next_garbled_gate.next()
+
     def set_inputs(self, inputs):
         self.garbled_inputs = inputs
 
@@ -102,30 +307,40 @@ class AbstractEvaluatorGarbledCircuit(object):
 
         #serialize the inputs into one big list of garbled wires
         garbled_inputs = self.garbled_inputs = reduce(lambda x, y: tuple(x) + tuple(y), self.garbled_inputs)
-        u = self.circuit.num_input_bits()
+        plan = self.plan
+        u = plan.num_inputs
 
-        k = self.circuit.num_gates()
-        garbled_wires = [None for i in xrange(u + k)]
+        k = plan.num_gates
+        garbled_wires = LabelStore(plan.num_slots, state.config.symmetric_security_parameter + 1)
 
         if len(garbled_inputs) != u:
             raise ValueError("Number of garbled inputs does not match "
                 "number of circuit inputs! (got %d, expect %d)"%(len(garbled_inputs), u))
-        garbled_wires[:u] = garbled_inputs
+        garbled_wires.set_inputs(garbled_inputs)
         self.evaluation_costs()
 
-        # evaluate garbled gates
-        for ix, gate in enumerate(self.circuit.next_gate()):
-            inputs, truth = gate
-            len_inputs = len(inputs)
-            garbled_wires[u + ix] = self.evaluate_garbled_gate([garbled_wires[i] for i in inputs], truth, ix)
-#            yield None
+        # evaluate garbled gates, wires share slots (see GarbledCircuitPlan)
+        ins, offsets, kinds, truths, slots = plan.slot_inputs, plan.offsets, plan.kinds, plan.truths, plan.slots
+        # free XORs write the values directly, skipping the encoding of the LabelStore
+        values = garbled_wires.values
+        encoded = garbled_wires.encoded
+        free_xor = self.free_xor
+        for ix in xrange(k):
+            first = offsets[ix]
+            out = slots[u + ix]
+            if free_xor and kinds[ix] == XOR_GATE:
+                values[out] = values[ins[first]] ^ values[ins[first + 1]]
+                encoded[out] = 0
+            else:
+                garbled_wires[out] = self.evaluate_garbled_gate(
+                    garbled_wires, ins[first:offsets[ix + 1]], truths[ix], ix)
 
         for i in self.next_garbled_gate:
             # unreachable unless your circuits do not match or your 
             # evaluate_garbled_gate does not use all of self.next_garbled_gate
             assert False, "Circuit and Garbled Circuit does not Match!"
 
-        self.outputs = [(garbled_wires[outwire] for outwire in output[0]) for output in self.circuit.outputs()]
+        self.outputs = [(garbled_wires[outwire] for outwire in output) for output in plan.output_slots]
 
     def eval (self):
 #        for i in self.evaluate_next_gate():
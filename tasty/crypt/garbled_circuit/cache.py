@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+
+"""Process wide cache of circuits and their garbling plans"""
+
+import atexit
+import hashlib
+import os
+import warnings
+from collections import OrderedDict
+
+import tasty
+from tasty import state
+from tasty.circuit.compiled import CompiledCircuit
+from tasty.crypt.garbled_circuit.plan import GarbledCircuitPlan
+
+__all__ = ["CircuitCache", "circuit_cache", "cached_circuit", "DEFAULT_CIRCUIT_CACHE_SIZE",
+           "CACHE_VERSION"]
+
+# version of the stored plans, to be increased whenever the gates of
+# circuits change without a change of their constructor arguments
+CACHE_VERSION = 2
+
+# default memory cap of the circuit cache in MiB
+DEFAULT_CIRCUIT_CACHE_SIZE = 64
+
+# approximate size of a circuit instance without plans in bytes
+CIRCUIT_BYTES = 1024
+
+
+class CircuitCache(object):
+    """
+    LRU cache of circuits keyed by circuit class and constructor arguments
+
+    Equal circuits are only created once. As the garbled circuits store the
+    plans of the optimized circuit (see L{get_plan}) with the circuit
+    instance, the circuit transformations are only run once for all garbled
+    circuits built from a cached circuit, too. Circuits are evicted least
+    recently used first as soon as the approximate memory usage of the
+    cached circuits and their plans exceeds max_bytes.
+
+    If path is set, plans are stored in that directory when their circuit
+    is evicted or the process exits and are loaded again instead of being
+    built the next time an equal circuit is created. The optimized circuits
+    of the plans are stored as L{CompiledCircuit} files in a directory
+    named after CACHE_VERSION, the tasty version, class and arguments of
+    the circuit and the digest of its gates (see L{CompiledCircuit.digest}),
+    so plans of circuits which changed are not found. The file names
+    contain the digests of the optimized circuits, which are checked on
+    load.
+    """
+
+    def __init__(self, max_bytes=None, path=None):
+        """
+        @type max_bytes: int
+        @param max_bytes: memory cap in bytes, None for no limit
+
+        @type path: str
+        @param path: directory to persist plans to, None to keep them in memory only
+        """
+        self.max_bytes = max_bytes
+        self.path = path
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.digests = {}
+        self.last = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    @staticmethod
+    def key(cls, args):
+        """ cache key of circuit cls(*args) """
+        return (cls, args)
+
+    def get(self, cls, *args):
+        """ returns the cached circuit cls(*args), creates it if needed """
+        key = self.key(cls, args)
+        try:
+            circuit = self.entries.pop(key)
+        except KeyError:
+            circuit = cls(*args)
+            self.load(key, circuit)
+        self.entries[key] = circuit
+
+        # plans of the last circuit were built after it was returned
+        if self.last in self.entries:
+            self.sizes[self.last] = self.memory_size(self.entries[self.last])
+        self.sizes[key] = self.memory_size(circuit)
+        self.last = key
+        self.shrink()
+        return circuit
+
+    @staticmethod
+    def memory_size(circuit):
+        """ approximate memory usage of circuit and its plans in bytes """
+        plans = getattr(circuit, "_gc_plans", {})
+        size = CIRCUIT_BYTES + sum(plan.memory_size() for plan in plans.itervalues())
+        compiled = getattr(circuit, "_compiled", None)
+        if compiled is not None:
+            # gates of circuits built with a CircuitBuilder
+            size += compiled.memory_size()
+        return size
+
+    def total_size(self):
+        """ approximate memory usage of all cached circuits in bytes """
+        return sum(self.sizes.itervalues())
+
+    def shrink(self):
+        """ evict least recently used circuits until the memory cap is met """
+        if self.max_bytes is None:
+            return
+        total = self.total_size()
+        while total > self.max_bytes and len(self.entries) > 1:
+            key, circuit = self.entries.popitem(last=False)
+            total -= self.sizes.pop(key)
+            self.store(key, circuit)
+            self.digests.pop(key, None)
+
+    def clear(self):
+        """ evict all circuits """
+        self.save()
+        self.entries.clear()
+        self.sizes.clear()
+        self.digests.clear()
+        self.last = None
+
+    def digest(self, key, circuit):
+        """ digest of the gates of the circuit with key """
+        try:
+            return self.digests[key]
+        except KeyError:
+            compiled = circuit.compiled() if hasattr(circuit, "compiled") else \
+                CompiledCircuit.from_circuit(circuit)
+            digest = self.digests[key] = compiled.digest()
+            return digest
+
+    def filename(self, key, circuit):
+        """ directory in path the plans of the circuit with key are stored in """
+        cls, args = key
+        name = "%d %s %s.%s%r %s" % (CACHE_VERSION, tasty.__version__, cls.__module__, cls.__name__,
+                                     args, self.digest(key, circuit))
+        return os.path.join(self.path, hashlib.sha1(name).hexdigest())
+
+    @staticmethod
+    def matches(plan_circuit, circuit):
+        """ True if the inputs and outputs of the optimized plan_circuit match circuit """
+        return plan_circuit.num_input_bits() == circuit.num_input_bits() and \
+            [(len(o), type_) for o, desc, type_ in plan_circuit.outputs()] == \
+            [(len(o), type_) for o, desc, type_ in circuit.outputs()]
+
+    def load(self, key, circuit):
+        """ load stored plans of circuit """
+        if not self.path:
+            return
+        directory = self.filename(key, circuit)
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return
+        plans = {}
+        for name in names:
+            try:
+                plan_key, digest, ext = name.rsplit(".", 2)
+            except ValueError:
+                continue
+            if ext != "tcc":
+                continue
+            filename = os.path.join(directory, name)
+            try:
+                compiled = CompiledCircuit.load(filename)
+                if compiled.digest() != digest or not self.matches(compiled, circuit):
+                    raise ValueError("circuit does not match")
+            except (IOError, ValueError), e:
+                warnings.warn("ignoring circuit plan %s: %s" % (filename, e))
+                continue
+            plan = plans[plan_key] = GarbledCircuitPlan(compiled)
+            plan.stored = True
+        if plans:
+            circuit._gc_plans = plans
+
+    def store(self, key, circuit):
+        """ store plans of circuit that are not stored yet """
+        plans = getattr(circuit, "_gc_plans", None)
+        if not self.path or not plans:
+            return
+        directory = None
+        for plan_key, plan in plans.iteritems():
+            if getattr(plan, "stored", False) or plan.circuit is None:
+                continue
+            if directory is None:
+                directory = self.filename(key, circuit)
+                if not os.path.isdir(directory):
+                    os.makedirs(directory)
+            compiled = CompiledCircuit.from_circuit(plan.circuit)
+            filename = os.path.join(directory, "%s.%s.tcc" % (plan_key, compiled.digest()))
+            tmp = "%s.%d" % (filename, os.getpid())
+            compiled.save(tmp)
+            os.rename(tmp, filename)
+            plan.stored = True
+
+    def save(self):
+        """ store the plans of all cached circuits """
+        for key, circuit in self.entries.iteritems():
+            self.store(key, circuit)
+
+
+_cache = CircuitCache()
+
+def circuit_cache():
+    """
+    returns the process wide circuit cache configured with circuit_cache_size
+    (in MiB, 0 disables caching) and circuit_cache_dir
+    """
+    size = getattr(state.config, "circuit_cache_size", None)
+    if size is None:
+        size = DEFAULT_CIRCUIT_CACHE_SIZE
+    _cache.max_bytes = size << 20
+    path = getattr(state.config, "circuit_cache_dir", None) or None
+    if path != _cache.path:
+        _cache.save()
+        _cache.path = path
+    return _cache
+
+def cached_circuit(cls, *args):
+    """
+    returns circuit cls(*args) from the process wide circuit cache
+
+    Circuits are shared, they must not be modified by the caller.
+    """
+    cache = circuit_cache()
+    if not cache.max_bytes:
+        return cls(*args)
+    return cache.get(cls, *args)
+
+atexit.register(_cache.save)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""Packing of garbled tables into large frames for transmission"""
+
+__all__ = ["FRAME_SIZE", "pack_tables", "GarbledTableFrames"]
+
+# minimal size of a frame in bytes
+FRAME_SIZE = 1 << 16
+
+def pack_tables(tables, frame_size=FRAME_SIZE):
+    """
+    concatenate garbled tables (strings of fixed width entries) into frames
+    of at least frame_size bytes, tables never span two frames
+
+    @rtype: generator
+    """
+    frame = []
+    size = 0
+    for table in tables:
+        frame.append(table)
+        size += len(table)
+        if size >= frame_size:
+            yield "".join(frame)
+            frame = []
+            size = 0
+    if frame:
+        yield "".join(frame)
+
+
+class GarbledTableFrames(object):
+    """
+    Reads garbled tables back from frames created by L{pack_tables}
+
+    The frames carry no sizes, the evaluator knows the number of entries of
+    each table from the circuit and takes the tables with L{take}.
+    """
+
+    def __init__(self, frames):
+        self.frames = iter(frames)
+        self.frame = ""
+        self.pos = 0
+
+    def take(self, size):
+        """ returns the next table of size bytes """
+        pos = self.pos
+        if pos + size > len(self.frame):
+            assert pos == len(self.frame), "garbled table spans two frames"
+            self.frame = self.frames.next()
+            pos = 0
+        self.pos = pos + size
+        return self.frame[pos:pos + size]
+
+    def __iter__(self):
+        """ iterate over the data that was not taken yet """
+        if self.pos < len(self.frame):
+            yield self.frame[self.pos:]
+        for frame in self.frames:
+            yield frame
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+"""Hash functions used to garble and evaluate the gates of a garbled circuit.
+
+A gate hash maps the garbled values on the inputs of a gate (and a tweak,
+usually the gate id) to a symmetric_security_parameter + 1 bit mpz. Creator and
+evaluator of a garbled circuit must use the same gate hash, it is selected
+with the gc_hash configuration value.
+"""
+
+import hashlib
+from struct import pack
+from gmpy import mpz
+
+from tasty import state
+from tasty.utils import bit2byte, str2mpz
+
+try:
+    from Crypto.Cipher import AES
+except ImportError:
+    AES = None
+
+__all__ = ["GateHash", "SHA256GateHash", "FixedKeyAESGateHash", "GATE_HASHES",
+           "DEFAULT_GATE_HASH", "gate_hash_class"]
+
+
+class GateHash(object):
+    """Base class for gate hashes
+
+    Subclasses must set name, which is used as key in the theoretical costs,
+    and implement __call__.
+    """
+
+    name = None
+
+    def __init__(self, circuit_id):
+        self.circuit_id = circuit_id
+        self.secparambits = state.config.symmetric_security_parameter + 1
+        self.secparambytes = bit2byte(self.secparambits)
+        self.MAX = mpz((1 << self.secparambits) - 1)
+
+    def __call__(self, inputs, gid):
+        """Hash garbled values inputs of gate gid
+
+        @type inputs: tuple
+        @param inputs: garbled values (mpz)
+
+        @type gid: int
+        @param gid: tweak, usually the index of the gate
+
+        @rtype: mpz
+        @return: hash truncated to symmetric_security_parameter + 1 bits
+        """
+        raise NotImplementedError()
+
+    def rows(self, rows, gid):
+        """Hash several input tuples of the same gate at once
+
+        @rtype: list
+        @return: list of hashes, one per row
+        """
+        return [self(row, gid) for row in rows]
+
+    def encoded(self, row, gid):
+        """Hash garbled values given as concatenation of their fixed width
+        encodings (see L{LabelStore})
+
+        @type row: str
+        @param row: encodings of the garbled values, secparambytes each
+
+        @rtype: mpz
+        """
+        return self.encoded_rows((row, ), gid)[0]
+
+    def encoded_rows(self, rows, gid):
+        """Hash several encoded input tuples of the same gate at once"""
+        w = self.secparambytes
+        return self.rows([[str2mpz(row[k:k + w] + "\0") for k in xrange(0, len(row), w)]
+                          for row in rows], gid)
+
+    def gate_rows(self, rows, gids):
+        """Hash the input tuples of several gates at once, rows[i] are the
+        input tuples of gate gids[i]
+
+        @rtype: list
+        @return: list of lists of hashes, one list per gate
+        """
+        return [self.rows(gate, gid) for gate, gid in zip(rows, gids)]
+
+    def encoded_gate_rows(self, rows, gids):
+        """Hash the encoded input tuples of several gates at once"""
+        w = self.secparambytes
+        return self.gate_rows([[[str2mpz(row[k:k + w] + "\0") for k in xrange(0, len(row), w)]
+                                for row in gate] for gate in rows], gids)
+
+    def costs(self, hashes):
+        """Returns the number of primitive calls needed for hashes gate hashes"""
+        return hashes
+
+
+class SHA256GateHash(GateHash):
+    """SHA-256 of inputs || circuit id || gate id, truncated (see [pssw09])"""
+
+    name = "SHA256"
+
+    def tweak(self, gid):
+        """ circuit id and gate id packed without alignment """
+        return pack("<HI", self.circuit_id, gid)
+
+    def pack(self, inputs, gid):
+        """ pack into string for sha-hashing
+        inputs = garbled values
+        gid = gate id
+        """
+        w = self.secparambytes
+        return "".join(x.binary()[:w].ljust(w, "\0") for x in inputs) + self.tweak(gid)
+
+    def __call__(self, inputs, gid):
+        return str2mpz(hashlib.sha256(self.pack(inputs, gid)).digest()) & self.MAX
+
+    def encoded(self, row, gid):
+        return str2mpz(hashlib.sha256(row + self.tweak(gid)).digest()) & self.MAX
+
+    def encoded_rows(self, rows, gid):
+        tweak = self.tweak(gid)
+        MAX = self.MAX
+        return [str2mpz(hashlib.sha256(row + tweak).digest()) & MAX for row in rows]
+
+    def encoded_gate_rows(self, rows, gids):
+        return [self.encoded_rows(gate, gid) for gate, gid in zip(rows, gids)]
+
+
+class FixedKeyAESGateHash(GateHash):
+    """Correlation robust hash from AES with a fixed, public key
+
+    H(x_1, ..., x_d, T) = pi(K) ^ K with K = 2 x_1 ^ 4 x_2 ^ ... ^ T, where pi
+    is AES under a fixed key and T is the tweak built from circuit id and gate
+    id (see [BHKR13]). K is folded into one 128 bit block. For
+    symmetric_security_parameter >= 128 the output is expanded with further
+    blocks K ^ (j << 120). All rows of a gate, or of all gates of a level
+    (see L{gate_rows}), are encrypted with one call to the cipher.
+    """
+
+    name = "AES"
+
+    # AES-128 key, public and fixed for all parties
+    KEY = hashlib.sha256("tasty fixed-key garbling").digest()[:16]
+    BLOCK = (1 << 128) - 1
+
+    def __init__(self, circuit_id):
+        if AES is None:
+            raise ImportError("gc_hash AES requires PyCrypto (Crypto.Cipher.AES)")
+        super(FixedKeyAESGateHash, self).__init__(circuit_id)
+        self.cipher = AES.new(self.KEY, AES.MODE_ECB)
+        self.blocks = (self.secparambits + 127) // 128
+        self.tweak = mpz(circuit_id) << 32
+
+    def __getstate__(self):
+        attrs = self.__dict__.copy()
+        del attrs["cipher"]
+        return attrs
+
+    def __setstate__(self, attrs):
+        self.__dict__.update(attrs)
+        self.cipher = AES.new(self.KEY, AES.MODE_ECB)
+
+    def blockkeys(self, inputs, gid):
+        """returns the cipher inputs used to hash inputs"""
+        K = self.tweak | gid
+        for i, x in enumerate(inputs):
+            K ^= x << (i + 1)
+        K = (K ^ (K >> 128)) & self.BLOCK
+        return [K ^ (mpz(j) << 120) for j in xrange(self.blocks)]
+
+    def gate_rows(self, rows, gids):
+        keys = [[self.blockkeys(row, gid) for row in gate] for gate, gid in zip(rows, gids)]
+        data = self.cipher.encrypt("".join(K.binary()[:16].ljust(16, "\0")
+                                           for gate in keys for row in gate for K in row))
+        ret = []
+        pos = 0
+        for gate in keys:
+            hashes = []
+            for row in gate:
+                v = mpz(0)
+                for j, K in enumerate(row):
+                    v |= (str2mpz(data[pos:pos + 16] + "\0") ^ K) << (128 * j)
+                    pos += 16
+                hashes.append(v & self.MAX)
+            ret.append(hashes)
+        return ret
+
+    def rows(self, rows, gid):
+        return self.gate_rows((rows, ), (gid, ))[0]
+
+    def __call__(self, inputs, gid):
+        return self.rows((inputs,), gid)[0]
+
+    def costs(self, hashes):
+        return hashes * self.blocks
+
+
+GATE_HASHES = {SHA256GateHash.name: SHA256GateHash,
+               FixedKeyAESGateHash.name: FixedKeyAESGateHash}
+
+DEFAULT_GATE_HASH = SHA256GateHash.name
+
+
+def gate_hash_class(name=None):
+    """Returns the gate hash class configured with gc_hash"""
+    if name is None:
+        name = getattr(state.config, "gc_hash", None) or DEFAULT_GATE_HASH
+    try:
+        return GATE_HASHES[name]
+    except KeyError:
+        raise ValueError("unknown gc_hash %r, expected one of %s" % (name, ", ".join(sorted(GATE_HASHES))))
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+from gmpy import mpz
+from tasty import state
+from tasty.utils import bit2byte
+from tasty.crypt.garbled_circuit.pssw09 import *
+from tasty.crypt.garbled_circuit.pssw09 import FreeXORReducedRowGarbledCircuit
+
+__all__ = ["HalfGatesEvaluatorGarbledCircuit", "HalfGatesCreatorGarbledCircuit"]
+
+# kinds of gates
+AFFINE, AND, TABLE = range(3)
+
+# garbled value of constant (public) wires known to the evaluator
+PUBLIC_LABEL = mpz(0)
+
+_gate_kinds = {}
+
+def gate_kind(d, truthtable):
+    """
+    classify gate with d inputs and given truthtable
+
+    @rtype: tuple
+    @return: (AFFINE, (c0, coefficients)) for gates computing
+    c0 ^ c_0 x_0 ^ ... ^ c_{d-1} x_{d-1} (XOR, XNOR, NOT, projections, constants),
+    (AND, (alpha, beta, gamma)) for 2-input gates computing
+    ((x_0 ^ alpha) & (x_1 ^ beta)) ^ gamma,
+    (TABLE, None) otherwise
+    """
+    try:
+        return _gate_kinds[d, truthtable]
+    except KeyError:
+        pass
+
+    n = 1 << d
+    # output for input values v (input 0 is the most significant bit)
+    out = [(truthtable >> (n - 1 - v)) & 1 for v in xrange(n)]
+
+    c0 = out[0]
+    coeffs = tuple(out[1 << (d - i - 1)] ^ c0 for i in xrange(d))
+    if all(out[v] == c0 ^ (sum(c & (v >> (d - i - 1)) for i, c in enumerate(coeffs)) & 1)
+           for v in xrange(n)):
+        kind = (AFFINE, (c0, coeffs))
+    elif d == 2:
+        # odd number of ones, exactly one output differs from the others
+        gamma = int(sum(out) == 3)
+        v = out.index(1 - gamma)
+        kind = (AND, (1 ^ (v >> 1), 1 ^ (v & 1), gamma))
+    else:
+        kind = (TABLE, None)
+
+    _gate_kinds[d, truthtable] = kind
+    return kind
+
+
+### Implementation of half gates (see [zre15]) on top of FreeXOR, semi-honest model
+class HalfGatesGarbledCircuit(FreeXORReducedRowGarbledCircuit):
+    """
+    Half gates methods for both, evaluator and creator
+
+    Affine gates are free, 2-input AND-type gates need two table entries
+    and gates with more inputs fall back to garbled row reduction.
+    """
+
+    def free_gate(self, d, truthtable):
+        """ affine gates are free """
+        return gate_kind(d, truthtable)[0] == AFFINE
+
+    def gate_counts(self):
+        """ count AND-type gates and table gates by number of inputs """
+        ands = 0
+        tables = {}
+        for g_in, g_tab in self.plan.gates():
+            d = len(g_in)
+            kind = gate_kind(d, g_tab)[0]
+            if kind == AND:
+                ands += 1
+            elif kind == TABLE:
+                tables[d] = tables.get(d, 0) + 1
+        return ands, tables
+
+
+class HalfGatesCreatorGarbledCircuit(
+    HalfGatesGarbledCircuit, FreeXORReducedRowCreatorGarbledCircuit):
+
+    def create_garbled_gate(self, wires, inputs, truthtable, gateid):
+        """ garble gate gateid, tweaks 2 * gateid and 2 * gateid + 1 are used for hashing """
+
+        R = self.R
+        kind, params = gate_kind(len(inputs), truthtable)
+
+        if kind == AFFINE:
+            c0, coeffs = params
+            val = PUBLIC_LABEL
+            for c, i in zip(coeffs, inputs):
+                if c:
+                    val ^= wires[i]
+            return val ^ (R * c0), None # no garbled table
+
+        elif kind == AND:
+            alpha, beta, gamma = params
+            a, b = inputs
+            A0 = wires[a] ^ (R * alpha)
+            pa = wires.perm_bit(a) ^ alpha
+            pb = wires.perm_bit(b) ^ beta
+
+            hA0, hA1 = self.gate_hash.encoded_rows((wires.label(a, alpha), wires.label(a, 1 ^ alpha)), 2 * gateid)
+            hB0, hB1 = self.gate_hash.encoded_rows((wires.label(b, beta), wires.label(b, 1 ^ beta)), 2 * gateid + 1)
+
+            # garbler half gate
+            TG = hA0 ^ hA1 ^ (R * pb)
+            WG = hA0 ^ (TG * pa)
+
+            # evaluator half gate
+            TE = hB0 ^ hB1 ^ A0
+            WE = hB0 ^ ((TE ^ A0) * pb)
+
+            return WG ^ WE ^ (R * gamma), wires.encode(TG) + wires.encode(TE)
+
+        else:
+            return super(HalfGatesCreatorGarbledCircuit, self).create_garbled_gate(
+                wires, inputs, truthtable, 2 * gateid)
+
+
+    def create_garbled_gates(self, wires, gates):
+        """ half gates are garbled one by one """
+        return [self.create_garbled_gate(wires, inputs, truth, gateid)
+                for inputs, truth, gateid in gates]
+
+    def creation_costs(self):
+        ands, tables = self.gate_counts()
+        hashes = ands * 4
+        rows = ands * 2
+        for d, num in tables.iteritems():
+            hashes += num * (1 << d)
+            rows += num * ((1 << d) - 1)
+
+        return {self.gate_hash.name: self.gate_hash.costs(hashes),
+                "Send": rows * bit2byte(state.config.symmetric_security_parameter + 1)}
+
+
+class HalfGatesEvaluatorGarbledCircuit(
+    HalfGatesGarbledCircuit, FreeXORReducedRowEvaluatorGarbledCircuit):
+
+    def evaluate_garbled_gate(self, wires, inputs, truthtable, index):
+        kind, params = gate_kind(len(inputs), truthtable)
+
+        if kind == AFFINE:
+            val = PUBLIC_LABEL
+            for c, i in zip(params[1], inputs):
+                if c:
+                    val ^= wires[i]
+            return val
+
+        elif kind == AND:
+            table = self.next_table(2)
+            a, b = inputs
+            A = wires[a]
+            WG = self.gate_hash.encoded(wires.label(a), 2 * index)
+            if wires.perm_bit(a):
+                WG ^= wires.decode(table, 0)
+            WE = self.gate_hash.encoded(wires.label(b), 2 * index + 1)
+            if wires.perm_bit(b):
+                WE ^= wires.decode(table, 1) ^ A
+            return WG ^ WE
+
+        else:
+            return super(HalfGatesEvaluatorGarbledCircuit, self).evaluate_garbled_gate(
+                wires, inputs, truthtable, 2 * index)
+
+
+    def evaluation_costs(self):
+        ands, tables = self.gate_counts()
+        return {self.gate_hash.name: self.gate_hash.costs(ands * 2 + sum(tables.itervalues()))}
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+"""Storage of the wire labels (garbled values) of a garbled circuit"""
+
+from tasty.utils import bit2byte, str2mpz
+
+__all__ = ["LabelStore"]
+
+
+class LabelStore(object):
+    """
+    Wire labels of a garbled circuit
+
+    All labels are kept in one contiguous buffer with a fixed width
+    encoding (little endian, bit2byte(bits) bytes per label), which is
+    what the gate hashes consume and what is sent in the garbled tables.
+    The creator also stores the encoding of the label for value 1
+    (label ^ R) so that hash inputs of all table rows are just slices of
+    the buffer. Labels are encoded lazily, once per wire, when they are
+    first needed as a hash input, so wires only used by free XOR gates
+    are never converted.
+
+    The mpz values are still kept for the XORs of free XOR gates, which
+    are far cheaper on mpz than on byte strings.
+    """
+
+    def __init__(self, size, bits, R=None):
+        """
+        @type size: int
+        @param size: number of wires
+
+        @type bits: int
+        @param bits: bit length of the labels
+
+        @type R: mpz
+        @param R: global difference, only known to the creator
+        """
+        self.width = bit2byte(bits)
+        self.R = R
+        self.slots = 1 if R is None else 2
+        self.values = [None] * size
+        self.buf = bytearray(size * self.slots * self.width)
+        self.view = memoryview(self.buf)
+        self.encoded = bytearray(size)
+        self.pads = ["\0" * i for i in xrange(self.width + 1)]
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        return self.values[i]
+
+    def __setitem__(self, i, label):
+        self.values[i] = label
+        self.encoded[i] = 0
+
+    def set_inputs(self, labels):
+        """ store labels of the input wires """
+        for i, label in enumerate(labels):
+            self[i] = label
+
+    def encode(self, x):
+        """ fixed width encoding of mpz x """
+        s = x.binary()
+        l = len(s)
+        if l < self.width:
+            return s + self.pads[self.width - l]
+        elif l > self.width:
+            return s[:self.width]
+        return s
+
+    def decode(self, s, index=0):
+        """ decode index-th label from a string of fixed width encodings """
+        w = self.width
+        return str2mpz(s[index * w:(index + 1) * w] + "\0")
+
+    def offset(self, i):
+        """ offset of the encoding of wire i in the buffer, encodes the label if needed """
+        w = self.width
+        off = i * self.slots * w
+        if not self.encoded[i]:
+            label = self.values[i]
+            self.view[off:off + w] = self.encode(label)
+            if self.R is not None:
+                self.view[off + w:off + 2 * w] = self.encode(label ^ self.R)
+            self.encoded[i] = 1
+        return off
+
+    def label(self, i, value=0):
+        """ encoding of label of wire i, for the creator of the label for value """
+        off = self.offset(i) + value * self.width
+        return self.view[off:off + self.width].tobytes()
+
+    def perm_bit(self, i):
+        """ permutation bit of (the zero label of) wire i """
+        return self.buf[self.offset(i)] & 1
+
+    def perm_bits(self, inputs):
+        """ permutation bits of wires inputs as integer, first wire is most significant """
+        buf = self.buf
+        encoded = self.encoded
+        step = self.slots * self.width
+        permbits = 0
+        for i in inputs:
+            if not encoded[i]:
+                self.offset(i)
+            permbits = (permbits << 1) | (buf[i * step] & 1)
+        return permbits
+
+    def row(self, inputs, values=0):
+        """
+        hash input for wires inputs, i.e., concatenation of their encodings
+
+        the creator selects the labels of value (values >> (d - i - 1)) & 1
+        for the i-th of the d wires
+        """
+        buf = self.buf
+        encoded = self.encoded
+        w = self.width
+        step = self.slots * w
+        d = len(inputs)
+        row = bytearray()
+        for j, i in enumerate(inputs):
+            if not encoded[i]:
+                self.offset(i)
+            off = i * step + ((values >> (d - j - 1)) & 1) * w
+            row += buf[off:off + w]
+        return str(row)
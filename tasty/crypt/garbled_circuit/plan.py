@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+
+"""Precompiled circuits for garbling and evaluating"""
+
+from array import array
+from tasty.circuit.compiled import CompiledCircuit
+
+__all__ = ["GarbledCircuitPlan", "LevelSchedule", "get_plan", "plan_key", "XOR_GATE", "CONSTANT_GATE",
+           "INVERTER_GATE", "TABLE_GATE"]
+
+# gate kinds
+XOR_GATE, CONSTANT_GATE, INVERTER_GATE, TABLE_GATE = range(4)
+
+
+def gate_code(d, truthtable):
+    """ kind of gate with d inputs and given truthtable """
+    if d == 2 and truthtable == 0b0110:
+        return XOR_GATE
+    elif truthtable == 0 or truthtable == (1 << (1 << d)) - 1:
+        return CONSTANT_GATE
+    elif d == 1 and truthtable == 0b10:
+        return INVERTER_GATE
+    return TABLE_GATE
+
+
+def assign_slots(u, inputs, offsets, outputs, order):
+    """
+    liveness analysis, assigns wires to reusable slots for evaluating the
+    gates in the given order
+
+    A wire occupies its slot from the gate computing it up to its last use
+    in order, output wires are never freed.
+
+    @rtype: tuple
+    @return: slots of all wires (array), number of slots
+    """
+    k = len(offsets) - 1
+    position = [0] * k
+    for pos, ix in enumerate(order):
+        position[ix] = pos
+
+    # last position using a wire, k for output wires which are never freed
+    last = [-1] * (u + k)
+    for ix in xrange(k):
+        pos = position[ix]
+        for i in inputs[offsets[ix]:offsets[ix + 1]]:
+            if last[i] < pos:
+                last[i] = pos
+    for output in outputs:
+        for i in output:
+            last[i] = k
+
+    slots = array("i", xrange(u)) + array("i", [0]) * k
+    free = [i for i in xrange(u - 1, -1, -1) if last[i] == -1]
+    num_slots = u
+    for pos, ix in enumerate(order):
+        for i in set(inputs[offsets[ix]:offsets[ix + 1]]):
+            if last[i] == pos:
+                free.append(slots[i])
+        if free:
+            slot = free.pop()
+        else:
+            slot = num_slots
+            num_slots += 1
+        slots[u + ix] = slot
+        if last[u + ix] == -1:
+            # unused wire
+            free.append(slot)
+    return slots, num_slots
+
+
+class LevelSchedule(object):
+    """
+    Gates of a plan in levels for garbling all non-free gates of a level at
+    once (see L{AbstractCreatorGarbledCircuit.garble_levels})
+
+    The level of a wire is the number of non-free gates on its longest
+    path, so the non-free gates of a level only depend on lower levels.
+    levels holds the (non-free, free) gate indices of each level. Wires are
+    assigned to slots for this order of the gates, like the slots of the
+    plan for the gate order.
+    """
+
+    def __init__(self, plan, free_gate):
+        """
+        @type free_gate: function
+        @param free_gate: free_gate(d, truthtable) is True for free gates
+        """
+        u = plan.num_inputs
+        inputs = plan.inputs
+        offsets = plan.offsets
+        wirelevels = [0] * (u + plan.num_gates)
+        levels = {}
+        for ix, truth in enumerate(plan.truths):
+            g_ins = inputs[offsets[ix]:offsets[ix + 1]]
+            level = max([wirelevels[i] for i in g_ins] or [0])
+            free = free_gate(len(g_ins), truth)
+            if not free:
+                level += 1
+            wirelevels[u + ix] = level
+            levels.setdefault(level, ([], []))[free].append(ix)
+        self.levels = [levels[level] for level in sorted(levels)]
+
+        order = [ix for hashed, free in self.levels for ix in hashed + free]
+        self.slots, self.num_slots = assign_slots(u, inputs, offsets, plan.outputs, order)
+        self.output_slots = [tuple(self.slots[i] for i in output) for output in plan.outputs]
+
+    def memory_size(self):
+        """ approximate memory usage of the schedule in bytes """
+        gates = sum(len(hashed) + len(free) for hashed, free in self.levels)
+        return self.slots.itemsize * len(self.slots) + 8 * gates
+
+
+class GarbledCircuitPlan(object):
+    """
+    An (optimized) circuit compiled into flat arrays
+
+    The inputs of gate ix are inputs[offsets[ix]:offsets[ix + 1]], its
+    truth table is truths[ix] and its kind (see L{gate_code}) is
+    kinds[ix]. Wires 0 .. num_inputs - 1 are the input wires, the output
+    wire of gate ix is num_inputs + ix.
+
+    Wires are also assigned to slots by a liveness analysis: a wire
+    occupies its slot from the gate computing it up to its last use, then
+    the slot is reused for later wires. Output wires keep their slots. The
+    inputs of gate ix in slot numbers are slot_inputs[offsets[ix]:offsets[ix
+    + 1]], its output goes to slot slots[num_inputs + ix], so garbling and
+    evaluating gates in order need num_slots (about the width of the
+    circuit) instead of num_inputs + num_gates labels.
+    """
+
+    def __init__(self, circuit):
+        """
+        @type circuit: Circuit
+        @param circuit: optimized circuit
+        """
+        self.circuit = circuit
+        self.num_inputs = circuit.num_input_bits()
+
+        # the gate arrays of compiled circuits are shared
+        compiled = CompiledCircuit.from_circuit(circuit)
+        inputs = compiled.gate_inputs
+        offsets = compiled.offsets
+        truths = compiled.truths.tolist()
+        kinds = array("B", (gate_code(offsets[ix + 1] - offsets[ix], truth)
+                            for ix, truth in enumerate(truths)))
+
+        self.inputs = inputs
+        self.offsets = offsets
+        self.kinds = kinds
+        self.truths = truths
+        self.num_gates = len(truths)
+        self.outputs = [tuple(output[0]) for output in circuit.outputs()]
+        self._gate_types = None
+        self._schedules = {}
+        self.assign_slots()
+
+    def assign_slots(self):
+        """ liveness analysis, assigns wires to reusable slots """
+        slots, num_slots = assign_slots(self.num_inputs, self.inputs, self.offsets,
+                                        self.outputs, xrange(self.num_gates))
+        self.slots = slots
+        self.num_slots = num_slots
+        self.slot_inputs = array("i", (slots[i] for i in self.inputs))
+        self.output_slots = [tuple(slots[i] for i in output) for output in self.outputs]
+
+    def level_schedule(self, free_gate):
+        """
+        returns the L{LevelSchedule} of the plan for free_gate, which is
+        built once per transformation of free_gate (see L{plan_key})
+        """
+        key = plan_key(free_gate)
+        try:
+            return self._schedules[key]
+        except KeyError:
+            schedule = self._schedules[key] = LevelSchedule(self, free_gate)
+            return schedule
+
+    def __getstate__(self):
+        """ the optimized circuit is not stored, the plan is all that is needed """
+        d = dict(self.__dict__)
+        d["circuit"] = None
+        return d
+
+    def memory_size(self):
+        """ approximate memory usage of the plan (and its buffered circuit) in bytes """
+        size = sum(a.itemsize * len(a) for a in (self.inputs, self.offsets, self.kinds,
+                                                 self.slots, self.slot_inputs))
+        size += 8 * len(self.truths)
+        size += sum(schedule.memory_size() for schedule in self._schedules.itervalues())
+        if isinstance(self.circuit, CompiledCircuit):
+            # gate inputs and offsets are shared with the plan
+            size += self.circuit.truths.itemsize * self.num_gates
+        elif self.circuit is not None:
+            # other buffered circuits (e.g. circuit_buffer_RAM) keep tuples of gates
+            size += 128 * self.num_gates
+        return size
+
+    def gates(self):
+        """ iterate over (inputs, truthtable) of all gates like Circuit.next_gate """
+        inputs = self.inputs
+        offsets = self.offsets
+        for ix, truth in enumerate(self.truths):
+            yield inputs[offsets[ix]:offsets[ix + 1]], truth
+
+    def gate_types(self):
+        """ see L{Circuit.gate_types} """
+        if self._gate_types is None:
+            gates = {}
+            offsets = self.offsets
+            for ix, kind in enumerate(self.kinds):
+                d = offsets[ix + 1] - offsets[ix]
+                if d == 2:
+                    key = "2_XOR" if kind == XOR_GATE else "2_NONXOR"
+                else:
+                    key = str(d)
+                gates[key] = gates.get(key, 0) + 1
+            self._gate_types = gates
+        return dict(self._gate_types)
+
+
+def plan_key(optimize_circuit):
+    """
+    name of the circuit transformation optimize_circuit, the name of the
+    class defining it for methods, so that the plans of all garbled
+    circuit classes sharing a transformation are shared, too
+
+    @rtype: str
+    """
+    func = getattr(optimize_circuit, "im_func", optimize_circuit)
+    owner = getattr(optimize_circuit, "im_class", None)
+    if owner is not None:
+        for cls in owner.__mro__:
+            if cls.__dict__.get(func.__name__) is func:
+                return "%s.%s.%s" % (cls.__module__, cls.__name__, func.__name__)
+    return "%s.%s" % (func.__module__, func.__name__)
+
+
+def get_plan(circuit, optimize_circuit):
+    """
+    returns the plan of circuit optimized with optimize_circuit, plans are
+    built once and stored with the circuit instance
+
+    @type optimize_circuit: function
+    @param optimize_circuit: circuit transformation of the garbling scheme
+    """
+    try:
+        plans = circuit._gc_plans
+    except AttributeError:
+        plans = circuit._gc_plans = {}
+    key = plan_key(optimize_circuit)
+    try:
+        return plans[key]
+    except KeyError:
+        plan = plans[key] = GarbledCircuitPlan(optimize_circuit(circuit))
+        return plan
@@ -1,57 +1,58 @@
 # -*- coding: utf-8 -*-
 from tasty.circuit import Circuit
-from tasty.circuit.transformations import circuit_buffer_RAM, replace_xnor_with_xor, replace_3_by_2
+from tasty.circuit.transformations import remove_redundant_gates, replace_3_by_2
+from tasty.circuit.compiled import CompiledCircuit
 from tasty import state, cost_results
 from gmpy import mpz
-import hashlib
-from tasty.utils import bit2byte, str2mpz
+from tasty.utils import bit2byte
 from tasty.crypt.garbled_circuit.abstract_garbled_circuit import * 
+from tasty.crypt.garbled_circuit.gatehash import gate_hash_class
 from tasty.protocols.protocol import get_realcost
 
 __all__ = ["FreeXORReducedRowEvaluatorGarbledCircuit", "FreeXORReducedRowCreatorGarbledCircuit"]
 
+def _permute_truth(permbits, d, truthtable):
+    """ truthtable of a d-input gate permuted by permbits, see L{get_permuted_truth} """
+    n = 1 << d
+    return tuple((truthtable >> (n - 1 - (e ^ permbits))) & 1 for e in xrange(n))
+
+# permuted truthtables of all gates with up to 3 inputs,
+# PERMUTED_TRUTHS[d][(truthtable << d) | permbits]
+PERMUTED_TRUTHS = [tuple(_permute_truth(permbits, d, truthtable)
+                         for truthtable in xrange(1 << (1 << d))
+                         for permbits in xrange(1 << d))
+                   for d in xrange(4)]
+
+
 ### Implementation with FreeXORgates and reduced row (see [pssw09]), semi-honest model
 class FreeXORReducedRowGarbledCircuit(object):
     """
     FreeXOR standard methods for both, evaluator and creator
     """
-#    __MAX = (2**(state.config.symmetric_security_parameter + 1) - 1)
 
-    __MAX = None
+    free_xor = True
+
+    def __init__(self, *args):
+        super(FreeXORReducedRowGarbledCircuit, self).__init__(*args)
+        # gate hash (SHA256, fixed-key AES, ...) as configured by gc_hash
+        self.gate_hash = gate_hash_class()(self.circuit_id)
 
     def optimize_circuit(self, c):
         """
-        Try to minimize number of non-XOR gates
+        Try to minimize number of non-XOR gates, XNOR gates are replaced
+        by XOR gates while removing redundant gates
         """
         stopwatch = get_realcost("Circuit")
         stopwatch.start()
-        c = circuit_buffer_RAM(replace_xnor_with_xor(replace_3_by_2(c)))
+        reduced = remove_redundant_gates(replace_3_by_2(c))
+        c = CompiledCircuit.from_circuit(reduced)
+        state.log.debug(reduced.message())
         stopwatch.stop()
         return c
     
-    def packforhash(self, tup, gid):
-        """ pack into string for sha-hashing 
-        tup = inputs
-        gid = gate id
-        d = num of inputs
-        """
-        from struct import pack
-        
-        d = len(tup)
-
-        secparambytes = bit2byte(state.config.symmetric_security_parameter + 1)
-        s = pack((str(secparambytes) + "s") * d + "HI", # formatstring: "11s11s11sHI" for d = 3 with t = 80
-                 *map(lambda x: x.binary(), tup) + [ # tup[0].binary(), tup[1].binary(), tup[2].binary()
-                self.circuit_id, gid])
-                                
-#        s = pack(str(secparambytes) + "s" + str(secparambytes) + "sHH", # formatstring looks as follows: "10s10sHH"
-#                    (tup[0]>>1).binary(), (tup[1]>>1).binary(),
-#                    self.circuit_id,
-#                    gid) #TODO: check that this works
-#        return s + mpz(gid << 2 | (_bit(tup[0], 1) << 1) | _bit(tup[1], 1)).binary()
-
-        return s # "tup[0] || ... || tup[d-1] || circuit_id || gate_id"
-
+    def free_gate(self, d, truthtable):
+        """ XOR gates are free """
+        return d == 2 and truthtable == 0b0110
 
     @staticmethod
     def perm_bit(garbled_bit):
@@ -59,122 +60,99 @@ class FreeXORReducedRowGarbledCircuit(object):
         return mpz(garbled_bit).getbit(0)
 
     @staticmethod
-    def get_permbits(zero_inputs):
-        permbits = 0
-        for i in zero_inputs: # get permutation bits from zero inputs and
-            permbits <<= 1
-            permbits |= FreeXORReducedRowGarbledCircuit.perm_bit(i)
-
-        return permbits
-    
-    @staticmethod
-    def get_permuted_truth(zero_inputs, truthtable):
-        """
-        zero_inputs is a tuple of garbled bits with value 0
-        
-        @returns permutation bits as integer, permutation (list of indexes), 
-        
-        document me!
+    def get_permuted_truth(permbits, d, truthtable):
         """
-        d = len(zero_inputs)
+        permbits are the permutation bits of the zero inputs of a d-input gate
+        (see L{LabelStore.perm_bits})
 
-        permbits = FreeXORReducedRowGarbledCircuit.get_permbits(zero_inputs)
-        perm = [i ^ permbits for i in xrange(1 << d)] # generate list of indexes
-
-        _truthtable = mpz(truthtable)
-        permtruth = tuple(reversed([_truthtable.getbit(i) for i in perm])) # compute permuted truthtable
-        return permtruth
-
-
-    def pentry(self, inputs, e):
-        """ 
-        returns garbled input values for row e
+        @returns truthtable permuted by permbits, entry e is the output for
+        the inputs with permutation bits e
         """
-
-        d = len(inputs)
-
-        a = tuple(inp ^ (self.R * (self.perm_bit(inp) ^ ((e >> (d-i-1)) & 1)))
-                     for i, inp in enumerate(inputs))
-        
-        assert d != 2 or (inputs[0] ^ (self.R * (self.perm_bit(inputs[0]) ^ (e >> 1))),
-                          (inputs[1] ^ (self.R * (self.perm_bit(inputs[1]) ^ e & 1)))) == a
-        return a
-
-        # for d = 2:
-        # return (inp[0] ^ (self.R * (self.perm_bit(inp[0]) ^ (e >> 1))),
-        #                (inp[1] ^ (self.R * (self.perm_bit(inp[1]) ^ e & 1))))
-
-    @staticmethod
-    def mpzsha256trunc (x):
-        """ 
-        generate sha256-hash of x, convert to mpz and truncate 
-        to symmetric_security_parameter + 1 bits
-        @itypes: string
-        @rtypes: mpz
-        """ 
-        if not FreeXORReducedRowGarbledCircuit.__MAX:
-            FreeXORReducedRowGarbledCircuit.__MAX = mpz((1 << (state.config.symmetric_security_parameter + 1)) - 1)
-
-        # generate digest
-        mpzdigest = str2mpz(hashlib.sha256(x).digest())
-        # truncate
-        v = mpzdigest & FreeXORReducedRowGarbledCircuit.__MAX
-        return v
+        if d < len(PERMUTED_TRUTHS):
+            return PERMUTED_TRUTHS[d][(truthtable << d) | permbits]
+        return _permute_truth(permbits, d, truthtable)
 
 class FreeXORReducedRowCreatorGarbledCircuit(
     FreeXORReducedRowGarbledCircuit, AbstractCreatorGarbledCircuit):
 
 
-    def create_garbled_gate(self, inputs, truthtable, gateid):
-        """crypto related stuff only here
-         FIXME: COMMENT
+    def create_garbled_gate(self, wires, inputs, truthtable, gateid):
+        """
+        garble gate gateid with input wires inputs of LabelStore wires
+
+        @rtype: tuple
+        @return: zero label of output wire and garbled table, i.e., the
+        fixed width encodings of the 2^d - 1 table entries as one string
+        (None for free XOR gates)
         """
 
         d = len(inputs)
         if d == 2 and truthtable == 0b0110:
             # XOR gate (free XOR)
-            return inputs[0] ^ inputs[1], None # no garbled table
-        
-        else:
-            R = self.R
-                                
-            ptruth = self.get_permuted_truth(inputs, truthtable) # get permuted truthtable of the gate
-
-            # compute garbled zero output value
-            g0 = self.mpzsha256trunc(
-                self.packforhash(self.pentry(inputs, 0), # get inputs for first entry in permuted table
-                                 gateid)) ^ (R * ptruth[0]) 
+            return wires[inputs[0]] ^ wires[inputs[1]], None # no garbled table
 
-            # compute garbled table
-            garbledtable = tuple((g0 ^ self.mpzsha256trunc(self.packforhash(
-                            self.pentry(inputs, e), gateid)) ^ (R * ptruth[e])).binary() 
-                                 for e in xrange (1,1<<d)) # 2^d -1 table entries
+        else:
+            permbits = wires.perm_bits(inputs)
+            # hash inputs of all entries in permuted table, entry e
+            # holds the inputs with permutation bits e
+            hashes = self.gate_hash.encoded_rows([wires.row(inputs, e ^ permbits) for e in xrange(1 << d)], gateid)
+            return self.garbled_table(wires, hashes, self.get_permuted_truth(permbits, d, truthtable))
 
-            return g0, garbledtable 
+    def create_garbled_gates(self, wires, gates):
+        """
+        garble gates (inputs, truthtable, gateid) of one level at once, the
+        rows of all gates are hashed with one call to the gate hash
+        """
+        results = [None] * len(gates)
+        hashed = []
+        rows = []
+        gids = []
+        for pos, (inputs, truthtable, gateid) in enumerate(gates):
+            d = len(inputs)
+            if d == 2 and truthtable == 0b0110:
+                results[pos] = wires[inputs[0]] ^ wires[inputs[1]], None
+                continue
+            permbits = wires.perm_bits(inputs)
+            hashed.append((pos, self.get_permuted_truth(permbits, d, truthtable)))
+            rows.append([wires.row(inputs, e ^ permbits) for e in xrange(1 << d)])
+            gids.append(gateid)
+
+        for (pos, ptruth), hashes in zip(hashed, self.gate_hash.encoded_gate_rows(rows, gids)):
+            results[pos] = self.garbled_table(wires, hashes, ptruth)
+        return results
+
+    def garbled_table(self, wires, hashes, ptruth):
+        """
+        garbled zero output value and garbled table from the hashes of the
+        rows and the permuted truthtable of a gate
+        """
+        R = self.R
+        g0 = hashes[0] ^ R if ptruth[0] else hashes[0]
+        garbledtable = "".join(wires.encode(g0 ^ hashes[e] ^ R if ptruth[e] else g0 ^ hashes[e])
+                               for e in xrange(1, len(hashes))) # 2^d -1 table entries
+        return g0, garbledtable
 
 
     def creation_costs(self):
         """ IMPLEMENT ME"""
-        t = self.circuit.gate_types()
+        t = self.plan.gate_types()
         hashes = 0
-        bits = 0
+        rows = 0
         for key in t.keys():
             if key == "2_XOR":
                 pass
             elif key == "2_NONXOR":
                 hashes += t[key] * 4
-                bits += t[key] * 3 * (state.config.symmetric_security_parameter + 1)
+                rows += t[key] * 3
             else:
                 d = int(key)
                 hashes += t[key] * (1<<d)
-                bits += t[key] * ((1<<d) - 1) * (state.config.symmetric_security_parameter + 1)
-        
-        #TODO: we should count theoretical costs in bits
-        # instead of rounding each time when converting from bits to bytes.
-        # for now to remain compatible:
-        bytes = bit2byte(bits)
-            
-        return {"SHA256": hashes,
+                rows += t[key] * ((1<<d) - 1)
+
+        # table entries are sent with fixed width
+        bytes = rows * bit2byte(state.config.symmetric_security_parameter + 1)
+
+        return {self.gate_hash.name: self.gate_hash.costs(hashes),
                 "Send": bytes }
         
         
@@ -182,23 +160,23 @@ class FreeXORReducedRowCreatorGarbledCircuit(
 class FreeXORReducedRowEvaluatorGarbledCircuit(
     FreeXORReducedRowGarbledCircuit, AbstractEvaluatorGarbledCircuit):
 
-    def evaluate_garbled_gate(self, inputs, table, index):
-#        print "*"
+    def evaluate_garbled_gate(self, wires, inputs, table, index):
         d = len(inputs)
         if d == 2 and table == 0b0110: # free XOR gate
-                return inputs[0] ^ inputs[1]
+            return wires[inputs[0]] ^ wires[inputs[1]]
         else:
-            table = self.next_garbled_gate.next()
-            val = self.mpzsha256trunc(self.packforhash(inputs, index))
-            index = self.get_permbits(inputs)
+            # gates without inputs have an empty table which is not sent
+            table = self.next_table((1 << d) - 1) if d else ""
+            val = self.gate_hash.encoded(wires.row(inputs), index)
+            index = wires.perm_bits(inputs)
             if index == 0:
                 return val
             else:
-                return val ^ str2mpz(table[index - 1])
+                return val ^ wires.decode(table, index - 1)
 
 
     def evaluation_costs(self):
-        t = self.circuit.gate_types()
+        t = self.plan.gate_types()
         hashes = 0
         for key in t.keys():
             if key == "2_XOR":
@@ -206,5 +184,5 @@ class FreeXORReducedRowEvaluatorGarbledCircuit(
             else:
                 hashes += t[key]
             
-        return {"SHA256": hashes}
+        return {self.gate_hash.name: self.gate_hash.costs(hashes)}
 
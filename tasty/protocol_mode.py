@@ -179,7 +179,8 @@ def do_protocol(
     setup_costs["duration"].start()
     if __debug__:
         state.log.info("precomputing '%d' OTs", costs["abstract"]["setup"]["accumulated"].get("ot", 0))
-    state.tasty_ot = tastyot.TastyOT(party, costs["abstract"]["setup"]["accumulated"].get("ot", 0))
+    state.tasty_ot = tastyot.TastyOT(party, costs["abstract"]["setup"]["accumulated"].get("ot", 0),
+                                     getattr(state.config, "correlated_ot", False))
     if __debug__:
         state.log.debug("OTs done")
 
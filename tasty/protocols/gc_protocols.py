@@ -1,11 +1,42 @@
 # -*- coding: utf-8 -*-
 
+import tempfile
+from struct import pack, unpack
 from tasty.crypt.garbled_circuit import *
 from tasty.protocols import protocol
 from tasty import state
 from tasty import cost_results
 
 
+class GarbledTableSpool(object):
+    """
+    Frames of garbled tables (strings) spooled to a temporary file as they
+    are received
+
+    Iterating over the spool reads the frames back sequentially, so only one
+    frame at a time is held in memory. The spool can be iterated once.
+    """
+
+    def __init__(self, tables):
+        self.file = tempfile.TemporaryFile()
+        write = self.file.write
+        for table in tables:
+            write(pack("!I", len(table)))
+            write(table)
+        self.file.flush()
+
+    def __iter__(self):
+        f = self.file
+        f.seek(0)
+        read = f.read
+        while True:
+            l = read(4)
+            if not l:
+                break
+            yield read(unpack("!I", l)[0])
+        f.close()
+
+
 class GCProtocol(protocol.Protocol):
     """
     server side, precomputation phase
@@ -21,8 +52,9 @@ class GCProtocol(protocol.Protocol):
     name = "GarbledCircuit"
 
     def __garbledgate_generator(self, gc):
-        for g in gc.next_garbled_gate():
-            yield g
+        # send the garbled tables packed into large frames
+        for frame in pack_tables(gc.next_garbled_gate()):
+            yield frame
         self.precomputation_results = gc.outputs
 
 
@@ -45,8 +77,12 @@ class GCProtocol(protocol.Protocol):
 
     def client_precompute1(self, args):
   #      self.garbled_table = tuple()
-        self.e = EvaluatorGarbledCircuit(self.precomp_args[0], self.next_gtable_entry(), None)
-        self.garbled_table = tuple(args)
+        self.e = EvaluatorGarbledCircuit(self.precomp_args[0], GarbledTableFrames(self.next_gtable_entry()), None)
+        if getattr(state.config, "gc_spool", False):
+            # keep client memory bounded for large circuits
+            self.garbled_table = GarbledTableSpool(args)
+        else:
+            self.garbled_table = tuple(args)
         return None
 
     def client_online1(self, args):
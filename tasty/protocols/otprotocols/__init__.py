@@ -3,7 +3,7 @@ from tasty.protocols.otprotocols.paillierot import *
 from tasty.protocols.otprotocols.ECNaorPinkasOT import *
 from tasty.protocols.otprotocols.iknp03 import *
 
-__all__ = ["DummyOT", "PaillierOT", "OTProtocol", "BeaverOT", "IKNP03", 
+__all__ = ["DummyOT", "PaillierOT", "OTProtocol", "BeaverOT", "CorrelatedBeaverOT", "IKNP03", 
            "NP_EC_OT_P192", "NP_EC_OT_secp256r1", "NP_EC_OT_secp224r1", 
            "NP_EC_OT_secp192r1", "NP_EC_OT_P192_c", "NP_EC_OT_secp256r1_c", 
            "NP_EC_OT_secp192r1_c", "NP_EC_OT_secp192r1_c",
@@ -5,46 +5,187 @@ from tasty import state, utils, cost_results
 from hashlib import sha256
 from gmpy import mpz
 from struct import pack
-from numbers import Integral
+from array import array
 import gc
+import sys
 
-def ithrow(mat, i):
-    """ returns the i'th row-vector of matrix mat """
-    return [x[i] for x in mat]
+try:
+    from Crypto.Cipher import AES
+    from Crypto.Util.strxor import strxor
+except ImportError:
+    AES = strxor = None
+
+__all__ = ["IKNP03", "pack_bits", "transpose", "xor_strings", "hash_rows", "OT_HASHES", "DEFAULT_OT_HASH"]
+
+# hashes of the OT extension rows selectable with ot_hash, see L{hash_rows}
+OT_HASHES = ("SHA256", "AES")
+DEFAULT_OT_HASH = "SHA256"
+
+# number of bytes of each column transposed at once by transpose
+TRANSPOSE_BLOCK = 1 << 13
+
+# _BIT_TABLES[b][c] maps a byte to its bit b moved to bit c
+_BIT_TABLES = [["".join(chr(((x >> b) & 1) << c) for x in xrange(256)) for c in xrange(8)] for b in xrange(8)]
+
+# maps the bytes 0 and 1 to the digits "0" and "1"
+_BIT_DIGITS = "01" + "".join(chr(x) for x in xrange(2, 256))
+
+# AES-128 key of the fixed-key hash, public and fixed for all parties
+_AES_KEY = sha256("tasty IKNP03 fixed-key hash").digest()[:16]
+
+
+def pack_bits(bits):
+    """ returns the mpz with bit i set to bits[i] """
+    bits = bytearray(bits)
+    bits.reverse()
+    return mpz(str(bits).translate(_BIT_DIGITS) or "0", 2)
+
+
+def xor_strings(a, b):
+    """ bytewise XOR of the strings a and b of equal length """
+    if strxor is not None:
+        return strxor(a, b)
+    n = len(a)
+    return (mpz(a + "\0", 256) ^ mpz(b + "\0", 256)).binary()[:n].ljust(n, "\0")
+
+
+def _widen(rows, width, new_width):
+    """ rows of width bytes padded with zero bytes to new_width bytes each """
+    if width == new_width:
+        return rows
+    out = bytearray(len(rows) // width * new_width)
+    for t in xrange(width):
+        out[t::new_width] = rows[t::width]
+    return str(out)
+
+
+def transpose(columns, m, k):
+    """
+    transposes the k x m bit matrix given by its rows columns[i] (mpz of m
+    bits) into m rows of k bits
+
+    The matrix is transposed in 8 x 8 bit blocks: bit b of all bytes of 8
+    columns is moved to the 8 bits of one byte of the rows 8p + b by table
+    lookups (str.translate) and XOR, which are done on TRANSPOSE_BLOCK bytes
+    of the columns at once.
+
+    @rtype: str
+    @return: concatenation of the m rows, bit2byte(k) bytes each, with bit i
+    of row j (in little-endian byte order) = bit j of columns[i]
+    """
+    w = utils.bit2byte(k)
+    n = utils.bit2byte(m)
+    cols = [mpz(c).binary()[:n].ljust(n, "\0") for c in columns]
+    cols.extend([None] * (8 * w - len(cols)))
+    out = bytearray(8 * n * w)
+    for start in xrange(0, n, TRANSPOSE_BLOCK):
+        end = min(n, start + TRANSPOSE_BLOCK)
+        size = end - start
+        block = [c and c[start:end] for c in cols]
+        rows = out[8 * start * w:8 * end * w]
+        for g in xrange(w):
+            group = block[8 * g:8 * g + 8]
+            for b in xrange(8):
+                tables = _BIT_TABLES[b]
+                acc = "\0" * size
+                # the bits of the translated columns are disjoint, so XOR is OR
+                for c, col in enumerate(group):
+                    if col is not None:
+                        acc = xor_strings(acc, col.translate(tables[c]))
+                rows[b * w + g::8 * w] = acc
+        out[8 * start * w:8 * end * w] = rows
+    return str(out[:m * w])
+
+
+def _mask(pads, width, bits):
+    """ clears the bits above bits in each pad of width bytes """
+    if bits % 8:
+        table = "".join(chr(x & ((1 << (bits % 8)) - 1)) for x in xrange(256))
+        pads = bytearray(pads)
+        pads[width - 1::width] = str(pads[width - 1::width]).translate(table)
+        pads = str(pads)
+    return pads
+
+
+def hash_rows(rows, width, bits, aes=False):
+    """
+    hashes H(j, row_j) of all rows of width bytes
+
+    With aes set, H is the fixed-key AES hash pi(K) ^ K with K = row_j ^ (j
+    << 96) folded to 128 bits (expanded with K ^ (e << 120) for outputs of
+    more than 128 bits, see L{FixedKeyAESGateHash}), all rows are encrypted
+    with one call of the cipher. Otherwise H is SHA-256 of j || row_j.
+
+    @type bits: int
+    @param bits: bit length of the hashes
+
+    @rtype: str
+    @return: concatenation of the hashes, bit2byte(bits) bytes each
+    """
+    m = len(rows) // width
+    hw = utils.bit2byte(bits)
+    if not aes:
+        pads = "".join([sha256(pack(">I", j) + rows[j * width:(j + 1) * width]).digest()[:hw]
+                        for j in xrange(m)])
+        return _mask(pads, hw, bits)
+
+    if AES is None:
+        raise ImportError("IKNP03 with ot_hash AES requires PyCrypto (Crypto.Cipher.AES)")
+    cipher = AES.new(_AES_KEY, AES.MODE_ECB)
+    keys = bytearray(16 * m)
+    for t in xrange(width):
+        if t < 16:
+            keys[t::16] = rows[t::width]
+        else:
+            keys[t % 16::16] = xor_strings(str(keys[t % 16::16]), rows[t::width])
+    index = array("I", xrange(m))
+    if index.itemsize == 4 and sys.byteorder == "little":
+        index = index.tostring()
+    else:
+        index = "".join([pack("<I", j) for j in xrange(m)])
+    for t in xrange(4):
+        keys[12 + t::16] = xor_strings(str(keys[12 + t::16]), index[t::4])
+    blocks = []
+    for e in xrange((hw + 15) // 16):
+        if e:
+            # replace the tweak e - 1 of the previous block by e
+            table = "".join(chr(x ^ e ^ (e - 1)) for x in xrange(256))
+            keys[15::16] = str(keys[15::16]).translate(table)
+        k = str(keys)
+        blocks.append(xor_strings(cipher.encrypt(k), k))
+    pads = bytearray(hw * m)
+    for t in xrange(hw):
+        pads[t::hw] = blocks[t // 16][t % 16::16]
+    return _mask(str(pads), hw, bits)
 
 
 class IKNP03(OTProtocol):
     """
-    Straight forward implementation of
+    Implementation of
     Ishail et al. 03: Extending Oblivious Transfers Efficiently
     (Protocol for semi-honest receiver)
+
+    The k x m bit matrices T and Q are kept as k mpz columns of m bits and
+    are transposed with L{transpose} into strings of packed rows, the
+    hashes of all rows are computed at once with L{hash_rows} and applied
+    to the messages with one XOR of long integers, so there are only a few
+    Python objects per OT.
     """
     k = None
-    __MAX = None
 
     def __init__(self, *args, **kwargs):
-        if not self.k or not self.__MAX:
+        if not self.k:
             IKNP03.k = state.config.symmetric_security_parameter
-            IKNP03.__MAX = mpz((1 << (self.k + 1)) - 1)
         super(IKNP03, self).__init__(*args, **kwargs)
         OT = state.config.ot_chain.pop(0)
         self.subot = OT(self.party, reverse=True)
         state.config.ot_chain.insert(0, OT)
 
-
-
-    @staticmethod
-    def H(m, inp):
-        # generate digest
-        if isinstance(inp, Integral):
-            inp = mpz(inp).binary()
-        else:
-            inp = inp.binary()
-        s = pack(">I", m) + inp
-        mpzdigest = mpz(sha256(s).digest(),256)
-        v = mpzdigest & IKNP03.__MAX
-        return v
-
+    def H(self, rows):
+        """ hashes of rows (see L{hash_rows}), k + 1 bits each, with the
+            hash selected by ot_hash """
+        aes = getattr(state.config, "ot_hash", None) == "AES"
+        return hash_rows(rows, utils.bit2byte(self.k), self.k + 1, aes)
 
     def client_1(self, args):
 
@@ -52,12 +193,6 @@ class IKNP03(OTProtocol):
 
         gc.disable()
 
-        def otlist(r, T):
-            r = utils.bits2value(r)
-            for i in xrange(self.k):
-                ti = utils.bits2value(ithrow(T, i))
-                yield (ti, ti^r)
-
         m = len(self.args)
 
         if m <= state.config.symmetric_security_parameter:
@@ -68,17 +203,21 @@ class IKNP03(OTProtocol):
             self.results = self.subot.get_results()
             return None
 
-        #self.T = T = [list(utils.get_random(0, 1, self.k)) for i in xrange(m)]
-        l = (1<<self.k) - 1
-        self.T = T = [utils.value2bits(mpz(utils.rand.randint(0, l)), self.k) for i in xrange(m)]
+        r = pack_bits(self.args)
+        T = [mpz(utils.rand.getrandbits(m)) for i in xrange(self.k)]
+        self.T = transpose(T, m, self.k)
 
-        self.subot(otlist(self.args, T))
+        self.subot((ti, ti ^ r) for ti in T)
 
         return tuple()
 
     def client_2(self, args):
         args = tuple(args)
-        self.results = (mpz(args[j][i],256) ^ self.H(j, utils.bits2value(self.T[j])) for j, i in enumerate(self.args))
+        width = len(args[0][0])
+        chosen = "".join([args[j][i] for j, i in enumerate(self.args)])
+        pads = _widen(self.H(self.T), utils.bit2byte(self.k + 1), width)
+        plain = xor_strings(chosen, pads)
+        self.results = (mpz(plain[j:j + width] + "\0", 256) for j in xrange(0, len(plain), width))
         gc.enable()
         return None
 
@@ -96,14 +235,19 @@ class IKNP03(OTProtocol):
             return None
 
         self.subot(s)
-        tmp = [utils.value2bits(res, m) for res in self.subot.get_results()]
-        Q = zip(*tmp) # transpose tmp
-        del tmp
-        si = utils.bits2value(s)
-        q = [utils.bits2value(j) for j in Q]
+        Q = transpose(self.subot.get_results(), m, self.k)
+        Qs = xor_strings(Q, pack_bits(s).binary()[:utils.bit2byte(self.k)].ljust(utils.bit2byte(self.k), "\0") * m)
+
+        x0 = [mpz(xj0).binary() for xj0, xj1 in self.args]
+        x1 = [mpz(xj1).binary() for xj0, xj1 in self.args]
+        hw = utils.bit2byte(self.k + 1)
+        width = max([hw] + [len(x) for x in x0] + [len(x) for x in x1])
+        y0 = xor_strings("".join([x.ljust(width, "\0") for x in x0]), _widen(self.H(Q), hw, width))
+        y1 = xor_strings("".join([x.ljust(width, "\0") for x in x1]), _widen(self.H(Qs), hw, width))
+        del x0, x1
         cost_results.CostSystem.costs["theoretical"]["setup"]["accumulated"](Send=2*utils.bit2byte(state.config.symmetric_security_parameter) * m)
         gc.enable()
-        return (((xj0 ^ self.H(j, qj)).binary(), (xj1 ^ self.H(j, qj ^ si)).binary()) for (j, qj), (xj0, xj1) in zip (enumerate(q), self.args))
+        return ((y0[j:j + width], y1[j:j + width]) for j in xrange(0, m * width, width))
 
     client_online_queue = [client_1, client_2]
     server_online_queue = [server_1, Protocol.finished]
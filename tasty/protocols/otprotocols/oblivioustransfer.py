@@ -214,3 +214,47 @@ class BeaverOT(protocol.Protocol):
     client_online_queue = [client_online1, protocol.Protocol.dummy_op, client_online3]
     server_online_queue = [protocol.Protocol.dummy_op, server_online2, protocol.Protocol.finished]
 
+
+
+class CorrelatedBeaverOT(protocol.Protocol):
+    """
+        Online phase of correlated OTs: transfers the pairs (x, x ^ R) for a
+        correlation R fixed by the server from precomputed OTs of the pairs
+        (m, m ^ R), so the server sends only one message per transfer
+    """
+    name = "CorrelatedBeaverOT"
+
+    def client_online1(self, args):
+        """ self.args is a tuple containing:
+        (
+        list of wanted bits,
+        list of random bits, chosen at precomputation time,
+        list of values received from the Server at precomputation time
+        )
+        args is empty (first round)
+        """
+        b, prec_b = self.args[:2]
+        cost_results.CostSystem.costs["theoretical"]["online"]["accumulated"](Send = utils.bit2byte(len(b)))
+        return (tuple(int(i) ^ int(j) for i, j in zip(b, prec_b)),)
+
+    def client_online3(self, args):
+        args = tuple(args)[0]
+        self.results = (mpz(m, 256) ^ prec_m for m, prec_m in zip(args, self.args[2]))
+        return None
+
+    def server_online2(self, args):
+        """ self.args is a tuple containing:
+        (
+        list of the values x,
+        list of the values m of the precomputed pairs (m, m ^ R),
+        correlation R
+        )
+        args contains the bits d = b ^ prec_b of the client
+        """
+        cost_results.CostSystem.costs["theoretical"]["online"]["accumulated"](Send = utils.bit2byte(len(self.args[0])*(state.config.symmetric_security_parameter + 1)))
+        args = tuple(args)
+        x, prec_m, R = self.args
+        return (tuple((m ^ pm ^ R if d else m ^ pm).binary() for d, m, pm in zip(args[0], x, prec_m)),)
+
+    client_online_queue = [client_online1, protocol.Protocol.dummy_op, client_online3]
+    server_online_queue = [protocol.Protocol.dummy_op, server_online2, protocol.Protocol.finished]
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+from optparse import OptionParser
+import sys
+import time
+
+import tasty
+from tasty import state
+from tasty.circuit.reader import CIRCUIT_FORMATS, convert_circuit
+
+
+def main():
+    usage = "usage: %prog [options] circuit_file binary_circuit_file"
+    parser = OptionParser(usage=usage, version="%%prog %s" % tasty.__version__)
+
+    parser.add_option("-I", "--info",
+                      action="store_true",
+                      dest="info",
+                      default=False,
+                      help="show program information")
+
+    parser.add_option("-f", "--format",
+                      action="store",
+                      dest="format",
+                      default=None,
+                      choices=sorted(CIRCUIT_FORMATS),
+                      help="format of circuit_file, one of %s (default: FairplayMP21)" %
+                          ", ".join(sorted(CIRCUIT_FORMATS)))
+
+    parser.add_option("-c", "--check",
+                      action="store_true",
+                      dest="check",
+                      default=False,
+                      help="check the converted circuit")
+
+    options, args = parser.parse_args()
+
+    if options.info:
+        print state.info_text
+        sys.exit(0)
+
+    if len(args) != 2:
+        parser.print_help()
+        sys.exit(-2)
+
+    start = time.time()
+    c = convert_circuit(args[0], args[1], options.format)
+    if options.check:
+        c.check()
+    print "converted %s to %s: %d inputs, %d gates, %d outputs in %.3fs" % (
+        args[0], args[1], c.num_input_bits(), c.num_gates(), c.num_output_bits(), time.time() - start)
+
+
+if __name__ == '__main__':
+    main()
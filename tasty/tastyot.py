@@ -4,12 +4,30 @@ from tasty import state
 from tasty import utils
 from tasty.exc import InternalError
 from tasty.protocols import protocol
-from tasty.protocols.otprotocols import BeaverOT
+from tasty.protocols.otprotocols import BeaverOT, CorrelatedBeaverOT
 from tasty.types.party import isclient
+from gmpy import mpz
 
 class TastyOT(object):
-    def __init__(self, party, num):
+    """
+    Precomputes num random OTs and transfers chosen messages with them
+    online (see L{BeaverOT})
+
+    In correlated mode the server precomputes the pairs (m, m ^ state.R)
+    instead, which can only transfer the garbled input pairs (x, x ^
+    state.R) with L{next_correlated_ots}, but needs only one message per
+    transfer (see L{CorrelatedBeaverOT}).
+    """
+    def __init__(self, party, num, correlated=False):
+        """
+        @type num: int
+        @param num: number of OTs to precompute
+
+        @type correlated: bool
+        @param correlated: precompute OTs correlated with state.R
+        """
         self.party = party
+        self.correlated = correlated
         if __debug__:
             state.active_party.socket().sendobj(num)
             assert num == state.active_party.socket().recvobj(), "number of ots not equal on server and client"
@@ -26,6 +44,11 @@ class TastyOT(object):
             self.__precomputed_m = utils.mdeque(ot.get_results())
             if len(self.__precomputed_b) != len(self.__precomputed_m):
                 raise InternalError("The partys do not agree on the number of ots to precompute")
+        elif correlated:
+            self.__precomputed_m = utils.mdeque(mpz(m) for m in
+                utils.get_random(0, (2**(state.config.symmetric_security_parameter + 1))-1, num))
+            ot(tuple((m, m ^ state.R) for m in self.__precomputed_m))
+            protocol.Protocol.run()
         else:
             self.__precomputed_m = m = utils.mdeque(tuple(utils.get_random(0,(2**state.config.symmetric_security_parameter)-1,2))
                                               for i in xrange(num))
@@ -33,21 +56,39 @@ class TastyOT(object):
             protocol.Protocol.run()
 
 
-    def next_ots(self, args):
-        args = tuple(args)
+    def _precomputed(self, args):
         num = len(args)
-        try:
-            if isclient(self.party):
-                x = (args, self.__precomputed_b.popleft(num), self.__precomputed_m.popleft(num))
-            else:
-                x = (args, self.__precomputed_m.popleft(num))
-        except IndexError:
-            try:
-                x
-            except NameError:
-                x = [None,[]]
-            raise OverflowError("More oblivoius transfers requested then generated (%d requested and only %d left)"%(num, len(x[1])))
+        if num > len(self.__precomputed_m):
+            raise OverflowError("More oblivoius transfers requested then generated (%d requested and only %d left)"%(num, len(self.__precomputed_m)))
+        if isclient(self.party):
+            return (args, self.__precomputed_b.popleft(num), self.__precomputed_m.popleft(num))
+        else:
+            return (args, self.__precomputed_m.popleft(num))
+
+    def next_ots(self, args):
+        """
+        transfers the messages of the server args pairs chosen by the bits of
+        the client args
+        """
+        if self.correlated:
+            raise InternalError("correlated precomputed OTs can only transfer pairs (x, x ^ R)")
         ot = BeaverOT(self.party)
+        ot(self._precomputed(tuple(args)))
+        return tuple(ot.get_results())
+
+    def next_correlated_ots(self, args):
+        """
+        transfers the pairs (x, x ^ state.R) for the values x given as server
+        args chosen by the bits of the client args
+        """
+        if not self.correlated:
+            if not isclient(self.party):
+                args = ((x, x ^ state.R) for x in args)
+            return self.next_ots(args)
+        x = self._precomputed(tuple(args))
+        if not isclient(self.party):
+            x += (state.R,)
+        ot = CorrelatedBeaverOT(self.party)
         ot(x)
         return tuple(ot.get_results())
 
@@ -5,6 +5,8 @@ from tasty.tests.functional import generic
 
 from tasty.utils import tasty_path, rand
 from tasty import test_utils
+from tasty.exc import TastySyntaxError
+from tasty.types import Garbled, GarbledVec
 
 
 class GarbledAndTestCase(generic.TwoInputMixin, test_utils.TastyRemoteCTRL):
@@ -59,12 +61,76 @@ class GarbledNotTestCase(generic.TwoInputMixin, test_utils.TastyRemoteCTRL):
             except Exception, e:
                 self.fail("Validation failed: %s"%e)
             yield
+
+
+class GarbledVecElementwiseTestCase(test_utils.TastyRemoteCTRL):
+    """ elementwise operations of GarbledVecs with GarbledVecs and Garbleds """
+    COUNT = 3
+    MAXBITLEN = 32
+    MAXDIM = 8
+
+    def protocol_dir(self):
+        return tasty_path("tests/functional/protocols/garbled/vec_elementwise")
+
+    def next_data_in(self):
+        self.params = {'la': 8, 'ls': 4, 'dim': 4}
+        self.inputs = {'a': [1, 200, 5, 255], 'b': [2, 100, 5, 0], 's': 7,
+                       'x': [-3, 4, -128, 127], 'y': [2, -5, -128, 0]}
+        yield
+        for i in xrange(self.COUNT):
+            la = rand.randint(2, self.MAXBITLEN)
+            ls = rand.randint(1, la)
+            dim = rand.randint(1, self.MAXDIM)
+            self.params = {'la': la, 'ls': ls, 'dim': dim}
+            self.inputs = {'a': [rand.randint(0, 2**la - 1) for j in xrange(dim)],
+                           'b': [rand.randint(0, 2**la - 1) for j in xrange(dim)],
+                           's': rand.randint(0, 2**ls - 1),
+                           'x': [rand.randint(-2**(la - 1), 2**(la - 1) - 1) for j in xrange(dim)],
+                           'y': [rand.randint(-2**(la - 1), 2**(la - 1) - 1) for j in xrange(dim)]}
+            yield
+
+    def next_data_out(self):
+        while True:
+            self.client_inputs.update(self.server_inputs) #merge inputs together
+            self.client_outputs.update(self.server_outputs) # merge outputs together
+            # the conversion of HomomorphicVecs to GarbledVecs reverses the elements
+            a, b, x, y = [list(reversed(self.client_inputs[k])) for k in "abxy"]
+            s = self.client_inputs['s']
+            expected = {'sum': [i + j for i, j in zip(a, b)],
+                        'gt': [int(i > j) for i, j in zip(a, b)],
+                        'min': [j if i > j else i for i, j in zip(a, b)],
+                        'sums': [i + s for i in a],
+                        'les': [int(i <= s) for i in a],
+                        'lt': [int(i < j) for i, j in zip(x, y)],
+                        'ge': [int(i >= j) for i, j in zip(x, y)]}
+            for desc, values in sorted(expected.iteritems()):
+                result = [int(v) for v in self.client_outputs[desc]]
+                self.assertEqual(values, result, msg="%s of a = %r, b = %r, s = %d, x = %r, y = %r is %r, should be %r" %
+                                 (desc, a, b, s, x, y, result, values))
+            yield
+
+
+class GarbledVecElementwiseDimensionTestCase(unittest.TestCase):
+    """ elementwise operations on GarbledVecs of different size are rejected """
+
+    def test_dimension_mismatch(self):
+        for methodname in GarbledVec.elementwise_methods:
+            self.assertRaises(TastySyntaxError, GarbledVec.returns, methodname, (GarbledVec, GarbledVec, GarbledVec),
+                              [8, 8, 8], [[4], [3], [3]], [False, False, False])
+        # a Garbled operand is used for all elements
+        ret = GarbledVec.returns("__add__", (GarbledVec, Garbled), [8, 4], [[4], [1]], [False, False])
+        self.assertEqual(ret[0]["dim"], [4])
+        self.assertEqual(ret[0]["bitlen"], 9)
+
+
 def suite():
     """narf"""
 
     tests = unittest.TestSuite()
     tests.addTest(GarbledAndTestCase())
     tests.addTest(GarbledNotTestCase())
+    tests.addTest(GarbledVecElementwiseTestCase())
+    tests.addTest(GarbledVecElementwiseDimensionTestCase("test_dimension_mismatch"))
     return tests
 
 
@@ -0,0 +1,49 @@
+__params__ = {'la': 32, 'ls': 16, 'dim': 4}
+
+def protocol(client, server, params):
+    L = params['la']
+    LS = params['ls']
+    D = params['dim']
+
+    server.a = UnsignedVec(bitlen=L, dim=D).input(src=driver, desc='a')
+    server.b = UnsignedVec(bitlen=L, dim=D).input(src=driver, desc='b')
+    server.s = Unsigned(bitlen=LS).input(src=driver, desc='s')
+    server.x = SignedVec(bitlen=L, dim=D).input(src=driver, desc='x')
+    server.y = SignedVec(bitlen=L, dim=D).input(src=driver, desc='y')
+
+    server.ha = HomomorphicVec(val=server.a)
+    server.hb = HomomorphicVec(val=server.b)
+    server.hx = HomomorphicVec(val=server.x)
+    server.hy = HomomorphicVec(val=server.y)
+    client.ga <<= GarbledVec(val=server.ha)
+    client.gb <<= GarbledVec(val=server.hb)
+    client.gs <<= Garbled(val=server.s)
+    client.gx <<= GarbledVec(val=server.hx)
+    client.gy <<= GarbledVec(val=server.hy)
+
+    # vector and vector
+    client.gsum = client.ga + client.gb
+    client.sum = UnsignedVec(val=client.gsum)
+    client.sum.output(dest=driver, desc='sum')
+    client.ggt = client.ga > client.gb
+    client.gt = UnsignedVec(val=client.ggt)
+    client.gt.output(dest=driver, desc='gt')
+    client.gmin = client.ggt.mux(client.ga, client.gb)
+    client.min = UnsignedVec(val=client.gmin)
+    client.min.output(dest=driver, desc='min')
+
+    # vector and scalar
+    client.gsums = client.ga + client.gs
+    client.sums = UnsignedVec(val=client.gsums)
+    client.sums.output(dest=driver, desc='sums')
+    client.gles = client.ga <= client.gs
+    client.les = UnsignedVec(val=client.gles)
+    client.les.output(dest=driver, desc='les')
+
+    # signed comparison
+    client.glt = client.gx < client.gy
+    client.lt = UnsignedVec(val=client.glt)
+    client.lt.output(dest=driver, desc='lt')
+    client.gge = client.gx >= client.gy
+    client.ge = UnsignedVec(val=client.gge)
+    client.ge.output(dest=driver, desc='ge')
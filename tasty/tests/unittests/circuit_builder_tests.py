@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from itertools import product
+
+from tasty.circuit import Circuit, SIGNED, UNSIGNED, UNDEF
+from tasty.circuit.builder import CircuitBuilder
+from tasty.circuit.compiled import CompiledCircuit
+from tasty.circuit.dynamic import *
+from tasty.circuit.freexor import FreeXORMinMaxValueCircuit
+from tasty.utils import rand
+
+from tasty import state
+
+
+class CircuitBuilderTestCase(unittest.TestCase):
+
+    def test_add_gate(self):
+        """testing CircuitBuilder.add_gate and add_output"""
+        b = CircuitBuilder(2)
+        a = b.add_gate((0, 1), 0b0001)
+        x = b.add_gate((0, 1), 0b0110)
+        self.assertEqual((a, x), (2, 3))
+        self.assertEqual(b.next_wire(), 4)
+        b.add_output([x, a], "z", UNSIGNED)
+        c = b.circuit(((1, "x"), (1, "y")))
+        c.check()
+        self.assertEqual(c.num_gates(), 2)
+        for x, y in product((0, 1), repeat=2):
+            self.assertEqual(c.eval((x, y)), [(x ^ y) | (x & y) << 1])
+
+    def test_add_subcircuit(self):
+        """testing CircuitBuilder.add_subcircuit with dynamic, compiled and FreeXOR circuits"""
+        for sub in (AddCircuit(4, 4, UNSIGNED, UNSIGNED),
+                    CompiledCircuit.from_circuit(AddCircuit(4, 4, UNSIGNED, UNSIGNED)),
+                    FastMultiplicationCircuit(4, 4, 4)):
+            # (x + y) op (y + x) with the inputs of the second swapped
+            b = CircuitBuilder(8)
+            z0 = b.add_subcircuit(sub, range(8))[0]
+            z1 = b.add_subcircuit(sub, range(4, 8) + range(4))[0]
+            b.add_output(z0, "z0", UNSIGNED)
+            b.add_output(z1, "z1", UNSIGNED)
+            c = b.circuit(((4, "x"), (4, "y")))
+            c.check()
+            self.assertEqual(c.num_gates(), 2 * sub.num_gates())
+            vectors = list(product(xrange(16), repeat=2))
+            for vals, outs in zip(vectors, c.eval_batch(vectors)):
+                self.assertEqual(outs, sub.eval(vals) * 2)
+
+        sub = FreeXORMinMaxValueCircuit(3, 4, FreeXORMinMaxValueCircuit.MIN, UNSIGNED)
+        b = CircuitBuilder(12)
+        self.assertEqual(b.add_subcircuit(sub, range(12)), [list(o) for o, desc, type_ in sub.outputs()])
+        gates = [tuple(b.gate_inputs[b.offsets[ix]:b.offsets[ix + 1]]) for ix in xrange(b.num_gates())]
+        self.assertEqual(gates, [tuple(g_ins) for g_ins, g_tab in sub.next_gate()])
+        self.assertEqual(b.truths, [g_tab for g_ins, g_tab in sub.next_gate()])
+
+    def test_BuilderCircuit(self):
+        """testing circuits built with CircuitBuilder"""
+        c = FastMultiplicationCircuit(256, 256)
+        self.assertTrue(isinstance(c.compiled(), CompiledCircuit))
+        self.assertTrue(c.compiled() is c.compiled())
+        c.check()
+        vectors = [(rand.randint(0, (1 << 256) - 1), rand.randint(0, (1 << 256) - 1)) for i in xrange(20)]
+        for (x, y), (z,) in zip(vectors, c.eval_batch(vectors)):
+            self.assertEqual(z, x * y)
+
+        c = HornerMergeCircuit(5, 4, 3)
+        for x, y in product(xrange(1 << 5), xrange(1 << 4)):
+            self.assertEqual(c.eval((x, y))[0], (x * 8 + y) % (1 << 8))
+
+        c = VectorMultiplicationCircuit(1, 4)
+        c.check()
+        self.assertEqual(c.num_output_bits(), 9)
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(CircuitBuilderTestCase("test_add_gate"))
+    suite.addTest(CircuitBuilderTestCase("test_add_subcircuit"))
+    suite.addTest(CircuitBuilderTestCase("test_BuilderCircuit"))
+    return suite
+
+if __name__ == '__main__':
+    import tasty.utils
+    import logging
+
+    state.log.setLevel(logging.ERROR)
+    unittest.TextTestRunner(verbosity=2).run(suite())
@@ -21,22 +21,25 @@ class CircuitTestCase(unittest.TestCase):
         for bitlen in (1,2,3,4):
             c = Bool2Circuit(bitlen, Bool2Circuit.AND)
             c.check()
-            for x, y in product(xrange(1 << bitlen), xrange(1 << bitlen)):
-                self.assertEqual(c.eval((x, y))[0], x&y)
+            vectors = list(product(xrange(1 << bitlen), repeat=2))
+            for (x, y), (z,) in zip(vectors, c.eval_batch(vectors)):
+                self.assertEqual(z, x&y)
 
         # test OR
         for bitlen in (1,2,3,4):
             c = Bool2Circuit(bitlen, Bool2Circuit.OR)
             c.check()
-            for x, y in product(xrange(1 << bitlen), xrange(1 << bitlen)):
-                self.assertEqual(c.eval((x, y))[0], x | y)
+            vectors = list(product(xrange(1 << bitlen), repeat=2))
+            for (x, y), (z,) in zip(vectors, c.eval_batch(vectors)):
+                self.assertEqual(z, x | y)
 
         # test XOR
         for bitlen in (1,2,3,4):
             c = Bool2Circuit(bitlen, Bool2Circuit.XOR)
             c.check()
-            for x, y in product(xrange(1 << bitlen), xrange(1 << bitlen)):
-                self.assertEqual(c.eval((x, y))[0], x ^ y)
+            vectors = list(product(xrange(1 << bitlen), repeat=2))
+            for (x, y), (z,) in zip(vectors, c.eval_batch(vectors)):
+                self.assertEqual(z, x ^ y)
 
 
     def test_SubCircuit(self):
@@ -90,8 +93,9 @@ class CircuitTestCase(unittest.TestCase):
             for l_y in xrange(1, l_x + 1):
                 c = AddCircuit(l_x, l_y, UNSIGNED, UNSIGNED)
                 c.check()
-                for x, y in product(xrange(1 << l_x), xrange(1 << l_y)):
-                    self.assertEqual(c.eval((x, y))[0], x+y)
+                vectors = list(product(xrange(1 << l_x), xrange(1 << l_y)))
+                for (x, y), (z,) in zip(vectors, c.eval_batch(vectors)):
+                    self.assertEqual(z, x+y)
 
         # test unsigned y
         for l_x in (1,2,3,4):
@@ -158,19 +162,21 @@ class CircuitTestCase(unittest.TestCase):
         for l_x,l_y in ((1, 1), (2, 1), (3, 1), (2, 2), (3, 2), (4, 2), (3, 3), (4, 3), (5, 3), (5,4), (5, 5)):
             c = MultiplicationCircuit(l_x, l_y)
             c.check()
-            for x, y in product(xrange(1 << l_x), xrange(1 << l_y)):
-                self.assertEqual(c.eval((x, y))[0], x*y)
+            vectors = list(product(xrange(1 << l_x), xrange(1 << l_y)))
+            for (x, y), (z,) in zip(vectors, c.eval_batch(vectors)):
+                self.assertEqual(z, x*y)
 
     def test_FastMultiplicationCircuit(self):
         '''testing FastMultiplicationCircuit'''
         self.failUnlessRaises(NotImplementedError, FastMultiplicationCircuit, 2, 3)
         self.failUnlessRaises(ValueError, FastMultiplicationCircuit, 0, 0)
 
-        for l_x,l_y in ((5,4), (5,5)):
+        for l_x,l_y in ((5,4), (5,5), (8,8)):
             c = FastMultiplicationCircuit(l_x, l_y)
             c.check()
-            for x, y in product(xrange(1 << l_x), xrange(1 << l_y)):
-                self.assertEqual(c.eval((x, y))[0], x*y)
+            vectors = list(product(xrange(1 << l_x), xrange(1 << l_y)))
+            for (x, y), (z,) in zip(vectors, c.eval_batch(vectors)):
+                self.assertEqual(z, x*y)
 
         for l_x, l_y in ((10,10), (50,50), (100,100)):
             c = FastMultiplicationCircuit(l_x, l_y)
@@ -180,6 +186,22 @@ class CircuitTestCase(unittest.TestCase):
                 res = x*y
                 self.assertEqual(c_res, res)
 
+    def test_best_break_length(self):
+        '''testing the tuned break length of FastMultiplicationCircuit'''
+        from tasty.circuit.freexor import non_xor_gates
+        for l_x, l_y, break_length in ((24, 24, 4), (24, 24, 16), (40, 33, 8), (12, 12, 13)):
+            c = FastMultiplicationCircuit(l_x, l_y, break_length)
+            self.assertEqual(karatsuba_costs(l_x, l_y, break_length), non_xor_gates(c))
+
+        for l in (8, 16, 24, 32):
+            self.assertEqual(KARATSUBA_BREAK_LENGTHS[l, l], tune_break_length(l, l))
+        for l_x, l_y in ((24, 24), (20, 13), (1024, 1024)):
+            break_length = best_break_length(l_x, l_y)
+            self.assertEqual(FastMultiplicationCircuit(l_x, l_y).break_length, break_length)
+            costs = karatsuba_costs(l_x, l_y, break_length)
+            for other in xrange(4, min(l_y, 64) + 2):
+                self.assertTrue(costs <= karatsuba_costs(l_x, l_y, other))
+
     def test_MuxCircuit(self):
         '''testing MuxCircuit'''
         self.failUnlessRaises(ValueError, MuxCircuit, -1)
@@ -188,9 +210,9 @@ class CircuitTestCase(unittest.TestCase):
         for l in (1, 2, 3):
             c = MuxCircuit(l)
             c.check()
-            for x, y in product(xrange(1 << l), repeat=2):
-                self.assertEqual(c.eval((x, y, 0))[0], x)
-                self.assertEqual(c.eval((x, y, 1))[0], y)
+            vectors = list(product(xrange(1 << l), xrange(1 << l), (0, 1)))
+            for (x, y, s), (z,) in zip(vectors, c.eval_batch(vectors)):
+                self.assertEqual(z, y if s else x)
 
     def test_AddSubCircuit(self):
         '''testing AddSubCircuit'''
@@ -474,6 +496,108 @@ class CircuitTestCase(unittest.TestCase):
             test(self, values, bitlen, signed)
 
 
+    def test_eval_batch(self):
+        """testing bit-sliced eval_batch against gate by gate evaluation"""
+        import logging
+        circuits = [AddCircuit(5, 3, UNSIGNED, SIGNED),
+                    SubCircuit(4, 3, SIGNED),
+                    FastMultiplicationCircuit(6, 5),
+                    MuxCircuit(3),
+                    GateCircuit(0, [[1], [0]]),
+                    GateCircuit(3, [[0, 1, 1, 0, 1, 0, 0, 1], [1, 1, 1, 0, 0, 0, 0, 1]]),
+                    MinMaxValueIndexCircuit(3, 4, MinMaxValueIndexCircuit.MIN, UNSIGNED)]
+        level = state.log.level
+        for c in circuits:
+            vectors = [[rand.randint(0, (1 << l) - 1) for l, desc in c.inputs()] for i in xrange(50)]
+            batch = c.eval_batch(vectors)
+            self.assertEqual(len(batch), len(vectors))
+            state.log.setLevel(logging.DEBUG)
+            state.log.disabled = True
+            try:
+                for vals, outs in zip(vectors, batch):
+                    self.assertEqual(c.eval(vals), outs)
+            finally:
+                state.log.setLevel(level)
+                state.log.disabled = False
+        self.assertEqual(AddCircuit(2, 2, UNSIGNED, UNSIGNED).eval_batch([]), [])
+
+        # negative inputs are taken in two's complement, at any log level
+        c = AddCircuit(5, 3, SIGNED, SIGNED)
+        for debug in (False, True):
+            if debug:
+                state.log.setLevel(logging.DEBUG)
+                state.log.disabled = True
+            try:
+                self.assertEqual(c.eval([-3, 2]), [31])
+                self.assertEqual(c.eval([-16, -4]), [12])
+                self.assertEqual(c.eval([-16, 3]), c.eval([16, 3]))
+                self.failUnlessRaises(ValueError, c.eval, [-17, 0])
+                self.failUnlessRaises(ValueError, c.eval, [32, 0])
+            finally:
+                state.log.setLevel(level)
+                state.log.disabled = False
+        self.assertEqual(c.eval_batch([[-3, 2], [3, -2]]), [[31], [1]])
+
+    def test_ReplicatedCircuit(self):
+        """testing ReplicatedCircuit against its template circuit"""
+        from tasty.circuit.freexor import FreeXORCmpCircuit
+        self.failUnlessRaises(ValueError, ReplicatedCircuit, MuxCircuit(3), 0)
+        for template in (AddCircuit(5, 3, UNSIGNED, SIGNED), FastMultiplicationCircuit(6, 5),
+                         FreeXORCmpCircuit(4, 4, CmpCircuit.GREATER, SIGNED, UNSIGNED), MuxCircuit(3)):
+            for n in (1, 4):
+                c = ReplicatedCircuit(template, n)
+                c.check()
+                self.assertEqual(c.num_input_bits(), n * template.num_input_bits())
+                self.assertEqual([l for l, desc in c.inputs()], [l for l, desc in template.inputs()] * n)
+                self.assertEqual(c.inputs()[-1][1], template.inputs()[-1][1] + "_%d" % (n - 1))
+                self.assertEqual(c.num_gates(), n * template.num_gates())
+                self.assertEqual(c.gate_types(), Circuit.gate_types(c))
+                self.assertEqual((c.depth(), c.nonxor_depth()), (Circuit.depth(c), Circuit.nonxor_depth(c)))
+
+                vectors = [[rand.randint(0, (1 << l) - 1) for l, desc in c.inputs()] for i in xrange(20)]
+                k = len(template.inputs())
+                for vals, outs in zip(vectors, c.eval_batch(vectors)):
+                    self.assertEqual(outs, sum((template.eval(vals[i * k:(i + 1) * k]) for i in xrange(n)), []))
+        self.assertEqual(repr(c), "ReplicatedCircuit(MuxCircuit(3,), 4)")
+
+    def test_statistics(self):
+        """testing memoized gate statistics against enumerated gates"""
+        def enumerated(c):
+            n_gates = 0
+            for g in c.next_gate():
+                n_gates += 1
+            return n_gates, Circuit.gate_types(c)
+
+        circuits = [NotCircuit(5), Bool2Circuit(3, Bool2Circuit.AND),
+                    SubCircuit(5, 3, SIGNED), SubCircuit(4, 4, UNSIGNED, DROP_MSB),
+                    AddCircuit(5, 3, SIGNED, UNSIGNED), AddCircuit(4, 4, UNSIGNED, UNSIGNED, DROP_MSB),
+                    AddSubCircuit(4, 3, SIGNED, UNSIGNED), AddSub0Circuit(4),
+                    CmpCircuit(4, 4, CmpCircuit.LESS, UNSIGNED, UNSIGNED),
+                    MultiplicationCircuit(5, 3), MultiplicationCircuit(4, 1),
+                    FastMultiplicationCircuit(24, 24), FastMultiplicationCircuit(8, 5),
+                    HornerMergeCircuit(3, 2, 1), MuxCircuit(4), UnpackCircuit(3, 4, SIGNED),
+                    MinMaxValueCircuit(4, 3, MinMaxValueCircuit.MAX, SIGNED),
+                    MinMaxIndexCircuit(3, 2, MinMaxIndexCircuit.MIN, UNSIGNED),
+                    MinMaxValueIndexCircuit(5, 2, MinMaxValueIndexCircuit.MAX, UNSIGNED)]
+        for c in circuits:
+            n_gates, gate_types = enumerated(c)
+            self.assertEqual(c.num_gates(), n_gates)
+            self.assertEqual(c.gate_types(), gate_types)
+            self.assertEqual(c.depth(), Circuit.depth(c))
+            self.assertTrue(0 < c.depth() <= n_gates)
+            self.assertEqual(c.nonxor_depth(), Circuit.nonxor_depth(c))
+            self.assertTrue(c.nonxor_depth() <= c.depth())
+
+        # statistics are computed once per class and arguments
+        c = FastMultiplicationCircuit(24, 24)
+        self.assertTrue(c.statistics() is circuits[11].statistics())
+        self.assertFalse(c.statistics() is FastMultiplicationCircuit(24, 23).statistics())
+
+        # depth of parallel gates and of the ripple carry chain
+        self.assertEqual(Bool2Circuit(7, Bool2Circuit.XOR).depth(), 1)
+        self.assertEqual(Bool2Circuit(7, Bool2Circuit.XOR).nonxor_depth(), 0)
+        self.assertEqual(AddCircuit(8, 8, UNSIGNED, UNSIGNED).depth(), 8)
+
 
 def suite():
     suite = unittest.TestSuite()
@@ -485,12 +609,16 @@ def suite():
     suite.addTest(CircuitTestCase("test_CmpCircuit"))
     suite.addTest(CircuitTestCase("test_MultiplicationCircuit"))
     suite.addTest(CircuitTestCase("test_FastMultiplicationCircuit"))
+    suite.addTest(CircuitTestCase("test_best_break_length"))
     suite.addTest(CircuitTestCase("test_MuxCircuit"))
     suite.addTest(CircuitTestCase("test_MinMaxCircuits"))
     suite.addTest(CircuitTestCase("test_Bool2Circuit"))
 #    suite.addTest(CircuitTestCase("test_VectorMultiplicationCircuit"))
     suite.addTest(CircuitTestCase("test_HornerMergeCircuit"))
     suite.addTest(CircuitTestCase("test_UnpackCircuit"))
+    suite.addTest(CircuitTestCase("test_eval_batch"))
+    suite.addTest(CircuitTestCase("test_statistics"))
+    suite.addTest(CircuitTestCase("test_ReplicatedCircuit"))
 
     return suite
 
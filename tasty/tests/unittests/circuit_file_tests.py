@@ -4,8 +4,13 @@ import unittest
 import os.path
 from tasty import state
 from tasty.circuit.reader import *
-from tasty.circuit import comp22int, int2comp2
+from tasty.circuit.compiled import CompiledCircuit
+from tasty.circuit.dynamic import AddCircuit, FastMultiplicationCircuit, GateCircuit
+from tasty.circuit import SIGNED, UNSIGNED, UNDEF
+from tasty.utils import comp22int, int2comp2
 from itertools import product
+import tempfile
+import struct
 
 class CircuitTestCase(unittest.TestCase):
 
@@ -105,11 +110,74 @@ class CircuitTestCase(unittest.TestCase):
             if res[0] != (xint > yint):
                 state.log.warning("wrong result: %d > %d = %s" % (xint, yint, bool(res[0])))
 
+    def test_CompiledCircuit(self):
+        """ Testing compiled circuits and their files """
+        for c in (AddCircuit(5, 3, SIGNED, UNSIGNED), FastMultiplicationCircuit(8, 8),
+                  GateCircuit(4, (tuple(i & 1 for i in xrange(16)), ))):
+            cc = CompiledCircuit.from_circuit(c)
+            cc.check()
+            self.assertTrue(CompiledCircuit.from_circuit(cc) is cc)
+            self.assertEqual(list(cc.next_gate()), [(tuple(i), t) for i, t in c.next_gate()])
+            self.assertEqual(cc.num_gates(), c.num_gates())
+            self.assertEqual(cc.gate_types(), c.gate_types())
+            self.assertEqual(cc.num_output_bits(), c.num_output_bits())
+
+            f = tempfile.NamedTemporaryFile(suffix=".tcc")
+            cc.save(f.name)
+            lc = CompiledCircuit.load(f.name)
+            self.assertEqual(list(lc.next_gate()), list(cc.next_gate()))
+            self.assertEqual(lc.inputs(), cc.inputs())
+            self.assertEqual(lc.outputs(), cc.outputs())
+            values = tuple(1 for i in c.inputs())
+            self.assertEqual(lc.eval(values), c.eval(values))
+
+            # truncated files are detected
+            f.truncate(os.path.getsize(f.name) - 1)
+            f.flush()
+            self.assertRaises(ValueError, CompiledCircuit.load, f.name)
+            f.close()
+
+        self.assertEqual(CompiledCircuit.from_circuit(AddCircuit(5, 3, SIGNED, UNSIGNED)).truths.itemsize, 1)
+
+        # descriptions are stored without pickle, broken ones are detected
+        cc = CompiledCircuit.from_circuit(AddCircuit(5, 3, SIGNED, UNSIGNED))
+        cc = CompiledCircuit(cc.num_inputs, [(5, None), (3, u"y\xe4")], [(cc.outputs()[0][0], "z", UNDEF)],
+                             cc.gate_inputs, cc.offsets, cc.truths)
+        f = tempfile.NamedTemporaryFile(suffix=".tcc")
+        cc.save(f.name)
+        lc = CompiledCircuit.load(f.name)
+        self.assertEqual(lc.inputs(), [(5, None), (3, "y\xc3\xa4")])
+        self.assertEqual(lc.outputs(), cc.outputs())
+        f.seek(CompiledCircuit.HEADER.size)
+        f.write(struct.pack("<q", 1 << 40))
+        f.flush()
+        self.assertRaises(ValueError, CompiledCircuit.load, f.name)
+        f.close()
+
+    def test_BinaryCircuit(self):
+        """ Testing conversion to and reading of binary circuit files """
+        filename = os.path.join(state.tasty_root, "tests/demos/fairplay_circuit/Add.sfdl.shdl")
+        c = FairplayMP21Circuit(filename)
+        f = tempfile.NamedTemporaryFile(suffix=".tcc")
+        convert_circuit(filename, f.name)
+        bc = read_circuit(f.name)
+        self.assertTrue(isinstance(bc, BinaryCircuit))
+        bc.check()
+        self.assertEqual(list(bc.next_gate()), [(tuple(i), t) for i, t in c.next_gate()])
+        self.assertEqual(bc.inputs(), c.inputs())
+        self.assertEqual(bc.outputs(), c.outputs())
+        self.assertTrue(isinstance(read_circuit(filename), FairplayMP21Circuit))
+        self.assertRaises(ValueError, read_circuit, filename, "SHDL")
+        self.assertRaises(ValueError, read_circuit, filename, "binary")
+        f.close()
+
 def suite():
     suite = unittest.TestSuite()
     suite.addTest(CircuitTestCase("test_PSSW09_Circuit"))
     suite.addTest(CircuitTestCase("test_FairplayMP20_Circuit"))
     suite.addTest(CircuitTestCase("test_FairplayMP21_Circuit"))
+    suite.addTest(CircuitTestCase("test_CompiledCircuit"))
+    suite.addTest(CircuitTestCase("test_BinaryCircuit"))
 
     return suite
 
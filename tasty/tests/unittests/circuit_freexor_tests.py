@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from gmpy import mpz
+from itertools import product
+
+from tasty.circuit import Circuit, SIGNED, UNSIGNED, DROP_MSB
+from tasty.utils import int2comp2, comp22int, rand
+from tasty.circuit.dynamic import *
+from tasty.circuit.freexor import *
+from tasty.circuit.library import library_circuit, circuit_library
+
+from tasty import state
+
+
+def value(x, bitlen, signed):
+    if signed == SIGNED:
+        return comp22int(mpz(x), bitlen)
+    return x
+
+
+class FreeXORCircuitTestCase(unittest.TestCase):
+
+    def assertFreeXOR(self, c):
+        """only 2-input gates"""
+        c.check()
+        for g_in, g_tab in c.next_gate():
+            self.assertEqual(len(g_in), 2)
+
+    def test_FreeXORAddCircuit(self):
+        """testing FreeXORAddCircuit"""
+        for l_x in (1, 2, 3, 4):
+            for l_y in xrange(1, l_x + 1):
+                for type_x, type_y in product((SIGNED, UNSIGNED), repeat=2):
+                    c = FreeXORAddCircuit(l_x, l_y, type_x, type_y)
+                    self.assertFreeXOR(c)
+                    self.assertEqual(Circuit.gate_types(c)["2_NONXOR"], l_x)
+                    for x, y in product(xrange(1 << l_x), xrange(1 << l_y)):
+                        res = value(x, l_x, type_x) + value(y, l_y, type_y)
+                        self.assertEqual(c.eval((x, y))[0], int2comp2(mpz(res), l_x + 1))
+
+                c = FreeXORAddCircuit(l_x, l_y, UNSIGNED, UNSIGNED, DROP_MSB)
+                c.check()
+                for x, y in product(xrange(1 << l_x), xrange(1 << l_y)):
+                    self.assertEqual(c.eval((x, y))[0], (x + y) % (1 << l_x))
+
+    def test_FreeXORSubCircuit(self):
+        """testing FreeXORSubCircuit"""
+        for l_x in (1, 2, 3, 4):
+            for l_y in xrange(1, l_x + 1):
+                for type_y in (SIGNED, UNSIGNED):
+                    c = FreeXORSubCircuit(l_x, l_y, type_y)
+                    c.check()
+                    for x, y in product(xrange(1 << l_x), xrange(1 << l_y)):
+                        res = x - value(y, l_y, type_y)
+                        self.assertEqual(c.eval((x, y))[0], int2comp2(mpz(res), l_x + 1))
+
+                c = FreeXORSubCircuit(l_x, l_y, UNSIGNED, DROP_MSB)
+                c.check()
+                for x, y in product(xrange(1 << l_x), xrange(1 << l_y)):
+                    if x >= y:
+                        self.assertEqual(c.eval((x, y))[0], x - y)
+
+    def test_FreeXORCmpCircuit(self):
+        """testing FreeXORCmpCircuit"""
+        ops = {CmpCircuit.LESS: lambda x, y: x < y,
+               CmpCircuit.LESSEQUAL: lambda x, y: x <= y,
+               CmpCircuit.GREATER: lambda x, y: x > y,
+               CmpCircuit.GREATEREQUAL: lambda x, y: x >= y,
+               CmpCircuit.EQUAL: lambda x, y: x == y,
+               CmpCircuit.NOTEQUAL: lambda x, y: x != y}
+        for type_, op in ops.iteritems():
+            for l_x in (1, 2, 3, 4):
+                for l_y in xrange(1, l_x + 1):
+                    for signed_x, signed_y in product((SIGNED, UNSIGNED), repeat=2):
+                        c = FreeXORCmpCircuit(l_x, l_y, type_, signed_x, signed_y)
+                        c.check()
+                        for x, y in product(xrange(1 << l_x), xrange(1 << l_y)):
+                            ref = op(value(x, l_x, signed_x), value(y, l_y, signed_y))
+                            self.assertEqual(c.eval((x, y))[0], int(ref))
+
+            # one AND gate per bit, equality needs one less
+            c = FreeXORCmpCircuit(16, 16, type_, UNSIGNED, UNSIGNED)
+            self.assertFreeXOR(c)
+            nonxor = 15 if type_ in (CmpCircuit.EQUAL, CmpCircuit.NOTEQUAL) else 16
+            self.assertEqual(Circuit.gate_types(c)["2_NONXOR"], nonxor)
+
+    def test_FreeXORMuxCircuit(self):
+        """testing FreeXORMuxCircuit"""
+        for l in (1, 2, 3):
+            c = FreeXORMuxCircuit(l)
+            self.assertFreeXOR(c)
+            self.assertEqual(Circuit.gate_types(c)["2_NONXOR"], l)
+            for x, y in product(xrange(1 << l), repeat=2):
+                self.assertEqual(c.eval((x, y, 0))[0], x)
+                self.assertEqual(c.eval((x, y, 1))[0], y)
+
+    def test_FreeXORMinMaxCircuits(self):
+        """testing FreeXORMinMaxCircuits"""
+        for n in (2, 3, 4, 5):
+            for l in (1, 2, 3):
+                for signed in (SIGNED, UNSIGNED):
+                    for minmax_type, select in ((MinMaxValueCircuit.MIN, min), (MinMaxValueCircuit.MAX, max)):
+                        c_value = FreeXORMinMaxValueCircuit(n, l, minmax_type, signed)
+                        c_tree = FreeXORTreeMinMaxValueCircuit(n, l, minmax_type, signed)
+                        c_value_index = FreeXORMinMaxValueIndexCircuit(n, l, minmax_type, signed)
+                        c_index = FreeXORMinMaxIndexCircuit(n, l, minmax_type, signed)
+                        for c in (c_value, c_tree, c_value_index, c_index):
+                            self.assertFreeXOR(c)
+                        self.assertEqual(c_tree.gate_types(), c_value.gate_types())
+                        for i in xrange(50):
+                            vals = [rand.randint(0, (1 << l) - 1) for j in xrange(n)]
+                            values = [value(v, l, signed) for v in vals]
+                            ix = values.index(select(values))
+                            self.assertEqual(c_value.eval(vals), [vals[ix]])
+                            self.assertEqual(c_tree.eval(vals), [vals[ix]])
+                            self.assertEqual(c_value_index.eval(vals), [vals[ix], ix])
+                            self.assertEqual(c_index.eval(vals), [ix])
+
+        # ceil(log n) instead of n - 1 comparators of l + 1 levels on the longest path
+        for n in (8, 42):
+            c_tree = FreeXORTreeMinMaxValueCircuit(n, 16, MinMaxValueCircuit.MIN, UNSIGNED)
+            c_value = FreeXORMinMaxValueCircuit(n, 16, MinMaxValueCircuit.MIN, UNSIGNED)
+            levels = (n - 1).bit_length()
+            self.assertEqual(c_tree.nonxor_depth(), levels * 17)
+            self.assertEqual(c_value.nonxor_depth(), (n - 1) * 17)
+            for c in (FreeXORMinMaxValueIndexCircuit(n, 16, MinMaxValueCircuit.MIN, UNSIGNED),
+                      FreeXORMinMaxIndexCircuit(n, 16, MinMaxValueCircuit.MIN, UNSIGNED)):
+                self.assertTrue(c.nonxor_depth() <= levels * 17)
+
+    def test_gate_count_table(self):
+        """testing gate_count_table"""
+        for name, l, dynamic, optimized, freexor in gate_count_table((4, 8), 3):
+            self.assertTrue(freexor <= optimized <= dynamic)
+
+    def test_library_circuit(self):
+        """testing library_circuit"""
+        self.assertTrue(library_circuit(CmpCircuit, "dynamic") is CmpCircuit)
+        self.assertTrue(library_circuit(CmpCircuit, "freexor") is FreeXORCmpCircuit)
+        self.assertTrue(library_circuit(FastMultiplicationCircuit, "freexor") is FastMultiplicationCircuit)
+        self.failUnlessRaises(ValueError, circuit_library, "foo")
+        for cls, freexor_cls in circuit_library("freexor").iteritems():
+            self.assertTrue(issubclass(freexor_cls, cls))
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(FreeXORCircuitTestCase("test_FreeXORAddCircuit"))
+    suite.addTest(FreeXORCircuitTestCase("test_FreeXORSubCircuit"))
+    suite.addTest(FreeXORCircuitTestCase("test_FreeXORCmpCircuit"))
+    suite.addTest(FreeXORCircuitTestCase("test_FreeXORMuxCircuit"))
+    suite.addTest(FreeXORCircuitTestCase("test_FreeXORMinMaxCircuits"))
+    suite.addTest(FreeXORCircuitTestCase("test_gate_count_table"))
+    suite.addTest(FreeXORCircuitTestCase("test_library_circuit"))
+    return suite
+
+if __name__ == '__main__':
+    import tasty.utils
+    import logging
+
+    state.log.setLevel(logging.ERROR)
+    unittest.TextTestRunner(verbosity=2).run(suite())
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from gmpy import mpz
+from itertools import product
+
+from tasty.circuit import Circuit, SIGNED, UNSIGNED
+from tasty.utils import int2comp2, comp22int, rand
+from tasty.circuit.dynamic import *
+from tasty.circuit.freexor import *
+from tasty.circuit.lowdepth import *
+from tasty.circuit.library import library_circuit, circuit_library
+from tasty.circuit.transformations import FALSE
+
+from tasty import state
+
+
+def value(x, bitlen, signed):
+    if signed == SIGNED:
+        return comp22int(mpz(x), bitlen)
+    return x
+
+
+def log2(n):
+    return (n - 1).bit_length()
+
+
+class LowDepthCircuitTestCase(unittest.TestCase):
+
+    def test_prefix(self):
+        """testing GateList.prefix_add with Brent-Kung and Sklansky networks"""
+        for l in (1, 2, 3, 7, 8, 16, 33):
+            for sklansky in (False, True):
+                g = GateList(2 * l)
+                z = g.prefix_add(g.input_values(0, l), g.input_values(l, l), FALSE, sklansky)
+                gates, outs = g.compact([g.output(v) for v in z])
+                for i in xrange(20):
+                    x = rand.randint(0, (1 << l) - 1)
+                    y = rand.randint(0, (1 << l) - 1)
+                    wires = [(x >> j) & 1 for j in xrange(l)] + [(y >> j) & 1 for j in xrange(l)]
+                    for g_in, g_tab in gates:
+                        v = (wires[g_in[0]] << 1) | wires[g_in[1]]
+                        wires.append((g_tab >> (3 - v)) & 1)
+                    self.assertEqual(sum(wires[o] << j for j, o in enumerate(outs)), (x + y) % (1 << l))
+
+    def test_LowDepthAddCircuit(self):
+        """testing LowDepthAddCircuit and LowDepthSubCircuit"""
+        for l_x in (1, 2, 3, 4):
+            for l_y in xrange(1, l_x + 1):
+                for type_x, type_y in product((SIGNED, UNSIGNED), repeat=2):
+                    c = LowDepthAddCircuit(l_x, l_y, type_x, type_y)
+                    c.check()
+                    for x, y in product(xrange(1 << l_x), xrange(1 << l_y)):
+                        res = value(x, l_x, type_x) + value(y, l_y, type_y)
+                        self.assertEqual(c.eval((x, y))[0], int2comp2(mpz(res), l_x + 1))
+                for type_y in (SIGNED, UNSIGNED):
+                    c = LowDepthSubCircuit(l_x, l_y, type_y)
+                    c.check()
+                    for x, y in product(xrange(1 << l_x), xrange(1 << l_y)):
+                        res = x - value(y, l_y, type_y)
+                        self.assertEqual(c.eval((x, y))[0], int2comp2(mpz(res), l_x + 1))
+
+        for l in (16, 32, 64):
+            c = LowDepthAddCircuit(l, l, UNSIGNED, UNSIGNED)
+            for i in xrange(20):
+                x = rand.randint(0, (1 << l) - 1)
+                y = rand.randint(0, (1 << l) - 1)
+                self.assertEqual(c.eval((x, y))[0], x + y)
+            # Brent-Kung: 2 log n levels of AND gates instead of n
+            self.assertTrue(c.nonxor_depth() <= 2 * log2(l + 1))
+            self.assertEqual(FreeXORAddCircuit(l, l, UNSIGNED, UNSIGNED).nonxor_depth(), l)
+            self.assertTrue(Circuit.gate_types(c)["2_NONXOR"] < 4 * l)
+
+    def test_LowDepthCmpCircuit(self):
+        """testing LowDepthCmpCircuit"""
+        ops = {CmpCircuit.LESS: lambda x, y: x < y,
+               CmpCircuit.LESSEQUAL: lambda x, y: x <= y,
+               CmpCircuit.GREATER: lambda x, y: x > y,
+               CmpCircuit.GREATEREQUAL: lambda x, y: x >= y,
+               CmpCircuit.EQUAL: lambda x, y: x == y,
+               CmpCircuit.NOTEQUAL: lambda x, y: x != y}
+        for type_, op in ops.iteritems():
+            for l_x in (1, 2, 3, 4):
+                for l_y in xrange(1, l_x + 1):
+                    for signed_x, signed_y in product((SIGNED, UNSIGNED), repeat=2):
+                        c = LowDepthCmpCircuit(l_x, l_y, type_, signed_x, signed_y)
+                        c.check()
+                        for x, y in product(xrange(1 << l_x), xrange(1 << l_y)):
+                            ref = op(value(x, l_x, signed_x), value(y, l_y, signed_y))
+                            self.assertEqual(c.eval((x, y))[0], int(ref))
+
+            for l in (16, 32, 64):
+                c = LowDepthCmpCircuit(l, l, type_, UNSIGNED, UNSIGNED)
+                for i in xrange(20):
+                    x = rand.randint(0, (1 << l) - 1)
+                    y = rand.choice((x, rand.randint(0, (1 << l) - 1)))
+                    self.assertEqual(c.eval((x, y))[0], int(op(x, y)))
+                self.assertTrue(c.nonxor_depth() <= log2(l) + 1)
+                self.assertTrue(Circuit.gate_types(c)["2_NONXOR"] < 3 * l)
+
+    def test_LowDepthMinMaxCircuits(self):
+        """testing LowDepthMinMaxCircuits"""
+        for n in (2, 3, 5):
+            for l in (1, 3, 8):
+                for signed in (SIGNED, UNSIGNED):
+                    for minmax_type, select in ((MinMaxValueCircuit.MIN, min), (MinMaxValueCircuit.MAX, max)):
+                        c_value = LowDepthMinMaxValueCircuit(n, l, minmax_type, signed)
+                        c_value_index = LowDepthMinMaxValueIndexCircuit(n, l, minmax_type, signed)
+                        c_index = LowDepthMinMaxIndexCircuit(n, l, minmax_type, signed)
+                        for i in xrange(20):
+                            vals = [rand.randint(0, (1 << l) - 1) for j in xrange(n)]
+                            values = [value(v, l, signed) for v in vals]
+                            ix = values.index(select(values))
+                            self.assertEqual(c_value.eval(vals), [vals[ix]])
+                            self.assertEqual(c_value_index.eval(vals), [vals[ix], ix])
+                            self.assertEqual(c_index.eval(vals), [ix])
+
+    def test_minmax_depth_table(self):
+        """testing minmax_depth_table"""
+        rows = dict(((name, n), (gates, depth, nonxor_depth))
+                    for name, n, gates, depth, nonxor_depth in minmax_depth_table((8, 42), 8))
+        self.assertEqual(len(rows), 20)
+        for n in (8, 42):
+            chain = rows["FreeXORMinMaxValueCircuit", n]
+            tree = rows["FreeXORTreeMinMaxValueCircuit", n]
+            self.assertEqual(tree[0], chain[0])
+            self.assertTrue(tree[2] < chain[2])
+            self.assertTrue(rows["LowDepthMinMaxValueIndexCircuit", n][2] <
+                            rows["FreeXORMinMaxValueIndexCircuit", n][2])
+            for gates, depth, nonxor_depth in rows.itervalues():
+                self.assertTrue(gates > 0 and 0 < nonxor_depth <= depth)
+
+    def test_library_circuit(self):
+        """testing the lowdepth circuit library"""
+        self.assertTrue(library_circuit(AddCircuit, "lowdepth") is LowDepthAddCircuit)
+        self.assertTrue(library_circuit(MuxCircuit, "lowdepth") is FreeXORMuxCircuit)
+        for cls, lowdepth_cls in circuit_library("lowdepth").iteritems():
+            self.assertTrue(issubclass(lowdepth_cls, cls))
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(LowDepthCircuitTestCase("test_prefix"))
+    suite.addTest(LowDepthCircuitTestCase("test_LowDepthAddCircuit"))
+    suite.addTest(LowDepthCircuitTestCase("test_LowDepthCmpCircuit"))
+    suite.addTest(LowDepthCircuitTestCase("test_LowDepthMinMaxCircuits"))
+    suite.addTest(LowDepthCircuitTestCase("test_minmax_depth_table"))
+    suite.addTest(LowDepthCircuitTestCase("test_library_circuit"))
+    return suite
+
+if __name__ == '__main__':
+    import tasty.utils
+    import logging
+
+    state.log.setLevel(logging.ERROR)
+    unittest.TextTestRunner(verbosity=2).run(suite())
@@ -2,13 +2,16 @@
 
 import unittest
 import os.path
-from tasty.circuit import Circuit, int2comp2, comp22int
+from tasty.circuit import Circuit, SIGNED, UNSIGNED, wire_statistics
+from tasty.utils import int2comp2, comp22int, rand
 
 import time
 
 from tasty.circuit.dynamic import *
 from tasty.circuit.transformations import *
 from tasty.circuit.reader import PSSW09Circuit
+from tasty.circuit.compiled import CompiledCircuit
+from tasty.circuit import threeinputreplace
 
 from tasty import state
 
@@ -51,6 +54,24 @@ class CircuitTestCase(unittest.TestCase):
         for vals in ((0xAB, 0xCD), (1,0xEF)):
             self.assertEqual(d.eval(vals)[0], c.eval(vals)[0])
 
+        # precompiled templates of all 3-input gates with up to 2-input gates
+        for tab, rule in enumerate(threeinputreplace.translate):
+            if rule is None:
+                self.assertTrue(threeinputreplace.templates[tab] is None)
+                continue
+            gates, output = threeinputreplace.templates[tab]
+            for g_ins, g_tab in gates:
+                self.failIf(g_ins[2:], "only gates with up to 2 inputs")
+            self.assertEqual(list(replace_3_by_2(GateCircuit(3, ([(tab >> (7 - i)) & 1 for i in xrange(8)],)))
+                                  .next_gate()),
+                             [([(0, 1, 2)[r] if r < 3 else r for r in g_ins], g_tab) for g_ins, g_tab in gates])
+
+        # compiled circuits are transformed the same way
+        c = CompiledCircuit.from_circuit(replace_3_by_2(FastMultiplicationCircuit(12, 12)))
+        d = replace_3_by_2(CompiledCircuit.from_circuit(FastMultiplicationCircuit(12, 12)))
+        self.assertEqual(list(d.next_gate()), [(list(g_ins), g_tab) for g_ins, g_tab in c.next_gate()])
+        self.assertEqual(d.outputs(), c.outputs())
+
     def test_replace_xnor_with_xor(self):
         '''testing replace_xnor_with_xor'''
 
@@ -71,6 +92,81 @@ class CircuitTestCase(unittest.TestCase):
         d_res = d.eval((k,m))[0]
         self.assertEqual(c_res, d_res)
 
+    def test_remove_redundant_gates(self):
+        '''testing remove_redundant_gates'''
+
+        # single gates, constant and irrelevant inputs are folded
+        for len in (0,1,2,3):
+            for tab in product(range(2), repeat=1<<len):
+                c = GateCircuit(len, (tab,))
+                d = remove_redundant_gates(c)
+                d.check()
+                for vals in product(range(2), repeat=len):
+                    self.assertEqual(c.eval(vals)[0], d.eval(vals)[0])
+                self.assertTrue(d.num_gates() <= 1)
+
+        # XNOR and inverters are propagated into the XOR gate
+        c = GateCircuit(2, [[1,0,0,1]])
+        d = remove_redundant_gates(replace_3_by_2(c))
+        self.assertEqual(list(d.next_gate()), [([0, 1], 0b1001)])
+
+        # duplicate and dead gates
+        class RedundantCircuit(Circuit):
+            def num_input_bits(self):
+                return 2
+            def inputs(self):
+                return ((2, "x"),)
+            def num_output_bits(self):
+                return 2
+            def outputs(self):
+                return (((5, 7), "z", UNSIGNED),)
+            def num_gates(self):
+                return 6
+            def next_gate(self):
+                yield (0, 1), 0b0001         # 2: x_0 & x_1
+                yield (1, 0), 0b0001         # 3: duplicate of 2
+                yield (0, 1), 0b1110         # 4: dead
+                yield (2, 3), 0b0110         # 5: x_0 & x_1 ^ x_0 & x_1 = 0
+                yield (), 1                  # 6: 1
+                yield (6, 0), 0b0001         # 7: x_0
+        c = RedundantCircuit()
+        d = remove_redundant_gates(c)
+        d.check()
+        for x in xrange(4):
+            self.assertEqual(c.eval((x,)), d.eval((x,)))
+        self.assertEqual(d.num_gates(), 1)
+        self.assertEqual(d.removed_non_xor_gates(), 4)
+
+        # composed circuits
+        for c in (FastMultiplicationCircuit(8, 8), AddCircuit(8, 3, SIGNED, SIGNED),
+                  MinMaxIndexCircuit(5, 3, MinMaxIndexCircuit.MIN, SIGNED)):
+            d = remove_redundant_gates(replace_3_by_2(c))
+            d.check()
+            for i in xrange(100):
+                vals = [rand.randint(0, (1 << l) - 1) for l, desc in c.inputs()]
+                self.assertEqual(c.eval(vals), d.eval(vals))
+        self.assertEqual(d.removed_non_xor_gates(), 2)
+
+    def test_reorder_min_live(self):
+        '''testing reorder_min_live and wire_statistics'''
+        # inputs are released by the gates using them, outputs stay live
+        stats = wire_statistics(Bool2Circuit(3, Bool2Circuit.XOR))
+        self.assertEqual(stats, {"peak_live_wires": 6, "average_lifetime": 1.0, "num_wires": 9})
+
+        for c in (FastMultiplicationCircuit(8, 8), MultiplicationCircuit(6, 6),
+                  MinMaxValueIndexCircuit(4, 4, MinMaxValueIndexCircuit.MIN, UNSIGNED)):
+            vectors = [[rand.randint(0, (1 << l) - 1) for l, desc in c.inputs()] for i in xrange(50)]
+            for e in (c, reorder_rand(c)):
+                d = reorder_min_live(e)
+                d.check()
+                self.assertEqual(d.eval_batch(vectors), c.eval_batch(vectors))
+                self.assertTrue(d.peak_live_wires() <= e.peak_live_wires())
+
+        # random orders keep more wires live
+        for c in (FastMultiplicationCircuit(8, 8), MultiplicationCircuit(6, 6)):
+            e = reorder_rand(c)
+            self.assertTrue(reorder_min_live(e).peak_live_wires() < e.peak_live_wires())
+
     def test_circuit_buffer_RAM(self):
         '''testing circuit_buffer_RAM'''
         c = PSSW09Circuit(os.path.join(state.tasty_root, "circuit/circuits/PSSW09_PracticalSFE/AES_PSSW09.txt"))
@@ -121,6 +217,8 @@ def suite():
     suite = unittest.TestSuite()
     suite.addTest(CircuitTestCase("test_replace_3_by_2"))
     suite.addTest(CircuitTestCase("test_replace_xnor_with_xor"))
+    suite.addTest(CircuitTestCase("test_remove_redundant_gates"))
+    suite.addTest(CircuitTestCase("test_reorder_min_live"))
     suite.addTest(CircuitTestCase("test_circuit_buffer_RAM"))
 
     return suite
@@ -1,12 +1,22 @@
 # -*- coding: utf-8 -*-
 import unittest
 from tasty.crypt.garbled_circuit import *
+from tasty.crypt.garbled_circuit.abstract_garbled_circuit import AbstractCreatorGarbledCircuit, \
+    AbstractEvaluatorGarbledCircuit, close_pool
+from tasty.crypt.garbled_circuit.cache import CIRCUIT_BYTES
+from tasty.crypt.garbled_circuit import cache as cache_module
 from tasty.circuit.dynamic import *
+from tasty.circuit.freexor import FreeXORAddCircuit
 from tasty.circuit import *
 from tasty import utils
-from tasty import config, state
+from tasty import config, state, cost_results
 from tasty.protocols.otprotocols import PaillierOT
+from tasty.protocols.gc_protocols import GarbledTableSpool
 from itertools import product #cartesian product
+import shutil
+import tempfile
+import os
+import warnings
 
 
 
@@ -17,6 +27,9 @@ class GarbledCircuitTestCase(unittest.TestCase):
         state.config = config.create_configuration(host="::1", port=8000, symmetric_security_parameter=80, asymmetric_security_parameter=1024, testing=True, protocol_dir=".")
         state.config.ot_chain = [PaillierOT]
         state.R = generate_R()
+        cost_results.CostSystem.create_costs()
+        # tests create creators without evaluators, keep the circuit ids in sync
+        AbstractCreatorGarbledCircuit._circuit_counter = AbstractEvaluatorGarbledCircuit._circuit_counter = 0
 
     def test_R(self):
         self.assertEqual(state.R & 1 , 1)
@@ -71,10 +84,286 @@ class GarbledCircuitTestCase(unittest.TestCase):
                     tuple(garbled2plain(outputs[0], sgcr, state.R)) # make sure that this are correct results
                     self.assertEqual(sum(val),bits2value(out))
 
+    def _garbled_add(self, l_x, l_y, c=None):
+        if c is None:
+            c = AddCircuit(l_x, l_y, UNSIGNED, UNSIGNED)
+        for val in product(xrange(1<<l_x), xrange(1<<l_y)):
+            null_inputs = [tuple(generate_garbled_value(l)) for l in (l_x, l_y)]
+            bval = (value2bits(mpz(val[0]), l_x), value2bits(mpz(val[1]), l_y),)
+            inputs = [tuple(plain2garbled(y, x, state.R)) for x, y in zip(null_inputs, bval)]
+            sgc = CreatorGarbledCircuit(c, state.R, null_inputs)
+            egc = EvaluatorGarbledCircuit(c, sgc.next_garbled_gate(), inputs)
+            outputs = map(tuple, egc.eval())
+            sgcr = tuple(sgc.results().next())
+            out = tuple(garbled2plain(outputs[0], sgcr, state.R))
+            self.assertEqual(sum(val), bits2value(out))
+        return sgc, egc
+
+    def test_garbledcircuit_parallel(self):
+        """ garbling on worker processes yields the same tables in the same order """
+        c = MultiplicationCircuit(8, 8)
+        null_inputs = [tuple(generate_garbled_value(8)) for i in (0, 1)]
+        batch = AbstractCreatorGarbledCircuit.parallel_batch
+        counter = AbstractCreatorGarbledCircuit._circuit_counter
+        AbstractCreatorGarbledCircuit.parallel_batch = 4
+        try:
+            for scheme in GC_SCHEMES:
+                state.config.gc_scheme = scheme
+                tables = []
+                outputs = []
+                for processes in (0, 1, 2):
+                    state.config.gc_processes = processes
+                    AbstractCreatorGarbledCircuit._circuit_counter = counter
+                    sgc = CreatorGarbledCircuit(c, state.R, null_inputs)
+                    tables.append(tuple(sgc.next_garbled_gate()))
+                    outputs.append(tuple(sgc.results().next()))
+                self.assertEqual(tables[0], tables[1])
+                self.assertEqual(tables[0], tables[2])
+                self.assertEqual(outputs[0], outputs[1])
+                self.assertEqual(outputs[0], outputs[2])
+
+                # the levels reuse slots, too
+                plan = sgc.plan
+                schedule = plan.level_schedule(sgc.free_gate)
+                self.assertTrue(schedule.num_slots < plan.num_inputs + plan.num_gates)
+        finally:
+            AbstractCreatorGarbledCircuit.parallel_batch = batch
+            # circuit ids of creator and evaluator must stay in sync
+            AbstractCreatorGarbledCircuit._circuit_counter = counter
+            state.config.gc_processes = 0
+            close_pool()
+
+    def test_garbledcircuit_spool(self):
+        """ evaluate garbled tables read back from a spool """
+        for scheme in GC_SCHEMES:
+            state.config.gc_scheme = scheme
+            c = AddCircuit(6, 6, UNSIGNED, UNSIGNED)
+            null_inputs = [tuple(generate_garbled_value(6)) for i in (0, 1)]
+            inputs = [tuple(plain2garbled(value2bits(mpz(v), 6), z, state.R)) for v, z in zip((45, 38), null_inputs)]
+            sgc = CreatorGarbledCircuit(c, state.R, null_inputs)
+            tables = tuple(sgc.next_garbled_gate())
+            spool = GarbledTableSpool(pack_tables(tables, 64))
+            egc = EvaluatorGarbledCircuit(c, GarbledTableFrames(spool), inputs)
+            outputs = map(tuple, egc.eval())
+            out = tuple(garbled2plain(outputs[0], tuple(sgc.results().next()), state.R))
+            self.assertEqual(bits2value(out), 45 + 38)
+            self.assertTrue(spool.file.closed)
+
+    def test_garbledcircuit_frames(self):
+        """ garbled tables packed into frames, sent bytes match the theoretical costs """
+        for scheme in GC_SCHEMES:
+            state.config.gc_scheme = scheme
+            c = MultiplicationCircuit(5, 5)
+            null_inputs = [tuple(generate_garbled_value(5)) for i in (0, 1)]
+            inputs = [tuple(plain2garbled(value2bits(mpz(v), 5), z, state.R)) for v, z in zip((27, 19), null_inputs)]
+            sgc = CreatorGarbledCircuit(c, state.R, null_inputs)
+            frames = tuple(pack_tables(sgc.next_garbled_gate(), 100))
+            self.assertTrue(len(frames) > 1)
+            self.assertEqual(sum(map(len, frames)), sgc.creation_costs()["Send"])
+            egc = EvaluatorGarbledCircuit(c, GarbledTableFrames(frames), inputs)
+            outputs = map(tuple, egc.eval())
+            out = tuple(garbled2plain(outputs[0], tuple(sgc.results().next()), state.R))
+            self.assertEqual(bits2value(out), 27 * 19)
+
+    def test_garbledcircuit_plan(self):
+        """ circuits are compiled once and shared by creator and evaluator """
+        c = AddCircuit(5, 4, UNSIGNED, UNSIGNED)
+        null_inputs = [tuple(generate_garbled_value(l)) for l in (5, 4)]
+        plans = set()
+        for scheme in GC_SCHEMES:
+            state.config.gc_scheme = scheme
+            sgc = CreatorGarbledCircuit(c, state.R, null_inputs)
+            egc = EvaluatorGarbledCircuit(c, iter(()), None)
+            self.assertTrue(sgc.plan is egc.plan)
+            plans.add(id(sgc.plan))
+        self.assertEqual(len(plans), 1)
+        plan = sgc.plan
+        gates = tuple(plan.circuit.next_gate())
+        self.assertEqual(tuple((tuple(i), t) for i, t in plan.gates()), tuple((tuple(i), t) for i, t in gates))
+        self.assertEqual(plan.gate_types(), plan.circuit.gate_types())
+        self.assertEqual(plan.num_gates, len(gates))
+        self.assertEqual(plan.outputs, [tuple(o[0]) for o in plan.circuit.outputs()])
+        for (ins, t), kind in zip(gates, plan.kinds):
+            self.assertEqual(kind == XOR_GATE, len(ins) == 2 and t == 0b0110)
+
+    def test_garbledcircuit_slots(self):
+        """ wires only share slots when their lifetimes do not overlap """
+        plan = CreatorGarbledCircuit(MultiplicationCircuit(16, 16), state.R, None).plan
+        u = plan.num_inputs
+        self.assertTrue(plan.num_slots < (u + plan.num_gates) // 4)
+        # simulate the slots with wire numbers
+        slots = range(u)
+        for ix, (inputs, truth) in enumerate(plan.gates()):
+            first, end = plan.offsets[ix], plan.offsets[ix + 1]
+            self.assertEqual([slots[s] for s in plan.slot_inputs[first:end]], list(inputs))
+            out = plan.slots[u + ix]
+            slots.extend([None] * (out + 1 - len(slots)))
+            slots[out] = u + ix
+        self.assertEqual([tuple(slots[s] for s in o) for o in plan.output_slots], plan.outputs)
+        self.assertEqual(max(plan.slots) + 1, plan.num_slots)
+
+    def test_label_store(self):
+        """ fixed width label encodings, permutation bits and hash inputs """
+        bits = state.config.symmetric_security_parameter + 1
+        labels = tuple(generate_garbled_value(4))
+        store = LabelStore(4, bits, state.R)
+        store.set_inputs(labels)
+        for i, x in enumerate(labels):
+            self.assertEqual(store.decode(store.label(i)), x)
+            self.assertEqual(store.decode(store.label(i, 1)), x ^ state.R)
+            self.assertEqual(store.perm_bit(i), x & 1)
+        self.assertEqual(store.perm_bits((2, 0)), ((labels[2] & 1) << 1) | (labels[0] & 1))
+        self.assertEqual(store.row((3, 1), 0b01), store.label(3) + store.label(1, 1))
+        h = gate_hash_class("SHA256")(3)
+        self.assertEqual(h.encoded(store.row((0, 1)), 9), h(labels[:2], 9))
+        store[0] = labels[0] ^ state.R
+        self.assertEqual(store.label(0, 1), store.encode(labels[0]))
+
+    def test_gate_hash(self):
+        """ gate hashes are deterministic, truncated and agree for rows and single calls """
+        for name in GATE_HASHES:
+            h = gate_hash_class(name)(7)
+            inputs = tuple(generate_garbled_value(3))
+            v = h(inputs, 5)
+            self.assertEqual(v, h(inputs, 5))
+            self.assertTrue(v <= h.MAX)
+            self.assertNotEqual(v, h(inputs, 6))
+            self.assertNotEqual(v, gate_hash_class(name)(8)(inputs, 5))
+            self.assertEqual(h.rows((inputs, inputs[::-1]), 5), [v, h(inputs[::-1], 5)])
+            self.assertEqual(h.gate_rows([(inputs, ), (inputs[::-1], )], [5, 6]), [[v], [h(inputs[::-1], 6)]])
+        self.assertRaises(ValueError, gate_hash_class, "MD5")
+
+    def test_garbledcircuit_batch(self):
+        """ permuted truthtables are looked up, gates of a level can be garbled at once """
+        for d in (1, 2, 3, 4):
+            for truth in (0, 1, 0b0110 % (1 << (1 << d)), (1 << (1 << d)) - 2):
+                for permbits in xrange(1 << d):
+                    ptruth = FreeXORReducedRowCreatorGarbledCircuit.get_permuted_truth(permbits, d, truth)
+                    self.assertEqual(ptruth, tuple((truth >> ((1 << d) - 1 - (e ^ permbits))) & 1
+                                                   for e in xrange(1 << d)))
+        c = GateCircuit(3, ((1, 0, 1, 1, 0, 1, 1, 0), ))
+        gzv = [tuple(generate_garbled_value(1)) for i in xrange(3)]
+        for scheme in GC_SCHEMES:
+            state.config.gc_scheme = scheme
+            sgc = CreatorGarbledCircuit(c, state.R, gzv)
+            wires = LabelStore(3, state.config.symmetric_security_parameter + 1, state.R)
+            wires.set_inputs(v[0] for v in gzv)
+            gates = [((0, 1), 0b0001, 0), ((1, 2), 0b0110, 1), ((0, 1, 2), 0b10110110, 2)]
+            self.assertEqual(sgc.create_garbled_gates(wires, gates),
+                             [sgc.create_garbled_gate(wires, inputs, truth, gid) for inputs, truth, gid in gates])
+
+    def test_garbledcircuit_gc_hash(self):
+        """ garbling and evaluation works with every gate hash """
+        for name in GATE_HASHES:
+            state.config.gc_hash = name
+            sgc, egc = self._garbled_add(3, 2)
+            self.assertEqual(sgc.gate_hash.name, name)
+            self.assertTrue(name in sgc.creation_costs())
+            self.assertTrue(name in egc.evaluation_costs())
+
     def test_garbledcircuit_bruteforce(self):
-        """ IMPLEMENT THIS: Brute-force test GC with d-input gates """
-        #TODO: implement brute force test: for d in (0,1,2,3,4): forall possible gate tables: forall possible inputs: assert c.eval == gc.eval
-        pass
+        """ Brute-force test GC with d-input gates for all garbling schemes """
+        for scheme in GC_SCHEMES:
+            state.config.gc_scheme = scheme
+            for d in (1, 2, 3):
+                tabs = tuple(product((0, 1), repeat=1 << d))
+                c = GateCircuit(d, tabs)
+                for comb in product((0, 1), repeat=d):
+                    gzv = [tuple(generate_garbled_value(1)) for i in xrange(d)]
+                    gv = [tuple(plain2garbled((b, ), z, state.R)) for b, z in zip(comb, gzv)]
+                    sgc = CreatorGarbledCircuit(c, state.R, gzv)
+                    egc = EvaluatorGarbledCircuit(c, sgc.next_garbled_gate(), gv)
+                    outputs = map(tuple, egc.eval())
+                    c_outputs = map(tuple, sgc.results())
+                    v = sum(b << (d - i - 1) for i, b in enumerate(comb))
+                    for tab, out, c_out in zip(tabs, outputs, c_outputs):
+                        self.assertEqual(tuple(garbled2plain(out, c_out, state.R)), (tab[v], ))
+
+    def test_garbledcircuit_halfgates(self):
+        """ half gates need two table entries per AND gate only """
+        state.config.gc_scheme = "HalfGates"
+        sgc, egc = self._garbled_add(4, 3)
+        self.assertTrue(isinstance(sgc, HalfGatesCreatorGarbledCircuit))
+        c = GateCircuit(2, ((0, 0, 0, 1), (1, 0, 1, 1), (0, 1, 1, 0), (1, 1, 0, 0), (1, 1, 1, 1)))
+        gzv = [tuple(generate_garbled_value(1)) for i in (0, 1)]
+        sgc = CreatorGarbledCircuit(c, state.R, gzv)
+        tables = tuple(sgc.next_garbled_gate())
+        # tables are the fixed width encodings of two entries
+        w = utils.bit2byte(state.config.symmetric_security_parameter + 1)
+        self.assertEqual(map(len, tables), [2 * w, 2 * w])
+        self.assertEqual(sgc.creation_costs()["Send"], 2 * 2 * w)
+        self.assertEqual(sgc.creation_costs()["SHA256"], 8)
+        state.config.gc_scheme = "PSSW09"
+        sgc = CreatorGarbledCircuit(c, state.R, gzv)
+        # inverter of x_0 and constant gate left after removing redundant gates
+        self.assertEqual(sgc.creation_costs()["Send"], (2 * 3 + 1) * w)
+
+    def test_garbledcircuit_freexor(self):
+        """ circuits of the freexor library garble without replacing gates """
+        c = FreeXORAddCircuit(3, 2, UNSIGNED, UNSIGNED)
+        for scheme in GC_SCHEMES:
+            state.config.gc_scheme = scheme
+            sgc, egc = self._garbled_add(3, 2, c)
+            self.assertEqual(sgc.plan.gate_types(), c.gate_types())
+        state.config.gc_scheme = "PSSW09"
+
+    def test_circuit_cache(self):
+        """ equal circuits and their plans are built once, evicted LRU and persisted """
+        cache = CircuitCache()
+        c = cache.get(AddCircuit, 3, 2, UNSIGNED, UNSIGNED)
+        self.assertTrue(cache.get(AddCircuit, 3, 2, UNSIGNED, UNSIGNED) is c)
+        self.assertFalse(cache.get(AddCircuit, 3, 2, UNSIGNED, SIGNED) is c)
+        sgc, egc = self._garbled_add(3, 2, c)
+        self.assertTrue(sgc.plan is get_plan(cache.get(AddCircuit, 3, 2, UNSIGNED, UNSIGNED), sgc.optimize_circuit))
+
+        # least recently used circuits are evicted first
+        cache = CircuitCache(2 * CIRCUIT_BYTES)
+        cache.get(CmpCircuit, 4, 4, CmpCircuit.LESS, UNSIGNED, UNSIGNED)
+        self.assertEqual(len(cache), 1)
+        cache.get(MuxCircuit, 4)
+        self.assertEqual(len(cache), 2)
+        cache.get(CmpCircuit, 4, 4, CmpCircuit.LESS, UNSIGNED, UNSIGNED)
+        cache.get(NotCircuit, 4)
+        self.assertTrue(cache.key(MuxCircuit, (4, )) not in cache)
+        self.assertTrue(cache.key(CmpCircuit, (4, 4, CmpCircuit.LESS, UNSIGNED, UNSIGNED)) in cache)
+
+        # plans are stored on disk and loaded instead of optimizing the circuit again
+        path = tempfile.mkdtemp()
+        try:
+            cache = CircuitCache(path=path)
+            self._garbled_add(3, 2, cache.get(AddCircuit, 3, 2, UNSIGNED, UNSIGNED))
+            cache.clear()
+            cache = CircuitCache(path=path)
+            c = cache.get(AddCircuit, 3, 2, UNSIGNED, UNSIGNED)
+            plan = get_plan(c, sgc.optimize_circuit)
+            self.assertTrue(plan.stored)
+            self.assertEqual(plan.kinds, sgc.plan.kinds)
+            sgc, egc = self._garbled_add(3, 2, c)
+            self.assertTrue(sgc.plan is plan)
+
+            # plans of other versions and files not matching their digest are not loaded
+            directory = cache.filename(cache.key(AddCircuit, (3, 2, UNSIGNED, UNSIGNED)), c)
+            cache_module.CACHE_VERSION += 1
+            try:
+                c = CircuitCache(path=path).get(AddCircuit, 3, 2, UNSIGNED, UNSIGNED)
+                self.assertFalse(hasattr(c, "_gc_plans"))
+            finally:
+                cache_module.CACHE_VERSION -= 1
+            name, = os.listdir(directory)
+            plan_key, digest, ext = name.rsplit(".", 2)
+            os.rename(os.path.join(directory, name), os.path.join(directory, "%s.%s.%s" % (plan_key, "0" * 40, ext)))
+            with warnings.catch_warnings(record=True) as w:
+                warnings.simplefilter("always")
+                c = CircuitCache(path=path).get(AddCircuit, 3, 2, UNSIGNED, UNSIGNED)
+            self.assertFalse(hasattr(c, "_gc_plans"))
+            self.assertEqual(len(w), 1)
+        finally:
+            shutil.rmtree(path)
+
+        state.config.circuit_cache_size = 0
+        self.assertFalse(cached_circuit(NotCircuit, 4) is cached_circuit(NotCircuit, 4))
+        state.config.circuit_cache_size = 1
+        self.assertTrue(cached_circuit(NotCircuit, 4) is cached_circuit(NotCircuit, 4))
 
 def suite():
     suite = unittest.TestSuite()
@@ -83,6 +372,18 @@ def suite():
 #    suite.addTest(GarbledCircuitTestCase("test_garbledcircuit_1bitand"))
     suite.addTest(GarbledCircuitTestCase("test_garbledcircuit_add"))
     suite.addTest(GarbledCircuitTestCase("test_garbledcircuit_bruteforce"))
+    suite.addTest(GarbledCircuitTestCase("test_garbledcircuit_parallel"))
+    suite.addTest(GarbledCircuitTestCase("test_garbledcircuit_spool"))
+    suite.addTest(GarbledCircuitTestCase("test_garbledcircuit_frames"))
+    suite.addTest(GarbledCircuitTestCase("test_garbledcircuit_plan"))
+    suite.addTest(GarbledCircuitTestCase("test_garbledcircuit_slots"))
+    suite.addTest(GarbledCircuitTestCase("test_label_store"))
+    suite.addTest(GarbledCircuitTestCase("test_gate_hash"))
+    suite.addTest(GarbledCircuitTestCase("test_garbledcircuit_batch"))
+    suite.addTest(GarbledCircuitTestCase("test_garbledcircuit_gc_hash"))
+    suite.addTest(GarbledCircuitTestCase("test_garbledcircuit_halfgates"))
+    suite.addTest(GarbledCircuitTestCase("test_garbledcircuit_freexor"))
+    suite.addTest(GarbledCircuitTestCase("test_circuit_cache"))
 
     return suite
 
@@ -7,7 +7,10 @@ from time import sleep
 from tasty.types import Party
 from tasty import utils, config, state
 from tasty.protocols.otprotocols import paillierot
-from tasty.protocols.otprotocols import PaillierOT, ECNaorPinkasOT
+from tasty.protocols.otprotocols import PaillierOT, ECNaorPinkasOT, CorrelatedBeaverOT
+from tasty.crypt.garbled_circuit.utils import generate_R
+from tasty import cost_results
+from tasty.protocols.otprotocols.iknp03 import pack_bits, transpose, xor_strings, hash_rows
 import socket, atexit
 from gmpy import mpz
 from itertools import product
@@ -78,6 +81,75 @@ class TastyOTTestCase(unittest.TestCase):
 
             print "%fs" % (time.clock()-start_time)
 
+class IKNP03TestCase(unittest.TestCase):
+
+    def test_transpose(self):
+        """ testing the packed bit matrix transpose of IKNP03 """
+        for m, k in ((1, 3), (13, 80), (1000, 128), (20000, 96)):
+            cols = [mpz(utils.rand.getrandbits(m)) for i in xrange(k)]
+            rows = transpose(cols, m, k)
+            w = utils.bit2byte(k)
+            self.assertEqual(len(rows), m * w)
+            for j in utils.rand.sample(xrange(m), min(m, 20)):
+                row = mpz(rows[j * w:(j + 1) * w] + "\0", 256)
+                self.assertEqual(row, pack_bits([(c >> j) & 1 for c in cols]))
+
+    def test_hash_rows(self):
+        """ testing the batched IKNP03 hashes on the matrices of the extension """
+        m = 1000
+        for k in (80, 128):
+            w = utils.bit2byte(k)
+            hw = utils.bit2byte(k + 1)
+            s = [utils.rand.randint(0, 1) for i in xrange(k)]
+            r = [utils.rand.randint(0, 1) for i in xrange(m)]
+            T = [mpz(utils.rand.getrandbits(m)) for i in xrange(k)]
+            Q = [t ^ pack_bits(r) if si else t for t, si in zip(T, s)]
+            T = transpose(T, m, k)
+            Q = transpose(Q, m, k)
+            Qs = xor_strings(Q, pack_bits(s).binary()[:w].ljust(w, "\0") * m)
+            for aes in (False, True):
+                try:
+                    pads = [hash_rows(rows, w, k + 1, aes) for rows in (T, Q, Qs)]
+                except ImportError: # no PyCrypto
+                    continue
+                for pad in pads:
+                    self.assertEqual(len(pad), m * hw)
+                    self.assertTrue(max(pad[hw - 1::hw]) < chr(1 << (k + 1) % 8))
+                for j in xrange(m):
+                    pad_t, pad_0, pad_1 = [pad[j * hw:(j + 1) * hw] for pad in pads]
+                    self.assertEqual(pad_t, (pad_0, pad_1)[r[j]])
+                    self.assertNotEqual(pad_0, pad_1)
+
+
+class CorrelatedBeaverOTTestCase(unittest.TestCase):
+    def setUp(self):
+        state.config = config.create_configuration(security_level="short", asymmetric_security_parameter=1024, symmetric_security_parameter=80, ot_type = "EC", host="::1", port=8000, protocol_dir="docs/millionaires_problem/")
+        cost_results.CostSystem.create_costs()
+
+    def test_correlated_beaver_ot(self):
+        """ testing the online phase of correlated OTs with the messages of both parties """
+        n = 100
+        k = state.config.symmetric_security_parameter
+        R = generate_R()
+        # precomputed OTs of the pairs (m, m ^ R)
+        prec_m = [mpz(m) for m in utils.get_random(0, 2**(k + 1) - 1, n)]
+        prec_b = tuple(utils.get_random(0, 1, n))
+        prec_mb = [m ^ R if b else m for m, b in zip(prec_m, prec_b)]
+
+        x = [mpz(v) for v in utils.get_random(0, 2**(k + 1) - 1, n)]
+        choices = tuple(utils.get_random(0, 1, n))
+        client = CorrelatedBeaverOT.__new__(CorrelatedBeaverOT)
+        server = CorrelatedBeaverOT.__new__(CorrelatedBeaverOT)
+        client.args = (choices, prec_b, prec_mb)
+        server.args = (x, prec_m, R)
+
+        msgs = server.server_online2(client.client_online1(None))
+        # one message per transfer
+        self.assertEqual(len(msgs[0]), n)
+        client.client_online3(msgs)
+        self.assertEqual(list(client.get_results()), [v ^ R if b else v for v, b in zip(x, choices)])
+
+
 class OTTest(object):
     #TODO: @Immo: please document how OTTest works
     def __init__(self, num):
@@ -140,6 +212,9 @@ def suite():
     suite = unittest.TestSuite()
 #    suite.addTest(TastyOTTestCase("test_tastyot"))
     suite.addTest(TastyOTTestCase("test_ot_protocol_performance"))
+    suite.addTest(IKNP03TestCase("test_transpose"))
+    suite.addTest(IKNP03TestCase("test_hash_rows"))
+    suite.addTest(CorrelatedBeaverOTTestCase("test_correlated_beaver_ot"))
     return suite
 
 if __name__ == '__main__':
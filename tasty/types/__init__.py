@@ -33,12 +33,13 @@ import tasty.protocols.homomorphic_mult
 # GarbledCircuit features
 from tasty.circuit import DROP_MSB, SIGNED, UNSIGNED
 from tasty.circuit.dynamic import *
+from tasty.circuit.library import library_circuit
 from tasty.crypt.garbled_circuit import *
 from tasty.protocols.gc_protocols import GCProtocol
 
 # fairplay features
 from tasty.circuit.reader import FairplayMP21Circuit as FairplayCircuit, FairplayMP21Circuit, FairplayMP20Circuit, \
-    PSSW09Circuit
+    PSSW09Circuit, BinaryCircuit
 
 from tasty.types.metatypes import *
 from tasty.types import key
@@ -75,6 +76,7 @@ __all__ = [
     "protocol_path",
     "FairplayMP20Circuit",
     "FairplayMP21Circuit",
+    "BinaryCircuit",
     "result_path"]
 
 
@@ -1832,13 +1834,13 @@ class Garbled(GarbledType):
                         self._value[:] = plain2garbled(value2bits(value.get_value(), self._bit_length),
                                                        Garbled.get_zero_value(self.gid), state.R)
                     else:
-                        state.tasty_ot.next_ots(((i, i ^ state.R) for i in Garbled.get_zero_value(self.gid)))
+                        state.tasty_ot.next_correlated_ots(Garbled.get_zero_value(self.gid))
             else:  # client
                 if state.precompute:
                     pass
                     #raise InternalError("client does not have to do precomputation on creation of garbled values")
                 else:
-                    self._value[:] = nogen(state.tasty_ot.next_ots(value2bits(value.get_value(), value.bit_length())))
+                    self._value[:] = nogen(state.tasty_ot.next_correlated_ots(value2bits(value.get_value(), value.bit_length())))
         elif isinstance(value, HomomorphicType):
             raise TastySyntaxError("Converting between garbled and Homomorphic on same side does not make sense")
         elif isinstance(value, Garbled.CTuple):
@@ -1934,49 +1936,50 @@ class Garbled(GarbledType):
                     "Internal length does not equal given bitlength (%d, %d)" % (len(self), self._bit_length))
 
     def __lt__(self, other):
-        circuit = CmpCircuit(self._bit_length, other.bit_length(), CmpCircuit.LESS, map_signed(self._signed),
-                             map_signed(other.signed()))
+        circuit = cached_circuit(library_circuit(CmpCircuit), self._bit_length, other.bit_length(), CmpCircuit.LESS,
+                                 map_signed(self._signed), map_signed(other.signed()))
         return self.__do_op2to1(other, circuit)
 
     def __le__(self, other):
-        circuit = CmpCircuit(self._bit_length, other.bit_length(), CmpCircuit.LESSEQUAL, map_signed(self._signed),
-                             map_signed(other.signed()))
+        circuit = cached_circuit(library_circuit(CmpCircuit), self._bit_length, other.bit_length(),
+                                 CmpCircuit.LESSEQUAL, map_signed(self._signed), map_signed(other.signed()))
         return self.__do_op2to1(other, circuit)
 
     def __gt__(self, other):
-        circuit = CmpCircuit(self._bit_length, other.bit_length(), CmpCircuit.GREATER, map_signed(self._signed),
-                             map_signed(other.signed()))
+        circuit = cached_circuit(library_circuit(CmpCircuit), self._bit_length, other.bit_length(), CmpCircuit.GREATER,
+                                 map_signed(self._signed), map_signed(other.signed()))
         return self.__do_op2to1(other, circuit)
 
     def __ge__(self, other):
-        circuit = CmpCircuit(self._bit_length, other.bit_length(), CmpCircuit.GREATEREQUAL, map_signed(self._signed),
-                             map_signed(other.signed()))
+        circuit = cached_circuit(library_circuit(CmpCircuit), self._bit_length, other.bit_length(),
+                                 CmpCircuit.GREATEREQUAL, map_signed(self._signed), map_signed(other.signed()))
         return self.__do_op2to1(other, circuit)
 
     def __eq__(self, other):
-        circuit = CmpCircuit(self._bit_length, other.bit_length(), CmpCircuit.EQUAL, map_signed(self._signed),
-                             map_signed(other.signed()))
+        circuit = cached_circuit(library_circuit(CmpCircuit), self._bit_length, other.bit_length(), CmpCircuit.EQUAL,
+                                 map_signed(self._signed), map_signed(other.signed()))
         return self.__do_op2to1(other, circuit)
 
     def __and__(self, other):
         assert other.bit_length() == self._bit_length
-        circuit = Bool2Circuit(self._bit_length, Bool2Circuit.AND)
+        circuit = cached_circuit(Bool2Circuit, self._bit_length, Bool2Circuit.AND)
         return self.__do_op2to1(other, circuit)
 
     def __invert__(self):
-        circuit = NotCircuit(self._bit_length)
+        circuit = cached_circuit(NotCircuit, self._bit_length)
         return self._n21op(circuit, (self, ))
 
     def __mul__(self, other):
         if self._bit_length < other.bit_length():
             return other * self
-        circuit = FastMultiplicationCircuit(self._bit_length, other.bit_length())
+        circuit = cached_circuit(FastMultiplicationCircuit, self._bit_length, other.bit_length())
         return self.__do_op2to1(other, circuit)
 
     def __add__(self, other):
         if self._bit_length < other.bit_length():
             return other + self
-        circuit = AddCircuit(self._bit_length, other.bit_length(), map_signed(self._signed), map_signed(other.signed()))
+        circuit = cached_circuit(library_circuit(AddCircuit), self._bit_length, other.bit_length(),
+                                 map_signed(self._signed), map_signed(other.signed()))
         return self.__do_op2to1(other, circuit)
 
     __radd__ = __add__
@@ -1985,20 +1988,22 @@ class Garbled(GarbledType):
     def __sub__(self, other):
         if self.signed():
             raise NotImplementedError("We cannot sub with first operand possibly negative")
-        circuit = SubCircuit(self._bit_length, other.bit_length(), map_signed(other.signed()))
+        circuit = cached_circuit(library_circuit(SubCircuit), self._bit_length, other.bit_length(),
+                                 map_signed(other.signed()))
 
         return self.__do_op2to1(other, circuit)
 
     def dropmsb_sub(self, other):
         if self.signed():
             raise NotImplementedError("We cannot sub with first operand possibly negative")
-        circuit = SubCircuit(self._bit_length, other.bit_length(), map_signed(self._signed), DROP_MSB)
+        circuit = cached_circuit(library_circuit(SubCircuit), self._bit_length, other.bit_length(),
+                                 map_signed(self._signed), DROP_MSB)
         return self.__do_op2to1(other, circuit)
 
 
     def unpack(self, mask, bitlen, chunk_bitlen, sign):
         dim = chunk_bitlen / bitlen
-        circuit = UnpackCircuit(bitlen, dim, map_signed(sign))
+        circuit = cached_circuit(UnpackCircuit, bitlen, dim, map_signed(sign))
 
         return GarbledVec(val=self._n2mop(circuit, (self, mask)), bitlen=bitlen, dim=[dim], signed=(sign == SIGNED))
 
@@ -2025,7 +2030,7 @@ class Garbled(GarbledType):
     def mux(self, first, second):
         if self._bit_length != 1:
             raise TastySyntaxError("You can only use Mux on 1-bit Garbled Values")
-        circuit = MuxCircuit(first.bit_length())
+        circuit = cached_circuit(library_circuit(MuxCircuit), first.bit_length())
         if state.precompute:
             return self._n21op(circuit, (first, second, self))
         return self._n21op(circuit, (first, second, self))
@@ -2110,19 +2115,21 @@ class Garbled(GarbledType):
                                                                                           HomomorphicType):
             # FIXME: statistic security parameter!
             statistic_secparam = state.config.symmetric_security_parameter
-            circuit = AddCircuit(statistic_secparam + bit_lengths[0] + 2, statistic_secparam + bit_lengths + 1,
-                                 UNSIGNED, SIGNED)
+            circuit = cached_circuit(library_circuit(AddCircuit), statistic_secparam + bit_lengths[0] + 2,
+                                     statistic_secparam + bit_lengths + 1, UNSIGNED, SIGNED)
             tmp = circuit.gate_types()
             tmp["ot"] = bit_lengths[0] + statistic_secparam + 2
             return tmp
 
         circuit = None
         if methodname == "__lt__":
-            circuit = CmpCircuit(bit_lengths[0], bit_lengths[1], CmpCircuit.LESS, False, False)
+            circuit = cached_circuit(library_circuit(CmpCircuit), bit_lengths[0], bit_lengths[1], CmpCircuit.LESS,
+                                     False, False)
         if methodname == "__gt__":
-            circuit = CmpCircuit(bit_lengths[0], bit_lengths[1], CmpCircuit.GREATER, False, False)
+            circuit = cached_circuit(library_circuit(CmpCircuit), bit_lengths[0], bit_lengths[1], CmpCircuit.GREATER,
+                                     False, False)
         if methodname == "__mul__":
-            circuit = FastMultiplicationCircuit(bit_lengths[0], bit_lengths[1])
+            circuit = cached_circuit(FastMultiplicationCircuit, bit_lengths[0], bit_lengths[1])
         if circuit:
             return circuit.gate_types()
         return dict()
@@ -2242,6 +2249,9 @@ class Garbled(GarbledType):
 class GarbledVec(Vec):
     _type = Garbled
 
+    # operations evaluated elementwise with one ReplicatedCircuit
+    elementwise_methods = ("__add__", "__sub__", "__lt__", "__le__", "__gt__", "__ge__", "mux")
+
 
     @staticmethod
     def affects(methodname, input_types, role):
@@ -2249,7 +2259,7 @@ class GarbledVec(Vec):
             state.log.debug("GarbledVec.affects(%r, %r, %r)", methodname, input_types, role)
         if methodname in (
         "min_value_index", "max_value_index", "min_value", "max_value", "min_index", "max_index", "__add__", "__sub__",
-        "dot", "__mul__"):
+        "dot", "__mul__", "__lt__", "__le__", "__gt__", "__ge__", "mux"):
             return Value.C_SETUP | Value.S_SETUP | Value.C_ONLINE
         elif methodname == "__getitem__":
             return Value.S_ONLINE if role else Value.C_ONLINE
@@ -2276,14 +2286,22 @@ class GarbledVec(Vec):
             state.log.debug("GarbledVec.calc_costs(%r, %r, %r, %r, %r, %r, %r)", methodname, input_types, bit_lengths,
                             dims, role, passive, precompute)
 
-        if methodname == "GarbledVec" and (role == Party.CLIENT or role == Party.SERVER and passive):
-            try:
-                if isinstance(input_types[0], PlainVec):
-                    return {"ot": dims[0] * bit_lengths[0]}
-            except IndexError:
-                return dict()
+        if methodname == "GarbledVec":
+            if (role == Party.CLIENT or role == Party.SERVER and passive) and input_types and \
+                    issubclass(input_types[0], PlainVec):
+                return {"ot": reduce(operator.mul, dims[0]) * bit_lengths[0]}
+            return dict()
         elif methodname in ("min_value", "min_value_index", "max_value_index"):
             return dict()
+        elif methodname in GarbledVec.elementwise_methods:
+            if precompute and role == Party.CLIENT or not precompute and role == Party.SERVER:
+                return dict()
+            bit_lengths = list(bit_lengths)
+            if methodname == "__add__" and bit_lengths[0] < bit_lengths[1]:
+                bit_lengths.reverse()
+            # the signedness of the operands is not known here
+            circuit = GarbledVec._scalar_circuit(methodname, bit_lengths, [False] * len(bit_lengths))
+            return cached_circuit(ReplicatedCircuit, circuit, dims[0][0]).gate_types()
         raise NotImplementedError(
             "calc_costs() not implemented for GarbledVec.%s(%s)" % (methodname, list(input_types)))
 
@@ -2293,6 +2311,12 @@ class GarbledVec(Vec):
             state.log.debug("GarbledVec.returns(%r, %r, %r, %r, %r)", methodname, input_types, bit_lengths, dims,
                             signeds)
 
+        if methodname in GarbledVec.elementwise_methods:
+            for input_type, dim in zip(input_types[1:], dims[1:]):
+                if issubclass(input_type, Vec) and list(dim) != list(dims[0]):
+                    raise TastySyntaxError("Elementwise operation on GarbledVecs of different size (%r, %r)" % (
+                        dims[0], dim))
+
         if methodname == "GarbledVec":
             return ({"type": GarbledVec, "bitlen": bit_lengths[0], "dim": dims[0], "signed": signeds[0]},)
         elif methodname in ("min_value", "max_value", "min_index", "max_index"):
@@ -2304,6 +2328,10 @@ class GarbledVec(Vec):
             return ({"type": GarbledVec, "bitlen": max(bit_lengths) + 1, "dim": dims[0], "signed": any(signeds)}, )
         elif methodname == "__sub__":
             return ({"type": GarbledVec, "bitlen": max(bit_lengths), "dim": dims[0], "signed": any(signeds)}, )
+        elif methodname in ("__lt__", "__le__", "__gt__", "__ge__"):
+            return ({"type": GarbledVec, "bitlen": 1, "dim": dims[0], "signed": False}, )
+        elif methodname == "mux":
+            return ({"type": GarbledVec, "bitlen": bit_lengths[1], "dim": dims[0], "signed": any(signeds[1:])}, )
         elif methodname == "__getitem__":
             if len(dims[0]) > 1:
                 newtype = GarbledVec
@@ -2377,29 +2405,118 @@ class GarbledVec(Vec):
         assert len(ret) == 1, "_n21op on circuit that returns more then one value"
         return ret[0]
 
+    @staticmethod
+    def _scalar_circuit(methodname, bit_lengths, signeds):
+        """Circuit applied to each element by the elementwise operation
+        methodname on operands with bit_lengths and signeds"""
+        if methodname == "__add__":
+            return cached_circuit(library_circuit(AddCircuit), bit_lengths[0], bit_lengths[1],
+                                  map_signed(signeds[0]), map_signed(signeds[1]))
+        elif methodname == "__sub__":
+            return cached_circuit(library_circuit(SubCircuit), bit_lengths[0], bit_lengths[1],
+                                  map_signed(signeds[1]))
+        elif methodname == "mux":
+            return cached_circuit(library_circuit(MuxCircuit), bit_lengths[1])
+        cmp_type = {"__lt__": CmpCircuit.LESS, "__le__": CmpCircuit.LESSEQUAL,
+                    "__gt__": CmpCircuit.GREATER, "__ge__": CmpCircuit.GREATEREQUAL}[methodname]
+        return cached_circuit(library_circuit(CmpCircuit), bit_lengths[0], bit_lengths[1], cmp_type,
+                              map_signed(signeds[0]), map_signed(signeds[1]))
+
+    def _elementwise(self, circuit, operands):
+        """Evaluates circuit on the elements of operands with one garbled
+        circuit, see L{ReplicatedCircuit}
+
+        @type circuit: Circuit
+        @param circuit: circuit with one output applied to each element
+
+        @type operands: tuple
+        @param operands: inputs of circuit, GarbledVecs of the dimension of
+        self or Garbleds used as input for all elements
+
+        @rtype: GarbledVec
+        """
+        if len(self._dim) > 1:
+            raise TastySyntaxError("Elementwise operations are only supported on one-dimensional GarbledVecs")
+        n = self._dim[0]
+        for op in operands:
+            if isinstance(op, Vec) and list(op.dim()) != list(self._dim):
+                raise TastySyntaxError("Elementwise operation on GarbledVecs of different size (%r, %r)" % (
+                    self._dim, op.dim()))
+        invals = [op[i] if isinstance(op, Vec) else op for i in xrange(n) for op in operands]
+        out = circuit.outputs()[0]
+        values = self._n2mop(cached_circuit(ReplicatedCircuit, circuit, n), invals)
+        ret = GarbledVec(val=list(values), bitlen=len(out[0]), dim=[n])
+        ret._signed = out[2] == SIGNED
+        return ret
+
+    def __add__(self, other):
+        """Componentwise addition of a GarbledVec or a Garbled"""
+        if self._bit_length < other.bit_length():
+            x, y = other, self
+        else:
+            x, y = self, other
+        circuit = self._scalar_circuit("__add__", (x.bit_length(), y.bit_length()), (x.signed(), y.signed()))
+        return self._elementwise(circuit, (x, y))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        """Componentwise substraction of a GarbledVec or a Garbled"""
+        if self.signed():
+            raise NotImplementedError("We cannot sub with first operand possibly negative")
+        return self._binary_elementwise("__sub__", other)
+
+    def _binary_elementwise(self, methodname, other):
+        circuit = self._scalar_circuit(methodname, (self._bit_length, other.bit_length()),
+                                       (self._signed, other.signed()))
+        return self._elementwise(circuit, (self, other))
+
+    def __lt__(self, other):
+        return self._binary_elementwise("__lt__", other)
+
+    def __le__(self, other):
+        return self._binary_elementwise("__le__", other)
+
+    def __gt__(self, other):
+        return self._binary_elementwise("__gt__", other)
+
+    def __ge__(self, other):
+        return self._binary_elementwise("__ge__", other)
+
+    def mux(self, first, second):
+        """Componentwise first if self is 0 else second, self has 1-bit elements"""
+        if self._bit_length != 1:
+            raise TastySyntaxError("You can only use Mux on 1-bit Garbled Values")
+        circuit = self._scalar_circuit("mux", (1, first.bit_length()), (False, first.signed()))
+        return self._elementwise(circuit, (first, second, self))
+
     def min_value_index(self):
-        c = MinMaxValueIndexCircuit(self._dim[0], self.bit_length(), MinMaxValueIndexCircuit.MIN,
-                                    map_signed(self._signed))
+        c = cached_circuit(library_circuit(MinMaxValueIndexCircuit), self._dim[0], self.bit_length(),
+                           MinMaxValueIndexCircuit.MIN, map_signed(self._signed))
         return self._n2mop(c, reversed(self))  # FIXME: Why reversed?
 
     def min_index(self):
-        c = MinMaxIndexCircuit(self._dim[0], self.bit_length(), MinMaxValueIndexCircuit.MIN, map_signed(self._signed))
+        c = cached_circuit(library_circuit(MinMaxIndexCircuit), self._dim[0], self.bit_length(),
+                           MinMaxValueIndexCircuit.MIN, map_signed(self._signed))
         return self._n2mop(c, reversed(self))  # FIXME: Why reversed?
 
     def min_value(self):
-        c = MinMaxValueCircuit(self._dim[0], self.bit_length(), MinMaxValueCircuit.MIN, map_signed(self._signed))
+        c = cached_circuit(library_circuit(MinMaxValueCircuit), self._dim[0], self.bit_length(), MinMaxValueCircuit.MIN,
+                           map_signed(self._signed))
         return self._n2mop(c, reversed(self))[0]
 
     def max_value_index(self):
-        c = MinMaxValueIndexCircuit(self._dim[0], self.bit_length(), MinMaxValueIndexCircuit.MAX,
-                                    map_signed(self._signed))
+        c = cached_circuit(library_circuit(MinMaxValueIndexCircuit), self._dim[0], self.bit_length(),
+                           MinMaxValueIndexCircuit.MAX, map_signed(self._signed))
         return self._n2mop(c, reversed(self))  # FIXME: Why reversed?
 
     def max_index(self):
-        c = MinMaxIndexCircuit(self._dim[0], self.bit_length(), MinMaxValueIndexCircuit.MAX, map_signed(self._signed))
+        c = cached_circuit(library_circuit(MinMaxIndexCircuit), self._dim[0], self.bit_length(),
+                           MinMaxValueIndexCircuit.MAX, map_signed(self._signed))
         return self._n2mop(c, reversed(self))  # FIXME: Why reversed?
 
     def max_value(self):
-        c = MinMaxValueCircuit(self._dim[0], self.bit_length(), MinMaxValueCircuit.MAX, map_signed(self._signed))
+        c = cached_circuit(library_circuit(MinMaxValueCircuit), self._dim[0], self.bit_length(), MinMaxValueCircuit.MAX,
+                           map_signed(self._signed))
         return self._n2mop(c, self)[0]
 
@@ -608,7 +608,7 @@ def PaillierVec_GarbledVec_send(src, dst, source_bitlen, source_dim, signed, for
 
         rets.reverse() # packing works exactly in the oposite direction then unpacking, so reverse here to get original result back
 
-        vec = GarbledVec(bitlen=source_bitlen, dim=source_dim, val=rets)
+        vec = GarbledVec(bitlen=source_bitlen, dim=source_dim, val=rets, signed=signed)
 
         # save shadow copy of resulting GarbledVec
         _set_dst(src, dst, vec)
@@ -188,7 +188,7 @@ class Vec(PartyAttribute, list):
             try:
                 if type(signed) == bool:
                     self._signed = signed
-                    if val:
+                    if val and hasattr(val, "signed"):
                         assert signed == val.signed(), "sign does not match, did you mean force_signed?"
                 else:
                     self._signed = val.signed()